@@ -22,7 +22,7 @@ def get_agent_card(base_url):
         version="1.0.0",
         documentationUrl=f"{base_url}/docs",
         capabilities=schemas.AgentCapabilities(
-            streaming=False,
+            streaming=DEPLOYMENT_TYPE == DeploymentTypes.STREAMING.value,
             pushNotifications=DEPLOYMENT_TYPE == DeploymentTypes.WEBHOOK.value,
             stateTransitionHistory=True,
         ),
@@ -39,6 +39,15 @@ def get_agent_card(base_url):
                 inputModes=["text/plain"],
                 outputModes=["application/x-fen", "image/png"],
             ),
+            schemas.AgentSkill(
+                id="bulk_analysis",
+                name="Bulk Analysis",
+                description="Evaluates a list of FENs or the games of a PGN sent as a data part, streaming engine scores and best moves per position.",
+                tags=["chess", "analysis", "engine"],
+                examples=['{"fens": ["rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"]}', '{"pgn": "1. e4 e5 2. Nf3 Nc6"}'],
+                inputModes=["application/json"],
+                outputModes=["application/json"],
+            ),
         ],
     )
 
@@ -0,0 +1,106 @@
+"""
+Time-to-first-token of chat answers: full structured run vs streamed run.
+
+By default the agent is driven by a FunctionModel that emits a chat answer
+as `--tokens` JSON chunks, `--token-delay` seconds apart, which mimics a
+model writing a long explanation. `--live` uses the configured Gemini model.
+
+    uv run python -m benchmarks.chat_ttft --runs 5
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import chess
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import FunctionModel, DeltaToolCall
+from repositories.agent import chess_agent
+from repositories.game import Game, GameRepository
+
+QUESTION = "Why is controlling the centre important in the opening?"
+
+
+def scripted_model(tokens: int, token_delay: float) -> FunctionModel:
+    words = [f"word{i} " for i in range(tokens)]
+    answer = "".join(words)
+
+    async def full(messages, info):
+        await asyncio.sleep(tokens * token_delay)
+        args = {"command_type": "chat", "chat_query_response": answer}
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, json.dumps(args))])
+
+    async def stream(messages, info):
+        name = info.output_tools[0].name
+        yield {0: DeltaToolCall(name=name, json_args='{"command_type": "chat", "chat_query_response": "')}
+        for word in words:
+            await asyncio.sleep(token_delay)
+            yield {0: DeltaToolCall(json_args=word)}
+        yield {0: DeltaToolCall(json_args='"}')}
+
+    return FunctionModel(full, stream_function=stream)
+
+
+async def time_full(repo: GameRepository, game: Game) -> float:
+    started = time.perf_counter()
+    await repo.parse_command(QUESTION, game)
+    return time.perf_counter() - started
+
+
+async def time_streamed(repo: GameRepository, game: Game) -> tuple[float, float]:
+    started = time.perf_counter()
+    first = None
+    async for partial in repo.parse_command_stream(QUESTION, game):
+        if first is None and partial.chat_query_response:
+            first = time.perf_counter() - started
+    return first or 0.0, time.perf_counter() - started
+
+
+async def run(args):
+    repo = GameRepository()
+    game = Game(chess.Board())
+    full, ttft, total = [], [], []
+
+    for _ in range(args.runs):
+        full.append(await time_full(repo, game))
+        first, whole = await time_streamed(repo, game)
+        ttft.append(first)
+        total.append(whole)
+
+    summary = {
+        "runs": args.runs,
+        "model": "live" if args.live else f"scripted {args.tokens} tokens @ {args.token_delay}s",
+        "full_run_ttft_seconds": round(statistics.median(full), 3),
+        "streamed_ttft_seconds": round(statistics.median(ttft), 3),
+        "streamed_total_seconds": round(statistics.median(total), 3),
+    }
+    print(
+        f"time to first chat text: {summary['full_run_ttft_seconds']}s before, "
+        f"{summary['streamed_ttft_seconds']}s streamed "
+        f"(stream completes in {summary['streamed_total_seconds']}s)"
+    )
+    print(json.dumps(summary, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--live", action="store_true", help="use the configured Gemini model")
+    args = parser.parse_args()
+
+    if args.live:
+        asyncio.run(run(args))
+    else:
+        with chess_agent.override(model=scripted_model(args.tokens, args.token_delay)):
+            asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""
+End-to-end throughput and latency of moves, offline.
+
+Boots the app in-process under uvicorn on a local port, with:
+
+- a FunctionModel that turns each message into the move it names, in place
+  of Gemini (`--llm-delay` seconds per answer)
+- fakeredis, unless `--redis-url` points at a real Redis
+- a local MinIO stand-in that accepts uploads over HTTP
+- benchmarks/stub_uci.py as the engine (`--engine-delay` seconds per move),
+  or Stockfish with `--engine stockfish` (`auto` uses it when installed)
+
+Then `--concurrency` players play `--requests` moves in each mode. In
+blocking mode each move is a message/send round trip. In webhook mode a
+move is timed from the request until the webhook arrives at a local
+receiver. In streaming mode it is a message/stream, with time to first
+event also recorded.
+
+It reports throughput and p50/p95/p99 latency per mode. The same
+percentiles are given per stage, from the request's spans: handle_rpc,
+parse_command, usermove, aimove, render, upload, redis_load, redis_save,
+webhook and the rest. `--output` writes the JSON to a file for comparing
+commits. Board rendering needs cairo, as in production.
+
+    uv run python -m benchmarks.e2e --requests 200 --concurrency 16 --output e2e.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import shutil
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+MODES = ("blocking", "webhook", "streaming")
+AI_MOVE = re.compile(r"AI moved ([a-h][1-8][a-h][1-8][qrbn]?)")
+
+
+class MinioStandIn(BaseHTTPRequestHandler):
+    """Just enough of the S3 API for Minio.fput_object: bucket location and PUT."""
+
+    def do_GET(self):
+        body = (
+            b'<?xml version="1.0" encoding="UTF-8"?>'
+            b'<LocationConstraint xmlns="http://s3.amazonaws.com/doc/2006-03-01/">us-east-1</LocationConstraint>'
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("ETag", '"benchmark"')
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_minio_stand_in() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MinioStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"127.0.0.1:{server.server_address[1]}"
+
+
+def configure_environment(args):
+    """Settings and stand-ins that have to be in place before the app is imported."""
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ["ARCHIVER_ENABLED"] = "false"
+    os.environ["MINIO_ENDPOINT"] = start_minio_stand_in()
+    os.environ["MINIO_SECURE"] = "false"
+    os.environ.setdefault("MINIO_BUCKET_NAME", "benchmark")
+
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+        return
+
+    import fakeredis
+    import repositories.redis
+
+    server = fakeredis.FakeServer()
+    repositories.redis.create_redis_client = lambda *a, **k: fakeredis.FakeRedis(server=server, decode_responses=True)
+    repositories.redis.create_async_redis_client = lambda *a, **k: fakeredis.FakeAsyncRedis(
+        server=server, decode_responses=True
+    )
+
+
+def engine_command(args) -> str | list[str]:
+    stockfish = shutil.which("stockfish")
+    if args.engine == "stockfish" or (args.engine == "auto" and stockfish):
+        if not stockfish:
+            sys.exit("stockfish is not on PATH")
+        return stockfish
+    stub = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_uci.py")
+    return [sys.executable, stub, "--delay", str(args.engine_delay)]
+
+
+def scripted_model(llm_delay: float):
+    """Answers "resign" with a resignation and anything else with a move command for that text."""
+    from pydantic_ai.messages import ModelResponse, ToolCallPart, UserPromptPart
+    from pydantic_ai.models.function import FunctionModel, DeltaToolCall
+
+    def move_command(messages) -> str:
+        prompts = [part.content for message in messages for part in message.parts if isinstance(part, UserPromptPart)]
+        text = str(prompts[-1]).strip()
+        if text == "resign":
+            return json.dumps({"command_type": "resign"})
+        return json.dumps({"command_type": "move", "move": text})
+
+    async def answer(messages, info):
+        await asyncio.sleep(llm_delay)
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, move_command(messages))])
+
+    async def stream(messages, info):
+        await asyncio.sleep(llm_delay)
+        yield {0: DeltaToolCall(name=info.output_tools[0].name, json_args=move_command(messages))}
+
+    return FunctionModel(answer, stream_function=stream)
+
+
+@asynccontextmanager
+async def serve_app():
+    """Runs main.app under uvicorn on a free local port and yields its base URL."""
+    import uvicorn
+    import main
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="warning", access_log=False))
+    serving = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        await serving
+
+
+class SpanRecorder:
+    """Stands in for the trace exporter and keeps every span's duration by name."""
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = defaultdict(list)
+
+    def export(self, span):
+        self.durations[span.name].append((span.end_ns - span.start_ns) / 1e9)
+
+    def flush(self):
+        pass
+
+
+class WebhookReceiver:
+    """HTTP/1.1 endpoint that resolves a waiter per task when its final
+    webhook (a Task or an error) arrives."""
+
+    def __init__(self):
+        self.waiters: dict[str, asyncio.Future] = {}
+        self.url = None
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}/webhook"
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode().split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                body = json.loads(await reader.readexactly(length)) if length else {}
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+                self._deliver(body)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _deliver(self, body: dict):
+        result = body.get("result") or {}
+        task_id = result.get("id")
+        if task_id in self.waiters and not self.waiters[task_id].done():
+            if result.get("kind") == "task" or body.get("error"):
+                self.waiters[task_id].set_result(body)
+
+    def expect(self, task_id: str) -> asyncio.Future:
+        self.waiters[task_id] = asyncio.get_running_loop().create_future()
+        return self.waiters[task_id]
+
+    def close(self):
+        self._server.close()
+
+
+def message_request(method: str, task_id: str, text: str, webhook_url: str | None = None) -> dict:
+    params = {
+        "message": {
+            "kind": "message",
+            "role": "user",
+            "messageId": uuid4().hex,
+            "taskId": task_id,
+            "parts": [{"kind": "text", "text": text}],
+        }
+    }
+    if webhook_url:
+        params["configuration"] = {
+            "acceptedOutputModes": ["text/plain"],
+            "pushNotificationConfig": {
+                "url": webhook_url,
+                "authentication": {"schemes": ["TelexApiKey"], "credentials": "benchmark"},
+            },
+        }
+    return {"jsonrpc": "2.0", "id": uuid4().hex, "method": method, "params": params}
+
+
+async def send_move(client, mode: str, task_id: str, san: str, receiver: WebhookReceiver, timings: dict) -> str:
+    """Plays one move and returns the text of the answer and how long it took."""
+    started = time.perf_counter()
+    if mode == "blocking":
+        response = await client.post("/", json=message_request("message/send", task_id, san))
+        response.raise_for_status()
+        text = response.text
+
+    elif mode == "webhook":
+        arrived = receiver.expect(task_id)
+        response = await client.post("/", json=message_request("message/send", task_id, san, receiver.url))
+        response.raise_for_status()
+        timings["accepted"].append(time.perf_counter() - started)
+        text = json.dumps(await asyncio.wait_for(arrived, timeout=120))
+
+    else:
+        chunks = []
+        async with client.stream("POST", "/", json=message_request("message/stream", task_id, san)) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_text():
+                if not chunks:
+                    timings["first_event"].append(time.perf_counter() - started)
+                chunks.append(chunk)
+        text = "".join(chunks)
+
+    return text, time.perf_counter() - started
+
+
+async def player(client, mode: str, moves: int, rng: random.Random, receiver, timings: dict, errors: list):
+    import chess
+
+    task_id, board = uuid4().hex, chess.Board()
+    for _ in range(moves):
+        move = rng.choice(list(board.legal_moves))
+        san = board.san(move)
+        board.push(move)
+        if board.is_game_over():
+            task_id, board = uuid4().hex, chess.Board()
+            continue
+
+        try:
+            text, elapsed = await send_move(client, mode, task_id, san, receiver, timings)
+        except Exception as e:
+            errors.append(type(e).__name__)
+            task_id, board = uuid4().hex, chess.Board()
+            continue
+
+        reply = AI_MOVE.search(text)
+        if not reply:
+            errors.append("NoMove")
+            task_id, board = uuid4().hex, chess.Board()
+            continue
+        timings["move"].append(elapsed)
+        board.push_uci(reply.group(1))
+        if board.is_game_over():
+            task_id, board = uuid4().hex, chess.Board()
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {"count": len(ordered), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99)}
+
+
+async def run_mode(client, mode: str, args, receiver: WebhookReceiver, recorder: SpanRecorder) -> dict:
+    import main
+
+    # Which path message/send takes is read from this module global.
+    main.DEPLOYMENT_TYPE = "blocking" if mode == "streaming" else mode
+    recorder.durations.clear()
+    timings: dict[str, list[float]] = defaultdict(list)
+    errors: list[str] = []
+
+    per_player, extra = divmod(args.requests, args.concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            player(client, mode, per_player + (i < extra), random.Random(args.seed + i), receiver, timings, errors)
+            for i in range(args.concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    # Let spans that end after the answer (webhook delivery) be recorded.
+    await asyncio.sleep(0.2)
+
+    result = {
+        "moves": len(timings["move"]),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "moves_per_second": round(len(timings["move"]) / elapsed, 2),
+        "latency_seconds": percentiles(timings["move"]),
+        "stages_seconds": {name: percentiles(values) for name, values in sorted(recorder.durations.items())},
+    }
+    if mode == "webhook":
+        result["accepted_seconds"] = percentiles(timings["accepted"])
+    if mode == "streaming":
+        result["first_event_seconds"] = percentiles(timings["first_event"])
+    if errors:
+        result["error_types"] = {error: errors.count(error) for error in set(errors)}
+    return result
+
+
+async def run(args) -> dict:
+    import httpx
+    from repositories.agent import chess_agent
+    from repositories.engine import engine_pool
+    from helpers.tracing import tracer
+
+    chess_agent.model = scripted_model(args.llm_delay)
+    engine_pool.path = engine_command(args)
+    recorder = SpanRecorder()
+    tracer.exporter, tracer.sample_rate = recorder, 1.0
+
+    receiver = WebhookReceiver()
+    await receiver.start()
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+
+    modes = {}
+    try:
+        async with serve_app() as base_url, httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+            for mode in args.modes:
+                modes[mode] = await run_mode(client, mode, args, receiver, recorder)
+                print(
+                    f"{mode}: {modes[mode]['moves']} moves in {modes[mode]['seconds']}s "
+                    f"({modes[mode]['moves_per_second']}/s), p50 {modes[mode]['latency_seconds'].get('p50')}s, "
+                    f"p99 {modes[mode]['latency_seconds'].get('p99')}s, {modes[mode]['errors']} errors",
+                    file=sys.stderr,
+                )
+    finally:
+        receiver.close()
+
+    return modes
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--requests", type=int, default=200, help="moves per mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="games played at once")
+    parser.add_argument("--llm-delay", type=float, default=0.05)
+    parser.add_argument("--engine", choices=("auto", "stub", "stockfish"), default="auto")
+    parser.add_argument("--engine-delay", type=float, default=0.02, help="seconds per stub engine move")
+    parser.add_argument("--redis-url", help="use this Redis instead of fakeredis")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON summary to this file")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    modes = asyncio.run(run(args))
+
+    summary = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_delay": args.llm_delay,
+            "engine": "stockfish" if isinstance(engine_command(args), str) else f"stub ({args.engine_delay}s)",
+            "redis": args.redis_url or "fakeredis",
+            "seed": args.seed,
+        },
+        "modes": modes,
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+Micro-benchmarks of the hot-path building blocks, with stored baselines.
+
+Every case is run in a loop long enough to take `--min-time` seconds, and
+that is repeated `--repeat` times. The median time per call is reported
+(pyperf style). The cases are:
+
+- board_svg, board_png, board_upload and generate_board_image: SVG
+  generation, rasterisation (skipped without cairo) and upload to a local
+  MinIO stand-in, and all three together
+- game_to_dict and game_from_dict on a mid-game game with cached analysis
+- validate_message_send and validate_tasks_get: A2ARequest.validate_python
+  on realistic payloads
+- response_model_dump and response_model_dump_json: a move response, as
+  returned and as sent to webhooks
+- rpc_parse_fastapi and rpc_parse_raw: a message/send body parsed to a
+  dict by FastAPI then validated, against validate_json on the bytes
+- rpc_encode_fastapi and rpc_encode_raw: a move response through
+  jsonable_encoder and JSONResponse, against RawJSONResponse
+- webhook_body_dict and webhook_body_raw: the same response as a dict
+  JSON-encoded by httpx, against dump_json
+- command_processor_move and command_processor_invalid:
+  CommandProcessor.process
+
+`--save` stores the results as the baseline. `--check` compares against
+the baseline and exits with 1 when a case is more than `--threshold`
+slower. Baselines are only comparable on the machine that made them;
+re-save after an intended change or on new hardware.
+
+    uv run python -m benchmarks.micro --check
+    uv run python -m benchmarks.micro -k game_ --save
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+from uuid import uuid4
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "micro.json")
+
+MIDGAME_PGN = (
+    "1. e4 e5 2. Nf3 Nc6 3. Bb5 a6 4. Ba4 Nf6 5. O-O Be7 6. Re1 b5 7. Bb3 d6 8. c3 O-O "
+    "9. h3 Nb8 10. d4 Nbd7 11. c4 c6 12. cxb5 axb5 13. Nc3 Bb7 14. Bg5 b4 15. Nb1 h6 "
+    "16. Bh4 c5 17. dxe5 Nxe4 18. Bxe7 Qxe7 19. exd6 Qf6 20. Nbd2 Nxd6"
+)
+
+
+def configure_environment():
+    from benchmarks.e2e import start_minio_stand_in
+
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ["MINIO_ENDPOINT"] = start_minio_stand_in()
+    os.environ["MINIO_SECURE"] = "false"
+    os.environ.setdefault("MINIO_BUCKET_NAME", "benchmark")
+
+
+def midgame_game():
+    import io
+    import chess.pgn
+    import schemas
+    from repositories.game import Game
+
+    board = chess.pgn.read_game(io.StringIO(MIDGAME_PGN)).end().board()
+    game = Game(
+        board,
+        state=schemas.TaskState.input_required,
+        move_history=[move.uci() for move in board.move_stack],
+        version=40,
+        user_id="user",
+        channel_id="channel",
+    )
+    game.analysis = {
+        "fen": board.fen(),
+        "depth": 18,
+        "multipv": 3,
+        "lines": [
+            {"score": {"cp": 35 - 20 * i}, "pv": [move.uci() for move in list(board.legal_moves)[i : i + 8]]}
+            for i in range(3)
+        ],
+    }
+    return game
+
+
+def message_send_payload() -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": uuid4().hex,
+        "method": "message/send",
+        "params": {
+            "message": {
+                "kind": "message",
+                "role": "user",
+                "messageId": uuid4().hex,
+                "taskId": uuid4().hex,
+                "parts": [{"kind": "text", "text": "knight to f3 please"}],
+                "metadata": {"telex_user_id": uuid4().hex, "telex_channel_id": uuid4().hex, "org_id": uuid4().hex},
+            },
+            "configuration": {
+                "acceptedOutputModes": ["text/plain", "image/png"],
+                "historyLength": 10,
+                "blocking": False,
+                "pushNotificationConfig": {
+                    "url": "https://ping.telex.im/v1/a2a/webhooks/" + uuid4().hex,
+                    "authentication": {"schemes": ["TelexApiKey"], "credentials": uuid4().hex},
+                },
+            },
+        },
+    }
+
+
+def cases() -> dict:
+    """name -> (function, is_async), or None for a case that cannot run here."""
+    import chess
+    import schemas
+    from game.utils import upload_board_image, generate_board_image
+    from game.responses import GameResponseBuilder
+    from game.command_processor import CommandProcessor
+    from repositories.game import Game, ChessCommandResponse
+    from pydantic import TypeAdapter
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from helpers.serialization import RawJSONResponse, dump_json
+
+    game = midgame_game()
+    data = game.to_dict()
+    svg = game.board._repr_svg_()
+
+    try:
+        import cairosvg
+
+        cairosvg.svg2png(bytestring=svg.encode())
+    except (ImportError, OSError):
+        cairosvg = None
+
+    png_file, png_name = "/tmp/benchmark-board.png", "benchmark-board.svg"
+    png = cairosvg.svg2png(bytestring=svg.encode()) if cairosvg else os.urandom(30_000)
+
+    def upload():
+        # The upload deletes the local file, so each call writes it first.
+        with open(png_file, "wb") as f:
+            f.write(png)
+        upload_board_image(png_file, png_name)
+
+    send_payload = message_send_payload()
+    send_body = json.dumps(send_payload).encode()
+    # What FastAPI does with a `dict | list` body parameter.
+    body_field = TypeAdapter(dict | list)
+    get_payload = {"jsonrpc": "2.0", "id": 1, "method": "tasks/get", "params": {"id": uuid4().hex, "historyLength": 5}}
+    response = GameResponseBuilder.handle_move_response(
+        uuid4().hex, chess.Move.from_uci("e7e5"), "board.svg", "https://media.tifi.tv/bucket/public/board.png"
+    )
+
+    processor = CommandProcessor()
+    move_game = Game(chess.Board())
+    move_command = ChessCommandResponse(command_type="move", move="Nf3")
+    invalid_command = ChessCommandResponse(command_type="move", move="Nf6")
+
+    async def process_move():
+        await processor.process(game=move_game, command_response=move_command, task_id="benchmark")
+        move_game.board.pop()
+        move_game.move_history.pop()
+
+    async def process_invalid():
+        await processor.process(game=move_game, command_response=invalid_command, task_id="benchmark")
+
+    return {
+        "board_svg": (lambda: game.board._repr_svg_(), False),
+        "board_png": (lambda: cairosvg.svg2png(bytestring=svg.encode()), False) if cairosvg else None,
+        "board_upload": (upload, False),
+        "generate_board_image": (lambda: generate_board_image(game.board), False) if cairosvg else None,
+        "game_to_dict": (game.to_dict, False),
+        "game_from_dict": (lambda: Game.from_dict(data), False),
+        "validate_message_send": (lambda: schemas.A2ARequest.validate_python(send_payload), False),
+        "validate_tasks_get": (lambda: schemas.A2ARequest.validate_python(get_payload), False),
+        "response_model_dump": (lambda: response.model_dump(by_alias=True), False),
+        "response_model_dump_json": (lambda: response.model_dump(mode="json", by_alias=True), False),
+        "rpc_parse_fastapi": (
+            lambda: schemas.A2ARequest.validate_python(body_field.validate_python(json.loads(send_body))),
+            False,
+        ),
+        "rpc_parse_raw": (lambda: schemas.A2ARequest.validate_json(send_body), False),
+        "rpc_encode_fastapi": (lambda: JSONResponse(jsonable_encoder(response)).body, False),
+        "rpc_encode_raw": (lambda: RawJSONResponse(response).body, False),
+        "webhook_body_dict": (lambda: json.dumps(response.model_dump(mode="json", by_alias=True)).encode(), False),
+        "webhook_body_raw": (lambda: dump_json(response), False),
+        "command_processor_move": (process_move, True),
+        "command_processor_invalid": (process_invalid, True),
+    }
+
+
+def timer(function, is_async: bool):
+    """A function that runs `function` `loops` times and returns the elapsed seconds."""
+    if is_async:
+        loop = asyncio.new_event_loop()
+
+        async def run_loops(loops: int):
+            for _ in range(loops):
+                await function()
+
+        def run(loops: int) -> float:
+            started = time.perf_counter()
+            loop.run_until_complete(run_loops(loops))
+            return time.perf_counter() - started
+
+        return run
+
+    def run(loops: int) -> float:
+        started = time.perf_counter()
+        for _ in range(loops):
+            function()
+        return time.perf_counter() - started
+
+    return run
+
+
+def measure(run, min_time: float, repeat: int) -> dict:
+    run(1)  # warm up caches and lazy imports
+    loops = 1
+    while (elapsed := run(loops)) < min_time:
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+    samples = [run(loops) / loops for _ in range(repeat)]
+    return {
+        "loops": loops,
+        "median_seconds": statistics.median(samples),
+        "min_seconds": min(samples),
+        "stdev_seconds": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def check(results: dict, baseline: dict, threshold: float) -> tuple[dict, list[str]]:
+    """Time of each case relative to its baseline, and the cases over the threshold."""
+    ratios, regressions = {}, []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not result or not before:
+            continue
+        ratio = result["median_seconds"] / before["median_seconds"]
+        ratios[name] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: {format_time(result['median_seconds'])} vs {format_time(before['median_seconds'])} "
+                f"({(ratio - 1) * 100:+.0f}%)"
+            )
+    return ratios, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", dest="match", help="only cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--check", action="store_true", help="fail on regressions against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    configure_environment()
+    results = {}
+    for name, case in cases().items():
+        if args.match and args.match not in name:
+            continue
+        if case is None:
+            print(f"{name:<28} skipped (needs cairo)", file=sys.stderr)
+            results[name] = None
+            continue
+        results[name] = measure(timer(*case), args.min_time, args.repeat)
+        result = results[name]
+        print(
+            f"{name:<28} {format_time(result['median_seconds']):>10} "
+            f"(min {format_time(result['min_seconds'])}, {result['loops']} loops)",
+            file=sys.stderr,
+        )
+
+    summary = {
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} {platform.processor()}".strip(),
+        "results": results,
+    }
+
+    regressions = []
+    if args.check:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"No baseline at {args.baseline}, run with --save first")
+        with open(args.baseline) as f:
+            ratios, regressions = check(results, json.load(f), args.threshold)
+        print(json.dumps({**summary, "vs_baseline": ratios}, indent=2))
+    else:
+        print(json.dumps(summary, indent=2))
+
+    if args.save:
+        previous = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f).get("results", {})
+        # Keep baselines of cases that were filtered out or skipped this run.
+        merged = {**previous, **{name: result for name, result in results.items() if result}}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({**summary, "results": dict(sorted(merged.items()))}, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+
+    if regressions:
+        print(f"Slower than the baseline by more than {args.threshold:.0%}:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
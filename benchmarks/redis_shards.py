@@ -0,0 +1,141 @@
+"""
+Game storage throughput against a local Redis Cluster of 1..N shards.
+
+Starts one `redis-server` per shard in a temporary directory, assigns the
+16384 slots evenly, then hammers GameRepository.save/task_state from several
+client processes. Prints one line per shard count and a JSON summary.
+
+    uv run python -m benchmarks.redis_shards --shards 1 2 4 --clients 8 --ops 2000
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from multiprocessing import Pool
+
+os.environ["REDIS_CLUSTER"] = "true"
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import chess
+from redis import Redis
+from redis.cluster import RedisCluster
+
+SLOTS = 16384
+
+
+def start_cluster(shards: int, base_port: int, workdir: str) -> list[subprocess.Popen]:
+    processes = []
+    ports = [base_port + i for i in range(shards)]
+    for port in ports:
+        processes.append(
+            subprocess.Popen(
+                [
+                    "redis-server",
+                    "--port", str(port),
+                    "--cluster-enabled", "yes",
+                    "--cluster-config-file", f"nodes-{port}.conf",
+                    "--save", "",
+                    "--appendonly", "no",
+                    "--dir", workdir,
+                ],
+                stdout=subprocess.DEVNULL,
+            )
+        )
+
+    clients = [Redis(port=port) for port in ports]
+    for client in clients:
+        for _ in range(50):
+            try:
+                client.ping()
+                break
+            except Exception:
+                time.sleep(0.1)
+
+    per_shard = SLOTS // shards
+    for i, client in enumerate(clients):
+        first = i * per_shard
+        last = SLOTS - 1 if i == shards - 1 else first + per_shard - 1
+        client.execute_command("CLUSTER", "ADDSLOTSRANGE", first, last)
+        if i:
+            client.execute_command("CLUSTER", "MEET", "127.0.0.1", ports[0])
+
+    for _ in range(100):
+        if all(b"cluster_state:ok" in c.execute_command("CLUSTER", "INFO") for c in clients):
+            break
+        time.sleep(0.1)
+    else:
+        raise RuntimeError("cluster did not become ready")
+
+    # The workers' repositories.redis client connects to REDIS_URL.
+    os.environ["REDIS_URL"] = f"redis://127.0.0.1:{ports[0]}/0"
+    return processes
+
+
+def client_worker(args) -> int:
+    port, worker_id, ops = args
+    from repositories.game import Game, GameRepository
+
+    repo = GameRepository(RedisCluster(port=port, decode_responses=True))
+    game = Game(chess.Board(), user_id=f"user-{worker_id}", channel_id="bench")
+    for i in range(ops):
+        task_id = f"{worker_id}-{i % 100}"
+        game.version = 0
+        repo.delete(task_id)
+        repo.save(task_id, game)
+        repo.task_state(task_id)
+    return ops
+
+
+def run(shards: int, clients: int, ops: int, base_port: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="chess-bench-")
+    processes = start_cluster(shards, base_port, workdir)
+    try:
+        with Pool(clients) as pool:
+            started = time.perf_counter()
+            done = sum(pool.map(client_worker, [(base_port, c, ops) for c in range(clients)]))
+            elapsed = time.perf_counter() - started
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "shards": shards,
+        "clients": clients,
+        "game_cycles": done,
+        "seconds": round(elapsed, 3),
+        "cycles_per_second": round(done / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000, help="save+read cycles per client")
+    parser.add_argument("--base-port", type=int, default=30000)
+    args = parser.parse_args()
+
+    if not shutil.which("redis-server"):
+        sys.exit("redis-server is not on PATH")
+
+    results = []
+    for shards in args.shards:
+        result = run(shards, args.clients, args.ops, args.base_port)
+        results.append(result)
+        print(
+            f"{shards} shard(s): {result['cycles_per_second']} game saves+reads/s "
+            f"({result['game_cycles']} in {result['seconds']}s)"
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Replays traffic recorded with CAPTURE_DIR against the app, offline.
+
+Reads every capture file under the given paths (files or directories) and
+sends the recorded requests in their original order. By default they keep
+their original spacing; `--speed 2` halves the gaps and `--speed 0` sends
+them as fast as `--concurrency` allows. Requests of one task always go out
+one after another, as they did in production.
+
+Runs use the same in-process app and local stand-ins as benchmarks/e2e.py,
+but replies are replayed instead of scripted:
+
+- the LLM answers each input with the classification recorded for it, after
+  the recorded time (`--llm-delay` sets a fixed time instead)
+- benchmarks/stub_uci.py plays the recorded engine move in every recorded
+  position, taking the movetime the app asks for
+
+So a replayed game reaches the same positions as the original. Each
+request is sent in the mode it was captured in, unless `--mode` is given.
+Webhook URLs are not captured, so webhooks go to a local receiver. In
+webhook mode a message/send is timed until it is acknowledged.
+
+It reports latency percentiles per JSON-RPC method, errors, how late
+requests went out against the schedule, and per-stage percentiles.
+
+    uv run python -m benchmarks.replay /var/lib/chess-agent/capture --speed 4 --output replay.json
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict, deque
+
+
+def capture_files(paths: list[str]) -> list[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "capture-*.jsonl*")))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def load_capture(paths: list[str]) -> dict[str, list[dict]]:
+    """Records of every type, each list sorted by time."""
+    records = defaultdict(list)
+    for path in capture_files(paths):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash or a rotation.
+                    continue
+                records[record.get("type")].append(record)
+    for kind in records.values():
+        kind.sort(key=lambda record: record["ts"])
+    return records
+
+
+def engine_book(engine_records: list[dict]) -> dict[str, str]:
+    return {" ".join(record["fen"].split()[:4]): record["move"] for record in engine_records}
+
+
+class RecordedModel:
+    """Answers each input with the classifications recorded for it, in order.
+
+    An input seen more often in the replay than in the capture gets its last
+    answer again; an unknown input is answered with an `unknown` command.
+    """
+
+    def __init__(self, classifications: list[dict], llm_delay: float | None = None):
+        self.answers: dict[str, deque] = defaultdict(deque)
+        for record in classifications:
+            self.answers[record["input"]].append((record["output"], record["seconds"]))
+        self.llm_delay = llm_delay
+        self.misses = 0
+
+    def next_answer(self, messages) -> tuple[str, float]:
+        from pydantic_ai.messages import UserPromptPart
+
+        prompts = [part.content for message in messages for part in message.parts if isinstance(part, UserPromptPart)]
+        answers = self.answers.get(str(prompts[-1]).strip())
+        if not answers:
+            self.misses += 1
+            return json.dumps({"command_type": "unknown"}), 0.0
+        output, seconds = answers.popleft() if len(answers) > 1 else answers[0]
+        return json.dumps(output), seconds if self.llm_delay is None else self.llm_delay
+
+    def model(self):
+        from pydantic_ai.messages import ModelResponse, ToolCallPart
+        from pydantic_ai.models.function import FunctionModel, DeltaToolCall
+
+        async def answer(messages, info):
+            output, seconds = self.next_answer(messages)
+            await asyncio.sleep(seconds)
+            return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, output)])
+
+        async def stream(messages, info):
+            output, seconds = self.next_answer(messages)
+            await asyncio.sleep(seconds)
+            yield {0: DeltaToolCall(name=info.output_tools[0].name, json_args=output)}
+
+        return FunctionModel(answer, stream_function=stream)
+
+
+def task_key(payload) -> str | None:
+    if not isinstance(payload, dict):
+        return None
+    params = payload.get("params") or {}
+    message = params.get("message") or {}
+    return message.get("taskId") or params.get("id") or message.get("contextId")
+
+
+def with_receiver(payload, webhook_url: str):
+    """The payload with its webhook config pointing at `webhook_url`.
+
+    Captured URLs are redacted, and requests captured in blocking mode have
+    none, which webhook mode needs; the other modes ignore it.
+    """
+    if isinstance(payload, list):
+        return [with_receiver(item, webhook_url) for item in payload]
+    if isinstance(payload, dict) and payload.get("method") == "message/send":
+        configuration = payload["params"].setdefault("configuration", {"acceptedOutputModes": ["text/plain"]})
+        configuration["pushNotificationConfig"] = {
+            "url": webhook_url,
+            "authentication": {"schemes": ["TelexApiKey"], "credentials": "replay"},
+        }
+    return payload
+
+
+async def send(client, payload) -> bool:
+    """Sends one recorded payload and returns whether it got a JSON-RPC error."""
+    if isinstance(payload, dict) and payload.get("method") == "message/stream":
+        events = []
+        async with client.stream("POST", "/", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    events.append(json.loads(line[5:]))
+        return any(event.get("error") for event in events)
+
+    if isinstance(payload, str):
+        # A body that was not valid JSON, captured as text.
+        response = await client.post("/", content=payload, headers={"Content-Type": "application/json"})
+        return response.status_code >= 400
+    response = await client.post("/", json=payload)
+    response.raise_for_status()
+    if not response.content:
+        return False
+    answers = response.json()
+    return any(answer.get("error") for answer in (answers if isinstance(answers, list) else [answers]))
+
+
+async def run(args, records: dict[str, list[dict]]) -> dict:
+    import httpx
+    import main
+    from benchmarks.e2e import SpanRecorder, WebhookReceiver, percentiles, serve_app
+    from repositories.agent import chess_agent
+    from repositories.engine import engine_pool
+    from helpers.tracing import tracer
+
+    book = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    with book:
+        json.dump(engine_book(records["engine"]), book)
+    stub = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_uci.py")
+    engine_pool.path = [sys.executable, stub, "--book", book.name]
+
+    model = RecordedModel(records["classification"], args.llm_delay)
+    chess_agent.model = model.model()
+    recorder = SpanRecorder()
+    tracer.exporter, tracer.sample_rate = recorder, 1.0
+
+    receiver = WebhookReceiver()
+    await receiver.start()
+
+    requests = records["request"][: args.limit] if args.limit else records["request"]
+    first_ts = requests[0]["ts"]
+    latencies: dict[str, list[float]] = defaultdict(list)
+    lateness: list[float] = []
+    errors: list[str] = []
+    previous_of_task: dict[str, asyncio.Task] = {}
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def replay(record: dict, client, started: float, previous: asyncio.Task | None):
+        payload = with_receiver(record["payload"], receiver.url)
+        if isinstance(payload, dict):
+            method = payload.get("method", "unknown")
+        else:
+            method = "batch" if isinstance(payload, list) else "invalid"
+        due = started + ((record["ts"] - first_ts) / args.speed if args.speed else 0)
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        if previous:
+            await asyncio.wait([previous])
+
+        async with slots:
+            if args.speed:
+                lateness.append(max(0.0, time.perf_counter() - due))
+            # Which path message/send takes is read from this module global.
+            main.DEPLOYMENT_TYPE = args.mode or record.get("mode") or "blocking"
+            sent = time.perf_counter()
+            try:
+                if await send(client, payload):
+                    errors.append(f"{method}: JSON-RPC error")
+            except Exception as e:
+                errors.append(f"{method}: {type(e).__name__}")
+                return
+            latencies[method].append(time.perf_counter() - sent)
+
+    try:
+        async with serve_app() as base_url, httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            started = time.perf_counter()
+            replays = []
+            for record in requests:
+                key = task_key(record["payload"])
+                task = asyncio.create_task(replay(record, client, started, previous_of_task.get(key)))
+                if key:
+                    previous_of_task[key] = task
+                replays.append(task)
+            await asyncio.gather(*replays)
+            elapsed = time.perf_counter() - started
+            # Let webhook deliveries that end after the acknowledgement finish.
+            await asyncio.sleep(1.0)
+    finally:
+        receiver.close()
+        os.unlink(book.name)
+
+    sent = sum(len(values) for values in latencies.values())
+    return {
+        "requests": len(requests),
+        "sent": sent,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(sent / elapsed, 2) if elapsed else None,
+        "latency_seconds": {method: percentiles(values) for method, values in sorted(latencies.items())},
+        "schedule_lag_seconds": percentiles(lateness),
+        "errors": len(errors),
+        "error_types": {error: errors.count(error) for error in sorted(set(errors))},
+        "llm_misses": model.misses,
+        "stages_seconds": {name: percentiles(values) for name, values in sorted(recorder.durations.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="capture files or directories")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression, 0 = as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=64, help="requests in flight at most")
+    parser.add_argument("--mode", choices=("blocking", "webhook"), help="override the captured deployment mode")
+    parser.add_argument("--llm-delay", type=float, help="seconds per LLM answer instead of the recorded ones")
+    parser.add_argument("--limit", type=int, help="replay only the first this many requests")
+    parser.add_argument("--redis-url", help="use this Redis instead of fakeredis")
+    parser.add_argument("--output", help="also write the JSON summary to this file")
+    args = parser.parse_args()
+
+    records = load_capture(args.paths)
+    if not records["request"]:
+        sys.exit(f"No captured requests in {', '.join(args.paths)}")
+
+    # The app under replay must not capture its own traffic. The setting is
+    # read when repositories.env is first imported, so drop it before that.
+    os.environ.pop("CAPTURE_DIR", None)
+    from benchmarks.e2e import configure_environment, git_commit
+
+    configure_environment(args)
+    result = asyncio.run(run(args, records))
+
+    summary = {
+        "commit": git_commit(),
+        "capture": {
+            "files": len(capture_files(args.paths)),
+            "requests": len(records["request"]),
+            "classifications": len(records["classification"]),
+            "engine_moves": len(records["engine"]),
+            "seconds": round(records["request"][-1]["ts"] - records["request"][0]["ts"], 3),
+        },
+        "config": {"speed": args.speed, "concurrency": args.concurrency, "mode": args.mode, "llm_delay": args.llm_delay},
+        **result,
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+N single JSON-RPC requests vs one JSON-RPC batch of N.
+
+Sends `--requests` chat messages, each to a new task, first as separate
+HTTP requests one after another (as an orchestrator managing many games
+would), then as one batch array. By default the app runs in-process with a
+FunctionModel that answers after `--llm-delay` seconds; `--url` targets a
+running server and its configured model instead. Needs Redis at REDIS_URL.
+
+    uv run python -m benchmarks.rpc_batch --requests 50
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+from uuid import uuid4
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("DEPLOYMENT_TYPE", "blocking")
+os.environ.setdefault("ARCHIVER_ENABLED", "false")
+
+import httpx
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import FunctionModel
+from repositories.agent import chess_agent
+
+
+def scripted_model(llm_delay: float) -> FunctionModel:
+    async def answer(messages, info):
+        await asyncio.sleep(llm_delay)
+        args = {"command_type": "chat", "chat_query_response": "Control the centre."}
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, json.dumps(args))])
+
+    return FunctionModel(answer)
+
+
+def send_request(i: int) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": i,
+        "method": "message/send",
+        "params": {
+            "message": {
+                "kind": "message",
+                "role": "user",
+                "messageId": uuid4().hex,
+                "taskId": uuid4().hex,
+                "parts": [{"kind": "text", "text": "Why is the centre important?"}],
+            }
+        },
+    }
+
+
+async def time_singles(client: httpx.AsyncClient, n: int) -> float:
+    started = time.perf_counter()
+    for i in range(n):
+        response = await client.post("/", json=send_request(i))
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def time_batch(client: httpx.AsyncClient, n: int) -> float:
+    started = time.perf_counter()
+    response = await client.post("/", json=[send_request(i) for i in range(n)])
+    response.raise_for_status()
+    answered = response.json()
+    errors = [item for item in answered if item.get("error")]
+    if len(answered) != n or errors:
+        raise RuntimeError(f"batch answered {len(answered)}/{n}, {len(errors)} errors")
+    return time.perf_counter() - started
+
+
+async def run(args):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=None)
+    else:
+        from main import app
+
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+        )
+
+    async with client:
+        singles = await time_singles(client, args.requests)
+        batch = await time_batch(client, args.requests)
+
+    summary = {
+        "requests": args.requests,
+        "target": args.url or f"in-process, llm delay {args.llm_delay}s",
+        "singles_seconds": round(singles, 3),
+        "singles_requests_per_second": round(args.requests / singles, 1),
+        "batch_seconds": round(batch, 3),
+        "batch_requests_per_second": round(args.requests / batch, 1),
+        "speedup": round(singles / batch, 2),
+    }
+    print(
+        f"{args.requests} requests: {summary['singles_seconds']}s one by one, "
+        f"{summary['batch_seconds']}s as one batch ({summary['speedup']}x)"
+    )
+    print(json.dumps(summary, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--llm-delay", type=float, default=0.05)
+    parser.add_argument("--url", help="benchmark a running server instead")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run(args))
+    else:
+        with chess_agent.override(model=scripted_model(args.llm_delay)):
+            asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Self-play soak test: plays complete games through the A2A endpoint and
+fails when process or Redis resources keep growing.
+
+Uses the same in-process app and local stand-ins as benchmarks/e2e.py.
+`--concurrency` scripted players pick random legal moves until `--games`
+games have ended (by mate, draw, or a resignation after `--max-moves`) or
+`--duration` seconds have passed.
+
+Every `--sample-interval` seconds it records:
+
+- the process's RSS
+- its child processes (engines)
+- open file descriptors
+- files and bytes in the temp directory
+- Redis keys and memory
+
+Data TTLs are shortened to `--ttl` seconds, so finished games, idempotency
+entries and event logs expire during the run; keys that never expire then
+show up as growth. The first `--warmup` share of the samples is ignored.
+A resource fails when its least-squares trend over the rest grows by more
+than `--tolerance` of its starting level (and by at least a small absolute
+amount), and its last third is higher than its first third.
+
+    uv run python -m benchmarks.soak --games 2000 --concurrency 16 --output soak.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from uuid import uuid4
+
+# Growth below these is noise, whatever the relative change.
+MIN_GROWTH = {
+    "rss_mb": 20,
+    "children": 1,
+    "open_fds": 10,
+    "tmp_files": 20,
+    "tmp_mb": 5,
+    "redis_keys": 100,
+    "redis_memory_mb": 5,
+}
+TTL_SETTINGS = (
+    "COMPLETED_GAME_TTL_SECONDS",
+    "ABANDONED_GAME_TTL_SECONDS",
+    "IDEMPOTENCY_TTL_SECONDS",
+    "TASK_CACHE_TTL_SECONDS",
+    "TASK_EVENT_LOG_TTL_SECONDS",
+    "TASK_CANCEL_TTL_SECONDS",
+)
+
+
+def rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return None
+
+
+def child_count() -> int | None:
+    pid = str(os.getpid())
+    try:
+        entries = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return None
+    children = 0
+    for entry in entries:
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the ppid follows its ")".
+                if f.read().rsplit(")", 1)[1].split()[1] == pid:
+                    children += 1
+        except (OSError, IndexError):
+            continue
+    return children
+
+
+def open_fds() -> int | None:
+    for path in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return None
+
+
+def tmp_usage() -> tuple[int, float]:
+    files, size = 0, 0
+    for root, _, names in os.walk(tempfile.gettempdir()):
+        for name in names:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+                files += 1
+            except OSError:
+                continue
+    return files, size / 2**20
+
+
+def redis_usage(redis_client) -> tuple[int | None, float | None]:
+    # SCAN touches every key, so lazily expired keys are gone before counting.
+    try:
+        keys = sum(1 for _ in redis_client.scan_iter(count=1000))
+    except Exception:
+        keys = None
+    try:
+        memory = redis_client.info("memory")["used_memory"] / 2**20
+    except Exception:
+        memory = None
+    return keys, memory
+
+
+def take_sample(started: float, progress: dict, redis_client) -> dict:
+    tmp_files, tmp_mb = tmp_usage()
+    redis_keys, redis_memory_mb = redis_usage(redis_client)
+    return {
+        "seconds": round(time.monotonic() - started, 1),
+        "games": progress["games"],
+        "moves": progress["moves"],
+        "rss_mb": rss_mb(),
+        "children": child_count(),
+        "open_fds": open_fds(),
+        "tmp_files": tmp_files,
+        "tmp_mb": tmp_mb,
+        "redis_keys": redis_keys,
+        "redis_memory_mb": redis_memory_mb,
+    }
+
+
+def trend(samples: list[dict], name: str, warmup: float, tolerance: float) -> dict | None:
+    points = [(s["seconds"], s[name]) for s in samples[int(len(samples) * warmup):] if s[name] is not None]
+    if len(points) < 6:
+        return None
+
+    times, values = zip(*points)
+    slope = statistics.linear_regression(times, values).slope
+    growth = slope * (times[-1] - times[0])
+    third = len(values) // 3
+    first, last = statistics.median(values[:third]), statistics.median(values[-third:])
+    allowed = max(MIN_GROWTH[name], tolerance * abs(first))
+    return {
+        "first": round(first, 2),
+        "last": round(last, 2),
+        "growth": round(growth, 2),
+        "allowed": round(allowed, 2),
+        "leaking": growth > allowed and last > first,
+    }
+
+
+async def play_game(client, mode: str, rng: random.Random, receiver, max_moves: int, progress: dict):
+    import chess
+    from benchmarks.e2e import AI_MOVE, send_move
+
+    task_id, board, timings = uuid4().hex, chess.Board(), {"accepted": [], "first_event": []}
+    for _ in range(max_moves):
+        move = rng.choice(list(board.legal_moves))
+        san = board.san(move)
+        board.push(move)
+        text, _ = await send_move(client, mode, task_id, san, receiver, timings)
+        progress["moves"] += 1
+        if board.is_game_over():
+            # The player's move ended the game, which the server answers without an engine move.
+            if "Game over" not in text:
+                raise RuntimeError(f"no game over in answer to a final move: {text[:200]}")
+            return
+
+        reply = AI_MOVE.search(text)
+        if not reply:
+            raise RuntimeError(f"no engine move in answer: {text[:200]}")
+        board.push_uci(reply.group(1))
+        if board.is_game_over():
+            return
+
+    await send_move(client, mode, task_id, "resign", receiver, timings)
+
+
+async def player(client, args, seed: int, receiver, progress: dict, deadline: float):
+    rng = random.Random(seed)
+    while progress["games"] + progress["playing"] < args.games and time.monotonic() < deadline:
+        progress["playing"] += 1
+        try:
+            await play_game(client, args.mode, rng, receiver, args.max_moves, progress)
+        except Exception as e:
+            progress["errors"].append(f"{type(e).__name__}: {e}"[:300])
+        finally:
+            progress["playing"] -= 1
+            progress["games"] += 1
+
+
+async def run(args) -> tuple[list[dict], dict]:
+    import httpx
+    import main
+    from benchmarks.e2e import WebhookReceiver, engine_command, scripted_model, serve_app
+    from repositories.agent import chess_agent
+    from repositories.engine import engine_pool
+    from repositories.redis import get_redis_client
+
+    chess_agent.model = scripted_model(args.llm_delay)
+    engine_pool.path = engine_command(args)
+    main.DEPLOYMENT_TYPE = "blocking" if args.mode == "streaming" else args.mode
+
+    receiver = WebhookReceiver()
+    await receiver.start()
+
+    redis_client = get_redis_client()
+    progress = {"games": 0, "moves": 0, "playing": 0, "errors": []}
+    started = time.monotonic()
+    deadline = started + args.duration if args.duration else float("inf")
+    samples = []
+
+    async def sample_forever():
+        while True:
+            samples.append(await asyncio.to_thread(take_sample, started, progress, redis_client))
+            s = samples[-1]
+            print(
+                f"{s['seconds']:>7}s games {s['games']:>5} moves {s['moves']:>6} rss {s['rss_mb']:.0f}MB "
+                f"children {s['children']} fds {s['open_fds']} tmp {s['tmp_files']} files "
+                f"redis {s['redis_keys']} keys, errors {len(progress['errors'])}",
+                file=sys.stderr,
+            )
+            await asyncio.sleep(args.sample_interval)
+
+    sampler = asyncio.create_task(sample_forever())
+    try:
+        async with serve_app() as base_url, httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            await asyncio.gather(
+                *(player(client, args, args.seed + i, receiver, progress, deadline) for i in range(args.concurrency))
+            )
+    finally:
+        sampler.cancel()
+        samples.append(await asyncio.to_thread(take_sample, started, progress, redis_client))
+        receiver.close()
+
+    return samples, progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=("blocking", "webhook", "streaming"), default="blocking")
+    parser.add_argument("--max-moves", type=int, default=150, help="resign after this many moves")
+    parser.add_argument("--sample-interval", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=0.2, help="share of samples to ignore")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed growth, 0.1 = 10%%")
+    parser.add_argument("--ttl", type=int, default=60, help="seconds for every data TTL")
+    parser.add_argument("--llm-delay", type=float, default=0.0)
+    parser.add_argument("--engine", choices=("auto", "stub", "stockfish"), default="auto")
+    parser.add_argument("--engine-delay", type=float, default=0.0)
+    parser.add_argument("--redis-url", help="use this Redis instead of fakeredis")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    from benchmarks.e2e import configure_environment
+
+    for setting in TTL_SETTINGS:
+        os.environ[setting] = str(args.ttl)
+    configure_environment(args)
+    samples, progress = asyncio.run(run(args))
+
+    trends = {name: trend(samples, name, args.warmup, args.tolerance) for name in MIN_GROWTH}
+    leaking = sorted(name for name, result in trends.items() if result and result["leaking"])
+    report = {
+        "games": progress["games"],
+        "moves": progress["moves"],
+        "errors": len(progress["errors"]),
+        "first_errors": progress["errors"][:10],
+        "seconds": samples[-1]["seconds"],
+        "trends": trends,
+        "leaking": leaking,
+        "samples": samples,
+    }
+    print(json.dumps({key: value for key, value in report.items() if key != "samples"}, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if leaking:
+        print(f"Growing over the run: {', '.join(leaking)}", file=sys.stderr)
+        sys.exit(1)
+    if not any(trends.values()):
+        print("Too few samples to judge trends, lower --sample-interval or run longer", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
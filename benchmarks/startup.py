@@ -0,0 +1,132 @@
+"""
+Cold start time: how long a fresh API process takes to listen and to be ready.
+
+Starts the app `--runs` times, each in a new interpreter, with the local
+stand-ins of benchmarks/e2e.py. It polls `GET /` and `GET /ready` every
+few milliseconds and reports, as medians over the runs:
+
+- import_seconds: process start until main.py was imported, from /ready
+- listening_seconds: process start until the first answer to `GET /`
+- ready_seconds: process start until `GET /ready` answered 200
+- the time of each warm-up step
+
+Times are measured from the spawn of the child process, so interpreter
+start-up counts too. Board rendering needs cairo; without it the renderer
+step never succeeds and the run times out.
+
+    uv run python -m benchmarks.startup --runs 5 --output startup.json
+"""
+
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+
+
+def serve(args):
+    """The child process: the app on `--port`, under uvicorn."""
+    from benchmarks.e2e import configure_environment, engine_command
+
+    configure_environment(args)
+    import uvicorn
+    import main
+    from repositories.agent import chess_agent
+    from repositories.engine import engine_pool
+    from benchmarks.e2e import scripted_model
+
+    chess_agent.model = scripted_model(0.0)
+    engine_pool.path = engine_command(args)
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_once(args) -> dict:
+    import httpx
+
+    port = free_port()
+    command = [sys.executable, "-m", "benchmarks.startup", "--serve", "--port", str(port), "--engine", args.engine]
+    if args.redis_url:
+        command += ["--redis-url", args.redis_url]
+
+    spawned = time.perf_counter()
+    child = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    listening, response = None, None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while time.perf_counter() - spawned < args.timeout:
+                if child.poll() is not None:
+                    raise RuntimeError(f"the app exited with {child.returncode}")
+                try:
+                    if listening is None:
+                        client.get("/")
+                        listening = time.perf_counter() - spawned
+                    response = client.get("/ready")
+                except httpx.TransportError:
+                    time.sleep(args.poll_interval)
+                    continue
+                if response.status_code == 200:
+                    ready = time.perf_counter() - spawned
+                    return {"listening_seconds": listening, "ready_seconds": ready, "app": response.json()}
+                time.sleep(args.poll_interval)
+            raise TimeoutError(f"not ready after {args.timeout}s: {response.json() if response else 'no answer'}")
+    finally:
+        child.terminate()
+        child.wait()
+
+
+def median(values: list[float]) -> float:
+    return round(statistics.median(values), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--poll-interval", type=float, default=0.005)
+    parser.add_argument("--engine", choices=("auto", "stub", "stockfish"), default="auto")
+    parser.add_argument("--redis-url", help="use this Redis instead of fakeredis")
+    parser.add_argument("--output", help="also write the JSON summary to this file")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.engine_delay = 0.0
+
+    if args.serve:
+        serve(args)
+        return
+
+    runs = []
+    for i in range(args.runs):
+        runs.append(measure_once(args))
+        print(
+            f"run {i + 1}: import {runs[-1]['app']['import_seconds']}s, "
+            f"listening {runs[-1]['listening_seconds']:.3f}s, ready {runs[-1]['ready_seconds']:.3f}s",
+            file=sys.stderr,
+        )
+
+    steps = {name for run in runs for name in run["app"]["steps"]}
+    summary = {
+        "runs": args.runs,
+        "import_seconds": median([run["app"]["import_seconds"] for run in runs]),
+        "listening_seconds": median([run["listening_seconds"] for run in runs]),
+        "ready_seconds": median([run["ready_seconds"] for run in runs]),
+        "steps_seconds": {
+            name: median([run["app"]["steps"][name]["seconds"] for run in runs]) for name in sorted(steps)
+        },
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+A minimal UCI engine for benchmarks: answers every search with a legal move
+after a fixed `--delay` (or the requested movetime), without thinking.
+
+The move is picked from the position alone, so runs are repeatable. With
+`--book`, a JSON file mapping positions (the first four FEN fields) to UCI
+moves, booked positions get the booked move; benchmarks/replay.py uses this
+to replay captured engine moves. `stop` ends a search early, like a real engine.
+
+    python benchmarks/stub_uci.py --delay 0.02
+"""
+
+import sys
+import json
+import zlib
+import argparse
+import threading
+import chess
+
+
+def send(line: str):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+
+BOOK: dict[str, str] = {}
+
+
+def pick_move(board: chess.Board) -> chess.Move:
+    booked = BOOK.get(" ".join(board.fen().split()[:4]))
+    if booked and chess.Move.from_uci(booked) in board.legal_moves:
+        return chess.Move.from_uci(booked)
+    moves = sorted(board.legal_moves, key=chess.Move.uci)
+    return moves[zlib.crc32(board.fen().encode()) % len(moves)]
+
+
+def search(board: chess.Board, seconds: float, depth: int, stop: threading.Event):
+    stop.wait(seconds)
+    move = pick_move(board)
+    board.push(move)
+    pv = [move] + ([pick_move(board)] if not board.is_game_over() else [])
+    send(f"info depth {depth} score cp 0 pv {' '.join(m.uci() for m in pv)}")
+    send(f"bestmove {move.uci()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--delay", type=float, help="seconds per search, instead of the requested movetime")
+    parser.add_argument("--book", help="JSON file of position -> UCI move")
+    args = parser.parse_args()
+    if args.book:
+        with open(args.book) as f:
+            BOOK.update(json.load(f))
+
+    board = chess.Board()
+    stop = threading.Event()
+    searching: threading.Thread | None = None
+
+    for line in sys.stdin:
+        words = line.split()
+        if not words:
+            continue
+        command = words[0]
+
+        if command == "uci":
+            send("id name benchmark stub")
+            send("option name MultiPV type spin default 1 min 1 max 500")
+            send("uciok")
+        elif command == "isready":
+            send("readyok")
+        elif command == "position":
+            board = chess.Board() if words[1] == "startpos" else chess.Board(" ".join(words[2:8]))
+            if "moves" in words:
+                for move in words[words.index("moves") + 1:]:
+                    board.push_uci(move)
+        elif command == "go":
+            seconds = args.delay
+            if seconds is None:
+                seconds = int(words[words.index("movetime") + 1]) / 1000 if "movetime" in words else 0.1
+            depth = int(words[words.index("depth") + 1]) if "depth" in words else 1
+            stop.clear()
+            searching = threading.Thread(target=search, args=(board.copy(), seconds, depth, stop))
+            searching.start()
+        elif command == "stop":
+            stop.set()
+        elif command == "quit":
+            stop.set()
+            break
+
+    if searching:
+        searching.join()
+
+
+if __name__ == "__main__":
+    main()
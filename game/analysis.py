@@ -0,0 +1,196 @@
+import io
+import time
+import asyncio
+import chess
+import chess.pgn
+import chess.engine
+import schemas
+from repositories.engine import engine_pool, score_dict
+from repositories.cancellation import TaskCanceledError
+from repositories.env import (
+    ANALYSIS_MAX_POSITIONS,
+    ANALYSIS_TIME_PER_POSITION,
+    ANALYSIS_MAX_TIME_PER_POSITION,
+    ANALYSIS_MAX_DEPTH,
+    ANALYSIS_CHUNK_SIZE,
+)
+from helpers.task_locks import task_locks
+from helpers.tracing import tracer
+from game.init import task_cancellation
+from game.command_processor import build_error_response
+from game.responses import GameResponseBuilder
+from game.progress import EventCallback, TaskProgress, finish_turn, fail_turn
+
+
+def bulk_analysis_request(message: schemas.Message) -> dict | None:
+    """The DataPart of a message that asks for bulk analysis, if any.
+
+    It carries either `fens` (a list of FEN strings) or `pgn` (one or more
+    games), and optionally `limit` with `time` and/or `depth` per position.
+    """
+    for part in message.parts:
+        if isinstance(part, schemas.DataPart) and ("fens" in part.data or "pgn" in part.data):
+            return part.data
+    return None
+
+
+def positions_from_request(request: dict) -> list[dict]:
+    """Positions to analyse in request order.
+
+    PGN input yields the position after every move, with the game number,
+    ply and the move played.
+    """
+    positions = []
+    if "pgn" in request:
+        stream = io.StringIO(str(request["pgn"]))
+        game_number = 0
+        while (pgn_game := chess.pgn.read_game(stream)) is not None:
+            board = pgn_game.board()
+            for ply, move in enumerate(pgn_game.mainline_moves(), start=1):
+                played = board.san(move)
+                board.push(move)
+                positions.append({"game": game_number, "ply": ply, "played": played, "fen": board.fen()})
+            game_number += 1
+    else:
+        fens = request.get("fens")
+        if not isinstance(fens, list):
+            raise ValueError("`fens` must be a list of FEN strings")
+        positions = [{"fen": str(fen)} for fen in fens]
+
+    for index, position in enumerate(positions):
+        position["index"] = index
+    return positions
+
+
+def analysis_limit(request: dict) -> chess.engine.Limit:
+    """Per-position search limit asked for, capped by the server's limits."""
+    limit = request.get("limit") or {}
+    search_time = min(float(limit.get("time", ANALYSIS_TIME_PER_POSITION)), ANALYSIS_MAX_TIME_PER_POSITION)
+    depth = min(int(limit["depth"]), ANALYSIS_MAX_DEPTH) if limit.get("depth") else None
+    return chess.engine.Limit(time=search_time, depth=depth)
+
+
+def position_key(fen: str) -> str:
+    # Move counters do not change the evaluation.
+    return " ".join(fen.split()[:4])
+
+
+async def analyse_position(fen: str, limit: chess.engine.Limit) -> dict:
+    try:
+        board = chess.Board(fen)
+    except ValueError:
+        return {"error": "Invalid FEN"}
+    if not board.is_valid():
+        return {"error": "Illegal position"}
+    if board.is_game_over():
+        return {"outcome": board.result()}
+
+    try:
+        info = await engine_pool.analyse(board, limit)
+    except Exception as e:
+        # Only this position fails; the other searches carry on.
+        print(f"Analysis of {fen} failed: {e!r}")
+        return {"error": f"Analysis failed: {type(e).__name__}"}
+    pv = info.get("pv") or []
+    return {
+        "score": score_dict(info["score"]) if "score" in info else None,
+        "depth": info.get("depth"),
+        "best_move": board.san(pv[0]) if pv else None,
+        "pv": [move.uci() for move in pv],
+    }
+
+
+async def process_bulk_analysis(
+    task_id: str,
+    user_message: schemas.Message,
+    request: dict,
+    on_event: EventCallback | None = None,
+):
+    progress = TaskProgress(task_id, on_event)
+    with tracer.span("process_bulk_analysis", {"task.id": task_id}):
+        try:
+            return await task_cancellation.run(
+                task_id, run_bulk_analysis(task_id, user_message, request, progress)
+            )
+        except TaskCanceledError:
+            print(f"Analysis {task_id} was canceled")
+            response = schemas.SendMessageResponse(
+                result=schemas.Task(id=task_id, status=schemas.TaskStatus(state=schemas.TaskState.canceled))
+            )
+            return await finish_turn(task_id, progress, user_message, response)
+        except (Exception, asyncio.CancelledError) as e:
+            await fail_turn(task_id, progress, e)
+            raise
+
+
+async def run_bulk_analysis(
+    task_id: str,
+    user_message: schemas.Message,
+    request: dict,
+    progress: TaskProgress,
+):
+    """Analyses every distinct position once, spread over the engine pool.
+
+    Results are streamed as appended chunks of the `analysis` artifact in
+    completion order; each carries its `index` in the request.
+    """
+    async with task_locks.hold(task_id):
+        await progress.emit(GameResponseBuilder.working_status_event(task_id))
+
+        try:
+            positions = positions_from_request(request)
+            limit = analysis_limit(request)
+        except (TypeError, ValueError) as e:
+            response = build_error_response("Invalid analysis request", str(e))
+            return await finish_turn(task_id, progress, user_message, response)
+
+        if not positions:
+            response = build_error_response("No positions", "Send `fens` or a `pgn` with at least one move")
+            return await finish_turn(task_id, progress, user_message, response)
+        if len(positions) > ANALYSIS_MAX_POSITIONS:
+            response = build_error_response(
+                "Too many positions", f"At most {ANALYSIS_MAX_POSITIONS} positions per request"
+            )
+            return await finish_turn(task_id, progress, user_message, response)
+
+        groups: dict[str, list[dict]] = {}
+        for position in positions:
+            groups.setdefault(position_key(position["fen"]), []).append(position)
+
+        started = time.perf_counter()
+        results = []
+        chunk = []
+        first_chunk = True
+
+        async def analyse_group(group: list[dict]):
+            return group, await analyse_position(group[0]["fen"], limit)
+
+        searches = [asyncio.create_task(analyse_group(group)) for group in groups.values()]
+        try:
+            for search in asyncio.as_completed(searches):
+                group, analysis = await search
+                chunk.extend({**position, **analysis} for position in group)
+                if len(chunk) >= ANALYSIS_CHUNK_SIZE:
+                    await progress.emit(GameResponseBuilder.analysis_chunk_event(task_id, chunk, first_chunk, False))
+                    results.extend(chunk)
+                    chunk = []
+                    first_chunk = False
+        finally:
+            for search in searches:
+                search.cancel()
+
+        await progress.emit(GameResponseBuilder.analysis_chunk_event(task_id, chunk, first_chunk, True))
+        results.extend(chunk)
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "positions": len(positions),
+            "unique_positions": len(groups),
+            "seconds": round(elapsed, 3),
+            "positions_per_second": round(len(positions) / elapsed, 1) if elapsed else None,
+        }
+        print(f"Analysed {summary['positions']} positions ({summary['unique_positions']} unique) in {summary['seconds']}s")
+
+        results.sort(key=lambda result: result["index"])
+        response = GameResponseBuilder.handle_bulk_analysis(task_id, results, summary)
+        return await finish_turn(task_id, progress, user_message, response)
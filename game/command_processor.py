@@ -1,16 +1,30 @@
+import inspect
 import schemas
 from uuid import uuid4
 from repositories.game import Game
+from repositories.env import HINT_DEPTH, ANALYSIS_DEPTH, ANALYSIS_MULTIPV
 from repositories.game import ChessCommandResponse
 from game.responses import GameResponseBuilder
+from helpers.tracing import traced
 
-def build_error_response(message: str, data: str | None = None):
+class RetryableError(schemas.InvalidParamsError):
+    """An error caused by a race with another request. Clients see a plain
+    InvalidParamsError; the same message may succeed when sent again."""
+
+
+def build_error_response(message: str, data: str | None = None, retryable: bool = False):
+    error_type = RetryableError if retryable else schemas.InvalidParamsError
     return schemas.JSONRPCResponse(
         messageId=uuid4().hex,
-        error=schemas.InvalidParamsError(message=message, data=data),
+        error=error_type(message=message, data=data),
     )
 
 
+def is_replayable(response) -> bool:
+    """Whether a retry of the same message should get this response again."""
+    return not isinstance(getattr(response, "error", None), RetryableError)
+
+
 class CommandProcessor:
     def __init__(self):
         self.handlers = {
@@ -22,7 +36,8 @@ class CommandProcessor:
             "hint": self._handle_hint,
         }
 
-    def process(self, *, game: Game, command_response: ChessCommandResponse, task_id: str):
+    @traced("CommandProcessor.process")
+    async def process(self, *, game: Game, command_response: ChessCommandResponse, task_id: str):
         handler = self.handlers.get(command_response.command_type)
         if not handler:
             return build_error_response(
@@ -30,7 +45,10 @@ class CommandProcessor:
                 f"Command '{command_response.command_type}' not supported",
             )
 
-        return handler(game=game, command_response=command_response, task_id=task_id)
+        response = handler(game=game, command_response=command_response, task_id=task_id)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
 
     def _handle_board(self, *, game: Game, **kwargs):
         return GameResponseBuilder.get_board_state(game)
@@ -61,11 +79,21 @@ class CommandProcessor:
             command_response.error_message or "Command not recognized",
         )
 
-    def _handle_analysis(self, **kwargs):
-        return build_error_response("Not implemented", "Analysis feature is coming soon.")
+    async def _handle_analysis(self, *, game: Game, **kwargs):
+        if game.board.is_game_over():
+            return build_error_response("Game is over", "There is no position left to analyse")
+
+        analysis = await game.analyse(ANALYSIS_DEPTH, multipv=ANALYSIS_MULTIPV)
+        return GameResponseBuilder.handle_analysis(game.board, analysis)
+
+    async def _handle_hint(self, *, game: Game, **kwargs):
+        if game.board.is_game_over():
+            return build_error_response("Game is over", "There are no moves left to play")
 
-    def _handle_hint(self, **kwargs):
-        return build_error_response("Not implemented", "Hint feature is coming soon.")
+        # Any stored line for this position will do, usually the one from the
+        # engine's last move.
+        analysis = await game.analyse(HINT_DEPTH, min_depth=0)
+        return GameResponseBuilder.handle_hint(game.board, analysis)
 
 
 
@@ -1,4 +1,9 @@
-from repositories.redis import r as redis_client
 from repositories.game import GameRepository
+from repositories.events import TaskEventLog
+from repositories.cancellation import TaskCancellation
+from repositories.tasks import TaskStore
 
-game_repo = GameRepository(redis_client)
+game_repo = GameRepository()
+event_log = TaskEventLog()
+task_cancellation = TaskCancellation()
+task_store = TaskStore()
@@ -1,37 +1,227 @@
-from repositories.game import Game
-from game.utils import generate_board_image
-from repositories.env import CHESS_ENGINE_PATH
+import time
+import asyncio
+import schemas
+from uuid import uuid4
+from repositories.game import Game, GameConflictError
+from repositories.cancellation import TaskCanceledError
+from game.utils import render_board_image, upload_board_image, discard_board_image
+from repositories.env import GAME_SAVE_MAX_RETRIES
 from repositories.game import ChessCommandResponse
-from game.command_processor import CommandProcessor
+from game.command_processor import CommandProcessor, build_error_response
+from helpers.task_locks import task_locks
+from helpers.metrics import commands_total
+from helpers.tracing import tracer, traced_stage, current_span
+from helpers.capture import capture
 
 
-from game.init import game_repo
+from game.init import game_repo, task_cancellation, task_store
 from game.responses import GameResponseBuilder 
+from game.progress import EventCallback, TaskProgress, finish_turn, fail_turn
+from game.analysis import bulk_analysis_request, process_bulk_analysis
 
-def load_or_start_game(task_id: str):
+
+def load_or_start_game(task_id: str, metadata: dict | None = None):
     game = game_repo.load(task_id)
     if not game:
-        game = game_repo.start_game(engine_path=CHESS_ENGINE_PATH)
+        game = game_repo.start_game()
+    if metadata:
+        game.user_id = game.user_id or metadata.get("telex_user_id")
+        game.channel_id = game.channel_id or metadata.get("telex_channel_id")
     return game
 
 
-def process_user_move(game: Game, command_response: ChessCommandResponse, task_id: str):
+def restart_canceled_game(task_id: str, game: Game) -> Game:
+    """Telex sends every message of a conversation to the same task, so the
+    first message after tasks/cancel starts a new game in it."""
+    new_game = game_repo.start_game()
+    new_game.version = game.version
+    new_game.user_id = game.user_id
+    new_game.channel_id = game.channel_id
+    game_repo.save(task_id, new_game)
+    print(f"Started a new game in canceled task {task_id}")
+    return new_game
+
+
+def resolve_task_id(message: schemas.Message) -> str:
+    """Use the message's task, else resume the user's game in this channel."""
+    if message.task_id:
+        return message.task_id
+    if bulk_analysis_request(message) is not None:
+        return uuid4().hex
+
+    metadata = message.metadata or {}
+    task_id = game_repo.find_active_game(
+        metadata.get("telex_user_id"), metadata.get("telex_channel_id")
+    )
+    if task_id:
+        print(f"Resuming game {task_id} for user in channel")
+        return task_id
+
+    return uuid4().hex
+
+
+async def process_user_move(game: Game, command_response: ChessCommandResponse, task_id: str):
     command_processor = CommandProcessor()
 
-    return command_processor.process(game=game, command_response=command_response, task_id=task_id)
+    return await command_processor.process(game=game, command_response=command_response, task_id=task_id)
+
 
+async def parse_command_with_progress(
+    task_id: str, user_input: str, game: Game, progress: TaskProgress
+) -> ChessCommandResponse:
+    """Streams the LLM output, forwarding chat answers as they are written.
 
-async def process_message(task_id: str, user_input: str):
-    game = load_or_start_game(task_id)
-    command_response = await game_repo.parse_command(user_input, game)
+    The working status goes out as soon as the input is received, and chat
+    text follows as appended chunks of the `chat` artifact.
+    """
+    await progress.emit(GameResponseBuilder.working_status_event(task_id))
+    command_response = None
+    sent_text = ""
+
+    async for command_response in game_repo.parse_command_stream(user_input, game):
+        text = command_response.chat_query_response or ""
+        if command_response.command_type == "chat" and len(text) > len(sent_text) and text.startswith(sent_text):
+            await progress.emit(
+                GameResponseBuilder.chat_chunk_event(task_id, text[len(sent_text):], first=not sent_text, last=False),
+            )
+            sent_text = text
 
     print(f"Command response is {command_response}")
+    if sent_text:
+        await progress.emit(GameResponseBuilder.chat_chunk_event(task_id, "", first=False, last=True))
+
+    return command_response
+
+
+async def process_user_message(
+    task_id: str,
+    message: schemas.Message,
+    on_event: EventCallback | None = None,
+):
+    """Bulk analysis for messages carrying positions, a game turn otherwise."""
+    request = bulk_analysis_request(message)
+    if request is not None:
+        return await process_bulk_analysis(task_id, message, request, on_event)
+
+    return await process_message(task_id, message, on_event)
+
+
+async def process_message(
+    task_id: str,
+    user_message: schemas.Message,
+    on_event: EventCallback | None = None,
+):
+    """Plays one turn of the task; tasks/cancel aborts it wherever it is."""
+    progress = TaskProgress(task_id, on_event)
+    user_input = user_message.parts[0].text.strip()
+    metadata = user_message.metadata
 
+    with tracer.span("process_message", {"task.id": task_id}):
+        try:
+            return await task_cancellation.run(
+                task_id, play_turn(task_id, user_input, metadata, progress, user_message)
+            )
+        except TaskCanceledError:
+            print(f"Task {task_id} was canceled")
+            response = GameResponseBuilder.handle_cancellation(task_id)
+            return await finish_turn(task_id, progress, user_message, response)
+        except (Exception, asyncio.CancelledError) as e:
+            await fail_turn(task_id, progress, e)
+            raise
+
+
+async def play_turn(
+    task_id: str,
+    user_input: str,
+    metadata: dict | None,
+    progress: TaskProgress,
+    user_message: schemas.Message,
+):
+    async with task_locks.hold(task_id):
+        game = load_or_start_game(task_id, metadata)
+        if game.state == schemas.TaskState.canceled:
+            game = restart_canceled_game(task_id, game)
+
+        try:
+            task_store.set_status(task_id, schemas.TaskStatus(state=schemas.TaskState.working))
+        except Exception as e:
+            print(f"Could not cache task {task_id}: {e}")
+
+        parse_started = time.perf_counter()
+        with traced_stage("parse_command"):
+            if progress.live:
+                command_response = await parse_command_with_progress(task_id, user_input, game, progress)
+            else:
+                command_response = await game_repo.parse_command(user_input, game)
+                print(f"Command response is {command_response}")
+        capture.classification(task_id, user_input, command_response, time.perf_counter() - parse_started)
+        if not progress.live:
+            await progress.emit(GameResponseBuilder.working_status_event(task_id))
+        commands_total.inc(command=command_response.command_type)
+        if span := current_span():
+            span.set_attribute("command.type", command_response.command_type)
+
+        response = await respond_with_retries(task_id, game, command_response, metadata, progress)
+        return await finish_turn(task_id, progress, user_message, response)
+
+
+async def respond_with_retries(
+    task_id: str,
+    game: Game,
+    command_response: ChessCommandResponse,
+    metadata: dict | None,
+    progress: TaskProgress,
+):
+    # The command was parsed against this position. A move is only replayed
+    # on a reloaded game that is still there; if another request has moved
+    # since, the move may no longer mean what the user intended.
+    parsed_against = list(game.move_history)
+    for attempt in range(1, GAME_SAVE_MAX_RETRIES + 1):
+        try:
+            return await respond_to_command(task_id, game, command_response, progress)
+        except GameConflictError:
+            print(f"Game {task_id} was updated concurrently, retrying ({attempt}/{GAME_SAVE_MAX_RETRIES})")
+            game = load_or_start_game(task_id, metadata)
+            if game.state == schemas.TaskState.canceled:
+                return GameResponseBuilder.handle_cancellation(task_id)
+            if command_response.command_type == "move" and game.move_history != parsed_against:
+                return build_error_response(
+                    "Game was updated",
+                    "Another move was played in this game while yours was processed, please check the board and send your move again",
+                    retryable=True,
+                )
+
+    return build_error_response(
+        "Game is busy", "The game was updated by another request, please try again", retryable=True
+    )
+
+
+async def publish_board(task_id: str, board, progress: TaskProgress) -> tuple[str, str]:
+    """Renders and uploads the board, sends it as the `board` artifact, and
+    returns its filename and URL."""
+    source_file, filename = await asyncio.to_thread(render_board_image, board)
+    try:
+        image_url = await asyncio.to_thread(upload_board_image, source_file, filename)
+    except asyncio.CancelledError:
+        discard_board_image(source_file)
+        raise
+    await progress.emit(
+        GameResponseBuilder.artifact_event(task_id, GameResponseBuilder.board_artifact(filename, image_url)),
+    )
+    return filename, image_url
+
+
+async def respond_to_command(
+    task_id: str,
+    game: Game,
+    command_response: ChessCommandResponse,
+    progress: TaskProgress,
+):
     if command_response.command_type == "chat":
         return GameResponseBuilder.handle_chat_response(command_response.chat_query_response)
     
     if command_response.command_type == "board":
-        return GameResponseBuilder.get_board_state(game)
+        return await GameResponseBuilder.get_board_state(game)
     
     if command_response.command_type == "resign":
         return GameResponseBuilder.handle_resignation(task_id)
@@ -39,15 +229,36 @@ async def process_message(task_id: str, user_input: str):
     if command_response.command_type == "unknown":
         return GameResponseBuilder.handle_chat_response(command_response.message)
 
+    if command_response.command_type in ("hint", "analysis"):
+        analysis = game.analysis
+        response = await process_user_move(game, command_response, task_id)
+        if game.analysis is not analysis:
+            # Keep the deeper search for the next hint or analysis.
+            game_repo.save(task_id, game)
+        return response
+
     if command_response.command_type == "move":
-        error_response = process_user_move(game, command_response, task_id)
+        with traced_stage("usermove"):
+            error_response = await process_user_move(game, command_response, task_id)
         if error_response:
             return error_response
         
-        aimove, board = game.aimove()
+        if game.board.is_game_over():
+            # The user's move ended the game; the engine has no move to play.
+            game_repo.save(task_id, game)
+            filename, image_url = await publish_board(task_id, game.board, progress)
+            return GameResponseBuilder.handle_game_over(task_id, None, filename, image_url)
+
+        # Engine search and rendering run off the event loop so progress
+        # events can be flushed to streaming clients while they work. A
+        # cancel stops the search and skips the upload of a rendered board.
+        with traced_stage("aimove"):
+            aimove, board = await game.aimove()
+        capture.engine_move(task_id, board)
         game_repo.save(task_id, game)
+        await progress.emit(GameResponseBuilder.artifact_event(task_id, GameResponseBuilder.move_artifact(aimove)))
 
-        image_url, filename = generate_board_image(board)
+        filename, image_url = await publish_board(task_id, board, progress)
 
         if board.is_game_over():
             return GameResponseBuilder.handle_game_over(task_id, aimove, filename, image_url)
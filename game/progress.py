@@ -0,0 +1,109 @@
+import schemas
+from uuid import uuid4
+from typing import Awaitable, Callable
+from game.init import event_log, task_store
+from helpers.metrics import errors_total
+
+# Receives progress events while a message is processed (SSE, webhook relay).
+EventCallback = Callable[
+    [schemas.TaskStatusUpdateEvent | schemas.TaskArtifactUpdateEvent], Awaitable[None]
+]
+
+
+def final_events(task_id: str, response, streamed_artifacts: set[str]):
+    """Turns a finished response into the events that were not streamed yet."""
+    if response.error:
+        error = response.error
+        text = f"{error.message}: {error.data}" if error.data else error.message
+        message = schemas.Message(messageId=uuid4().hex, role="agent", parts=[schemas.TextPart(text=text)])
+        status = schemas.TaskStatus(state=schemas.TaskState.input_required, message=message)
+        return [
+            schemas.TaskStatusUpdateEvent(
+                id=task_id, status=status, final=True, metadata={"error": error.model_dump(mode="json")}
+            )
+        ]
+
+    result = response.result
+    if isinstance(result, schemas.Message):
+        # A chat answer already went out chunk by chunk.
+        message = None if "chat" in streamed_artifacts else result
+        status = schemas.TaskStatus(state=schemas.TaskState.input_required, message=message)
+        return [schemas.TaskStatusUpdateEvent(id=task_id, status=status, final=True)]
+
+    events = [
+        schemas.TaskArtifactUpdateEvent(id=task_id, artifact=artifact)
+        for artifact in result.artifacts or []
+        if artifact.name is None or artifact.name not in streamed_artifacts
+    ]
+    events.append(schemas.TaskStatusUpdateEvent(id=task_id, status=result.status, final=True))
+    return events
+
+
+class TaskProgress:
+    """Events of one turn of a task.
+
+    Every event is recorded in the task's event log, which is what
+    tasks/resubscribe replays, and forwarded to the live listener if the
+    caller attached one. Each event's metadata carries its log cursor.
+    """
+
+    def __init__(self, task_id: str, on_event: EventCallback | None = None):
+        self.task_id = task_id
+        self.on_event = on_event
+        self.streamed_artifacts: set[str] = set()
+
+    @property
+    def live(self) -> bool:
+        return self.on_event is not None
+
+    async def emit(self, event):
+        if isinstance(event, schemas.TaskArtifactUpdateEvent) and event.artifact.name:
+            self.streamed_artifacts.add(event.artifact.name)
+
+        try:
+            cursor = event_log.append(self.task_id, event)
+            event.metadata = {**(event.metadata or {}), "cursor": cursor}
+        except Exception as e:
+            print(f"Could not record event for task {self.task_id}: {e}")
+
+        if self.on_event:
+            await self.on_event(event)
+
+    async def finish(self, response):
+        for event in final_events(self.task_id, response, self.streamed_artifacts):
+            await self.emit(event)
+
+
+async def finish_turn(task_id: str, progress: TaskProgress, user_message: schemas.Message, response):
+    """Sends the turn's final events and caches the task for tasks/get."""
+    if response.error:
+        errors_total.inc(error=type(response.error).__name__)
+    await progress.finish(response)
+    try:
+        task_store.record(task_id, user_message, response)
+    except Exception as e:
+        print(f"Could not cache task {task_id}: {e}")
+    return response
+
+
+async def fail_turn(task_id: str, progress: TaskProgress, error: BaseException):
+    """Ends a turn that raised or was cancelled with a final failed status, so
+    tasks/get and followers of the task's events do not wait for a turn that
+    is over."""
+    message = schemas.Message(
+        messageId=uuid4().hex, role="agent", parts=[schemas.TextPart(text="Could not handle task")]
+    )
+    status = schemas.TaskStatus(state=schemas.TaskState.failed, message=message)
+    try:
+        task_store.set_status(task_id, status)
+    except Exception as e:
+        print(f"Could not cache task {task_id}: {e}")
+    try:
+        await progress.emit(
+            schemas.TaskStatusUpdateEvent(
+                id=task_id, status=status, final=True, metadata={"error": type(error).__name__}
+            )
+        )
+    except Exception as e:
+        print(f"Could not send the failed status of task {task_id}: {e}")
+
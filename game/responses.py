@@ -1,14 +1,19 @@
 import uuid
+import asyncio
+import chess
 from game.utils import generate_board_image
 from repositories.game import Game  
 import schemas 
+from helpers.tracing import traced
 
 from game.init import game_repo
 
 class GameResponseBuilder:
     @staticmethod
-    def get_board_state(game: Game):
-        image_url, filename = generate_board_image(game.board)
+    @traced("GameResponseBuilder.get_board_state")
+    async def get_board_state(game: Game):
+        # Rendering and uploading block, so they run off the event loop.
+        image_url, filename = await asyncio.to_thread(generate_board_image, game.board)
         return schemas.SendMessageResponse(
             result=schemas.Message(
                 messageId=uuid.uuid4().hex,
@@ -27,6 +32,7 @@ class GameResponseBuilder:
         )
 
     @staticmethod
+    @traced("GameResponseBuilder.handle_resignation")
     def handle_resignation(task_id: str):
         game_repo.game_over(task_id)
         return schemas.SendMessageResponse(
@@ -49,33 +55,51 @@ class GameResponseBuilder:
         )
 
     @staticmethod
+    @traced("GameResponseBuilder.handle_cancellation")
+    def handle_cancellation(task_id: str):
+        return schemas.SendMessageResponse(
+            result=schemas.Task(
+                id=task_id,
+                status=schemas.TaskStatus(
+                    state=schemas.TaskState.canceled,
+                    message=schemas.Message(
+                        messageId=uuid.uuid4().hex,
+                        role="agent",
+                        parts=[
+                            schemas.TextPart(
+                                text="This game was canceled. Start a new game by entering a valid move."
+                            ),
+                        ],
+                    ),
+                ),
+            )
+        )
+
+    @staticmethod
+    @traced("GameResponseBuilder.handle_game_over")
     def handle_game_over(task_id: str, aimove, filename: str, image_url: str):
         game_repo.game_over(task_id)
         return schemas.SendMessageResponse(
             result=schemas.Task(
                 id=task_id,
                 status=schemas.TaskStatus(state=schemas.TaskState.completed),
+                # Named like a move response's, so a stream that already
+                # sent the move and the board only adds the game over note.
+                # There is no engine move when the user's move ended the game.
                 artifacts=[
+                    *([GameResponseBuilder.move_artifact(aimove)] if aimove else []),
+                    GameResponseBuilder.board_artifact(filename, image_url),
                     schemas.Artifact(
-                        parts=[
-                            schemas.TextPart(text=f"Game over. AI moved {aimove.uci()}"),
-                            schemas.FilePart(
-                                file=schemas.FileContent(
-                                    name=filename,
-                                    mimeType="image/svg+xml",
-                                    uri=image_url,
-                                )
-                            ),
-                            schemas.TextPart(
-                                text="Start a new game by entering a valid move"
-                            ),
-                        ],
-                    )
+                        name="game_over",
+                        index=2,
+                        parts=[schemas.TextPart(text="Game over. Start a new game by entering a valid move")],
+                    ),
                 ],
             )
         )
 
     @staticmethod
+    @traced("GameResponseBuilder.handle_move_response")
     def handle_move_response(task_id: str, aimove, filename: str, image_url: str):
         return schemas.SendMessageResponse(
             result=schemas.Task(
@@ -84,21 +108,92 @@ class GameResponseBuilder:
                 status=schemas.TaskStatus(
                     state=schemas.TaskState.input_required,
                 ),
+                artifacts=[
+                    GameResponseBuilder.move_artifact(aimove),
+                    GameResponseBuilder.board_artifact(filename, image_url),
+                ],
+            )
+        )
+
+    @staticmethod
+    def move_artifact(aimove):
+        return schemas.Artifact(
+            name="move",
+            index=0,
+            parts=[schemas.TextPart(text=f"AI moved {aimove.uci()}")],
+        )
+
+    @staticmethod
+    def board_artifact(filename: str, image_url: str):
+        return schemas.Artifact(
+            name="board",
+            index=1,
+            parts=[
+                schemas.FilePart(
+                    file=schemas.FileContent(
+                        name=filename,
+                        mimeType="image/svg+xml",
+                        uri=image_url,
+                    )
+                )
+            ],
+        )
+
+    @staticmethod
+    def working_status_event(task_id: str):
+        return schemas.TaskStatusUpdateEvent(
+            id=task_id,
+            status=schemas.TaskStatus(state=schemas.TaskState.working),
+        )
+
+    @staticmethod
+    def chat_chunk_event(task_id: str, text: str, first: bool, last: bool):
+        return schemas.TaskArtifactUpdateEvent(
+            id=task_id,
+            artifact=schemas.Artifact(
+                name="chat",
+                index=0,
+                parts=[schemas.TextPart(text=text)],
+                append=not first,
+                lastChunk=last,
+            ),
+        )
+
+    @staticmethod
+    def analysis_chunk_event(task_id: str, results: list[dict], first: bool, last: bool):
+        return schemas.TaskArtifactUpdateEvent(
+            id=task_id,
+            artifact=schemas.Artifact(
+                name="analysis",
+                index=0,
+                parts=[schemas.DataPart(data={"results": results})],
+                append=not first,
+                lastChunk=last,
+            ),
+        )
+
+    @staticmethod
+    @traced("GameResponseBuilder.handle_bulk_analysis")
+    def handle_bulk_analysis(task_id: str, results: list[dict], summary: dict):
+        return schemas.SendMessageResponse(
+            result=schemas.Task(
+                id=task_id,
+                status=schemas.TaskStatus(state=schemas.TaskState.completed),
                 artifacts=[
                     schemas.Artifact(
-                        name="move",
-                        parts=[schemas.TextPart(text=f"AI moved {aimove.uci()}")],
+                        name="analysis",
+                        index=0,
+                        parts=[schemas.DataPart(data={"results": results})],
                     ),
                     schemas.Artifact(
-                        name="board",
+                        name="analysis_summary",
+                        index=1,
                         parts=[
-                            schemas.FilePart(
-                                file=schemas.FileContent(
-                                    name=filename,
-                                    mimeType="image/svg+xml",
-                                    uri=image_url,
-                                )
-                            )
+                            schemas.TextPart(
+                                text=f"Analysed {summary['positions']} positions "
+                                f"({summary['positions_per_second']} positions/s)."
+                            ),
+                            schemas.DataPart(data=summary),
                         ],
                     ),
                 ],
@@ -106,6 +201,40 @@ class GameResponseBuilder:
         )
 
     @staticmethod
+    def artifact_event(task_id: str, artifact: schemas.Artifact):
+        return schemas.TaskArtifactUpdateEvent(id=task_id, artifact=artifact)
+
+    @staticmethod
+    def format_score(score: dict) -> str:
+        if "mate" in score:
+            return f"#{score['mate']}"
+        return f"{score['cp'] / 100:+.2f}"
+
+    @staticmethod
+    @traced("GameResponseBuilder.handle_hint")
+    def handle_hint(board, analysis: dict):
+        lines = analysis["lines"]
+        if not lines or not lines[0]["pv"]:
+            return GameResponseBuilder.handle_chat_response("No hint is available for this position.")
+
+        move = board.san(chess.Move.from_uci(lines[0]["pv"][0]))
+        return GameResponseBuilder.handle_chat_response(f"Hint: consider {move}.")
+
+    @staticmethod
+    @traced("GameResponseBuilder.handle_analysis")
+    def handle_analysis(board, analysis: dict):
+        lines = analysis["lines"]
+        if not lines:
+            return GameResponseBuilder.handle_chat_response("No analysis is available for this position.")
+
+        text = [f"Evaluation {GameResponseBuilder.format_score(lines[0]['score'])} (depth {analysis['depth']})"]
+        for number, line in enumerate(lines, start=1):
+            pv = [chess.Move.from_uci(move) for move in line["pv"][:8]]
+            text.append(f"{number}. {GameResponseBuilder.format_score(line['score'])}: {board.variation_san(pv)}")
+        return GameResponseBuilder.handle_chat_response("\n".join(text))
+
+    @staticmethod
+    @traced("GameResponseBuilder.handle_chat_response")
     def handle_chat_response(text: str):
         return schemas.SendMessageResponse(
             result=schemas.Message(
@@ -116,6 +245,7 @@ class GameResponseBuilder:
         )
     
     @staticmethod
+    @traced("GameResponseBuilder.handle_unknown_command")
     def handle_unknown_command(command_type: str):
         return schemas.SendMessageResponse(
             result=schemas.Message(
@@ -1,32 +1,68 @@
+import os
 from repositories.random_name import RandomNameRepository
 from repositories.env import MINIO_BUCKET_NAME
-from repositories.minio import minio_client
+from repositories.minio import get_minio_client
+from helpers.tracing import traced_stage
 
 
-def generate_board_image(board):
+def render_board_image(board):
+    """Renders the board to a PNG under /tmp, returns (png path, filename)."""
     filename = RandomNameRepository.generate_filename()
-    destination_file = f"public/chessagent/{filename}"
     source_file = f"/tmp/{filename}"
 
-    svg = board._repr_svg_()
+    with traced_stage("render"):
+        svg = board._repr_svg_()
+
+        with open(source_file, "w") as f:
+            f.write(svg)
+            new_source_file = source_file.split(".svg")[0] + ".png"
+
+            import cairosvg
+
+            cairosvg.svg2png(url=source_file, write_to=new_source_file)
+
+            source_file = new_source_file
+
+    return source_file, filename
+
 
-    with open(source_file, "w") as f:
-        f.write(svg)
-        new_source_file = source_file.split(".svg")[0] + ".png"
+def warm_up_renderer():
+    """Renders a board once, so cairo and its fonts are loaded before the first move."""
+    import chess
+    import cairosvg
 
-        import cairosvg
+    cairosvg.svg2png(bytestring=chess.Board()._repr_svg_().encode())
 
-        cairosvg.svg2png(url=source_file, write_to=new_source_file)
 
-        source_file = new_source_file
-        destination_file = destination_file.split(".svg")[0] + ".png"
+def upload_board_image(source_file: str, filename: str) -> str:
+    destination_file = f"public/chessagent/{filename}".split(".svg")[0] + ".png"
 
-    minio_client.fput_object(
-        MINIO_BUCKET_NAME,
-        destination_file,
-        source_file,
-    )
+    try:
+        with traced_stage("upload"):
+            get_minio_client().fput_object(
+                MINIO_BUCKET_NAME,
+                destination_file,
+                source_file,
+            )
+    finally:
+        # The object store keeps the image; the local copies are not needed.
+        discard_board_image(source_file)
 
     image_url = f"https://media.tifi.tv/{MINIO_BUCKET_NAME}/{destination_file}"
 
+    return image_url
+
+
+def discard_board_image(source_file: str):
+    for path in (source_file, source_file.split(".png")[0] + ".svg"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def generate_board_image(board):
+    source_file, filename = render_board_image(board)
+    image_url = upload_board_image(source_file, filename)
+
     return image_url, filename
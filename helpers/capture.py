@@ -0,0 +1,194 @@
+import os
+import hmac
+import json
+import time
+import queue
+import hashlib
+import logging
+import logging.handlers
+from contextlib import contextmanager
+from repositories.env import (
+    CAPTURE_DIR,
+    CAPTURE_SAMPLE_RATE,
+    CAPTURE_MAX_BYTES,
+    CAPTURE_BACKUP_COUNT,
+    CAPTURE_SALT,
+    CAPTURE_REDACT_TEXT,
+    DEPLOYMENT_TYPE,
+)
+
+# Keys whose string values identify users, tasks or messages.
+ID_KEYS = {"id", "taskId", "contextId", "messageId", "referenceTaskIds"}
+
+
+class TrafficCapture:
+    """Records traffic for benchmarks/replay.py to rotating JSON-lines files.
+
+    Each process writes its own `capture-<pid>.jsonl` in `directory`, from a
+    background thread. There are three kinds of line:
+
+    - `request`: a JSON-RPC payload with its start time and duration
+    - `classification`: the LLM's parsed command for one user input
+    - `engine`: the engine's move in a position
+
+    Ids and metadata values are replaced by keyed hashes, so one task keeps
+    one id across lines. Webhook URLs and credentials are dropped. With
+    `redact_text`, message text and chat answers are hashed or blanked too.
+    Tasks are sampled as a whole, by hashing their id against `sample_rate`.
+    """
+
+    def __init__(
+        self,
+        directory=CAPTURE_DIR,
+        sample_rate=CAPTURE_SAMPLE_RATE,
+        max_bytes=CAPTURE_MAX_BYTES,
+        backup_count=CAPTURE_BACKUP_COUNT,
+        salt=CAPTURE_SALT,
+        redact_text=CAPTURE_REDACT_TEXT,
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.salt = (salt or os.urandom(16).hex()).encode()
+        self.redact_text = redact_text
+        self._logger: logging.Logger | None = None
+        self._listener: logging.handlers.QueueListener | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def anonymise(self, value: str) -> str:
+        return hmac.new(self.salt, value.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def wants(self, key: str | None) -> bool:
+        if not self.enabled:
+            return False
+        if self.sample_rate >= 1 or not key:
+            return True
+        return int(hashlib.sha256(key.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF < self.sample_rate
+
+    def text(self, value: str) -> str:
+        return f"redacted:{self.anonymise(value)}" if self.redact_text else value
+
+    def _scrub(self, value, key: str | None = None):
+        if isinstance(value, dict):
+            if key == "metadata":
+                return {k: self.anonymise(str(v)) for k, v in value.items()}
+            if key == "pushNotificationConfig":
+                return {"url": "redacted"} if value.get("url") else {}
+            scrubbed = {k: self._scrub(v, k) for k, v in value.items()}
+            if value.get("kind", "text") == "text" and isinstance(value.get("text"), str):
+                scrubbed["text"] = self.text(value["text"].strip())
+            return scrubbed
+        if isinstance(value, list):
+            return [self._scrub(item, key) for item in value]
+        if key in ID_KEYS and isinstance(value, str):
+            return self.anonymise(value)
+        return value
+
+    def _write(self, record: dict):
+        if self._logger is None:
+            os.makedirs(self.directory, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(self.directory, f"capture-{os.getpid()}.jsonl"),
+                maxBytes=self.max_bytes,
+                backupCount=self.backup_count,
+            )
+            records: queue.Queue = queue.Queue(maxsize=10_000)
+            self._listener = logging.handlers.QueueListener(records, handler)
+            self._listener.start()
+            self._logger = logging.getLogger(f"chess_agent.capture.{os.getpid()}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(logging.handlers.QueueHandler(records))
+        try:
+            self._logger.info(json.dumps(record, separators=(",", ":"), default=str))
+        except Exception as e:
+            print(f"Could not capture traffic: {e}")
+
+    @staticmethod
+    def _sample_key(payload) -> str | None:
+        if not isinstance(payload, dict):
+            return None
+        params = payload.get("params") or {}
+        message = params.get("message") or {}
+        metadata = message.get("metadata") or {}
+        return (
+            message.get("taskId")
+            or params.get("id")
+            or message.get("contextId")
+            or metadata.get("telex_user_id")
+            or message.get("messageId")
+        )
+
+    @contextmanager
+    def request(self, body: bytes):
+        """Records one `handle_rpc` call, a single request or a batch."""
+        if not self.enabled:
+            yield
+            return
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = body.decode(errors="replace")
+        key = self._sample_key(payload[0] if isinstance(payload, list) and payload else payload)
+        if not self.wants(key):
+            yield
+            return
+
+        started_at, started = time.time(), time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self._write(
+                {
+                    "type": "request",
+                    "ts": started_at,
+                    "duration_seconds": round(time.perf_counter() - started, 6),
+                    "mode": DEPLOYMENT_TYPE,
+                    "error": error,
+                    "payload": self._scrub(payload),
+                }
+            )
+
+    def classification(self, task_id: str, user_input: str, command_response, seconds: float):
+        if not self.wants(task_id):
+            return
+        output = command_response.model_dump(exclude_none=True)
+        if self.redact_text:
+            for field in ("chat_query_response", "message"):
+                if output.get(field):
+                    output[field] = "x" * len(output[field])
+        self._write(
+            {
+                "type": "classification",
+                "ts": time.time(),
+                "task_id": self.anonymise(task_id),
+                "input": self.text(user_input.strip()),
+                "output": output,
+                "seconds": round(seconds, 6),
+            }
+        )
+
+    def engine_move(self, task_id: str, board):
+        """The engine's last move on `board`, with the position it was played in."""
+        if not self.wants(task_id):
+            return
+        before = board.copy()
+        move = before.pop()
+        self._write({"type": "engine", "ts": time.time(), "fen": before.fen(), "move": move.uci()})
+
+    def close(self):
+        if self._listener:
+            self._listener.stop()
+            self._listener = None
+            self._logger = None
+
+
+capture = TrafficCapture()
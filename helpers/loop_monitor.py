@@ -0,0 +1,114 @@
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from helpers.metrics import registry, Histogram, Counter
+from repositories.env import (
+    LOOP_LAG_INTERVAL_SECONDS,
+    LOOP_LAG_THRESHOLD_SECONDS,
+    LOOP_LAG_STALLS_KEPT,
+)
+
+loop_lag_seconds = registry.register(
+    Histogram(
+        "chess_agent_event_loop_lag_seconds",
+        "How late a task sleeping on the event loop was woken up.",
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    )
+)
+loop_stalls_total = registry.register(
+    Counter("chess_agent_event_loop_stalls_total", "Times the event loop was blocked past the lag threshold.")
+)
+
+
+class LoopLagMonitor:
+    """Measures event loop lag and records what blocks the loop.
+
+    A task on the loop wakes up every `interval` seconds and records how late
+    it woke up. A watchdog thread watches that task's heartbeat. When the
+    loop has not run it for `threshold` seconds, the watchdog takes the loop
+    thread's stack. That stack is the synchronous call doing the blocking,
+    caught while it is still running. It is printed and the last
+    `stalls_kept` of them are kept for `/loop/stats`.
+    """
+
+    def __init__(
+        self,
+        interval=LOOP_LAG_INTERVAL_SECONDS,
+        threshold=LOOP_LAG_THRESHOLD_SECONDS,
+        stalls_kept=LOOP_LAG_STALLS_KEPT,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = deque(maxlen=stalls_kept)
+        self.max_lag = 0.0
+        self._heartbeat = time.monotonic()
+        self._open_stall: dict | None = None
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def _measure(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._heartbeat = now
+            if stall := self._open_stall:
+                # The stack was taken mid-stall; record how long it lasted.
+                stall["blocked_seconds"] = round(lag, 3)
+                self._open_stall = None
+            self.max_lag = max(self.max_lag, lag)
+            loop_lag_seconds.observe(lag)
+
+    def _watch(self):
+        captured_for = None
+        while not self._stop.wait(self.threshold / 4):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.threshold or captured_for == heartbeat:
+                continue
+
+            # One stack per stall, taken while the blocking call is running.
+            captured_for = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = traceback.format_stack(frame, limit=-30) if frame else []
+            stall = {"at": time.time(), "blocked_seconds": round(blocked, 3), "stack": "".join(stack)}
+            self.stalls.append(stall)
+            self._open_stall = stall
+            loop_stalls_total.inc()
+            print(f"Event loop blocked for {stall['blocked_seconds']}s so far, in:\n{stall['stack']}")
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "threshold_seconds": self.threshold,
+            "max_lag_seconds": round(self.max_lag, 4),
+            "stalls": list(self.stalls),
+        }
+
+    async def aclose(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,134 @@
+import os
+import sys
+import heapq
+import random
+import threading
+import time
+from typing import Callable
+from collections import Counter
+from contextlib import contextmanager
+from repositories.env import (
+    PROFILE_DIR,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_KEEP,
+    PROFILE_INTERVAL_SECONDS,
+)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds from a
+    timer thread, counting identical stacks (the "folded" flame graph format).
+    """
+
+    def __init__(self, thread_id: int, interval=PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._on_stopped: Callable[[Counter], None] | None = None
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+        if self._on_stopped:
+            self._on_stopped(self.stacks)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, on_stopped: Callable[[Counter], None] | None = None):
+        """Stops sampling without waiting for the sampler thread, which
+        passes the stacks to `on_stopped` once it is done."""
+        self._on_stopped = on_stopped
+        self._stop.set()
+
+
+class SlowestProfiles:
+    """Profiles opted-in requests and keeps the `keep` slowest on disk.
+
+    A request is profiled when it asks for it (the `X-Profile` header) or is
+    picked at `sample_rate`, and only if `directory` is set. Each kept
+    profile is a `.folded` file, named after its duration and trace id, that
+    flamegraph.pl or speedscope render directly. The sampler watches the
+    event loop thread, so other requests running at the same time show up
+    in the profile too.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, keep=PROFILE_KEEP, sample_rate=PROFILE_SAMPLE_RATE):
+        self.directory = directory
+        self.keep = keep
+        self.sample_rate = sample_rate
+        self._kept: list[tuple[float, str]] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and self.keep > 0
+
+    def should_profile(self, requested: bool = False) -> bool:
+        return self.enabled and (requested or random.random() < self.sample_rate)
+
+    @contextmanager
+    def profile(self, name: str, requested: bool = False):
+        if not self.should_profile(requested):
+            yield
+            return
+
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Saving writes files, so it happens on the sampler thread rather
+            # than on the event loop.
+            duration = time.perf_counter() - started
+            profiler.stop(lambda stacks: self._store(duration, name, stacks))
+
+    def _load_kept(self) -> list[tuple[float, str]]:
+        # Profiles kept by an earlier run still count towards `keep`.
+        os.makedirs(self.directory, exist_ok=True)
+        kept = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".folded"):
+                try:
+                    kept.append((float(filename.split("ms-")[0]) / 1000, os.path.join(self.directory, filename)))
+                except ValueError:
+                    continue
+        heapq.heapify(kept)
+        return kept
+
+    def _store(self, duration: float, name: str, stacks: Counter):
+        with self._lock:
+            if self._kept is None:
+                self._kept = self._load_kept()
+            if len(self._kept) >= self.keep and duration <= self._kept[0][0]:
+                return
+
+            path = os.path.join(self.directory, f"{duration * 1000:09.1f}ms-{name}.folded")
+            try:
+                with open(path, "w") as f:
+                    f.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+            except OSError as e:
+                print(f"Could not save profile {path}: {e}")
+                return
+
+            heapq.heappush(self._kept, (duration, path))
+            while len(self._kept) > self.keep:
+                _, evicted = heapq.heappop(self._kept)
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
+            print(f"Saved profile of a {duration:.3f}s request to {path}")
+
+
+profiles = SlowestProfiles()
@@ -0,0 +1,178 @@
+import time
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable
+from helpers.metrics import registry, Counter, Gauge
+
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+breaker_state = registry.register(
+    Gauge(
+        "chess_agent_breaker_state",
+        "Circuit breaker state: 0 closed, 1 half-open, 2 open.",
+        labels=("breaker",),
+    )
+)
+breaker_transitions_total = registry.register(
+    Counter("chess_agent_breaker_transitions_total", "Circuit breaker state changes.", labels=("breaker", "state"))
+)
+hedges_total = registry.register(
+    Counter(
+        "chess_agent_hedges_total",
+        "Hedged second requests: sent, and won when the hedge answered first.",
+        labels=("call", "result"),
+    )
+)
+
+
+class CircuitBreaker:
+    """Stops calling a dependency that keeps failing or answering slowly.
+
+    Outcomes of the last `window` seconds are kept. Once there are at least
+    `min_calls` of them, the breaker opens when the share of failures
+    reaches `failure_rate`, or the share of calls slower than
+    `slow_call_seconds` reaches `slow_rate`. While open, `allow()` is false
+    and callers use their fallback. After `open_seconds` one trial call is
+    let through (half-open); it closes the breaker if it succeeds in time
+    and reopens it otherwise. Calls that started before the trial do not
+    count while it runs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        slow_rate: float,
+        open_seconds: float,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self._outcomes: deque[tuple[float, bool, bool]] = deque()
+        self._opened_at = 0.0
+        self._calls = 0
+        self._trial: int | None = None
+        breaker_state.set(BREAKER_STATES["closed"], breaker=name)
+
+    def _move_to(self, state: str):
+        if state == self.state:
+            return
+        print(f"Circuit breaker {self.name}: {self.state} -> {state}")
+        self.state = state
+        breaker_state.set(BREAKER_STATES[state], breaker=self.name)
+        breaker_transitions_total.inc(breaker=self.name, state=state)
+
+    def allow(self) -> int | None:
+        """Returns a number identifying the call, to pass to `record` or
+        `release`, or None when the call should use the fallback."""
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._move_to("half_open")
+        if self.state == "open" or (self.state == "half_open" and self._trial is not None):
+            return None
+        self._calls += 1
+        if self.state == "half_open":
+            self._trial = self._calls
+        return self._calls
+
+    def record(self, call: int, seconds: float, ok: bool):
+        now = time.monotonic()
+        slow = seconds >= self.slow_call_seconds
+
+        if self.state == "half_open":
+            if call != self._trial:
+                # A call that started before the breaker went half-open.
+                return
+            self._trial = None
+            if ok and not slow:
+                self._outcomes.clear()
+                self._move_to("closed")
+            else:
+                self._opened_at = now
+                self._move_to("open")
+            return
+        if self.state == "open":
+            # A call that started before the breaker opened.
+            return
+
+        self._outcomes.append((now, ok, slow))
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for _, succeeded, _ in self._outcomes if not succeeded)
+        slow_calls = sum(1 for _, _, slow in self._outcomes if slow)
+        if failures / calls >= self.failure_rate or slow_calls / calls >= self.slow_rate:
+            self._opened_at = now
+            self._move_to("open")
+
+    def release(self, call: int):
+        """For an allowed call that ended without an outcome, such as a cancelled one."""
+        if call == self._trial:
+            self._trial = None
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "calls_in_window": len(self._outcomes),
+            "failures_in_window": sum(1 for _, succeeded, _ in self._outcomes if not succeeded),
+        }
+
+
+class LatencyWindow:
+    """The last `size` latencies of successful calls, for hedging delays."""
+
+    def __init__(self, size: int = 500):
+        self._latencies: deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self._latencies.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._latencies)
+
+    def quantile(self, q: float) -> float | None:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def hedged(name: str, call: Callable[[], Awaitable], delay: float | None):
+    """Runs `call`, and a second copy of it if the first has not answered
+    after `delay` seconds. The first to succeed wins and the other is
+    cancelled; if both fail, the first one's error is raised. With no
+    delay there is no hedge."""
+    if delay is None:
+        return await call()
+
+    first = asyncio.ensure_future(call())
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            hedges_total.inc(call=name, result="sent")
+            tasks.append(asyncio.ensure_future(call()))
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        hedges_total.inc(call=name, result="won")
+                    return task.result()
+        return first.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,29 @@
+from typing import Any
+from pydantic import TypeAdapter
+from fastapi.responses import Response
+
+# Serialises models with their own compiled serializers, also inside the
+# dicts and lists around them (batches, replayed idempotent responses).
+_any_json = TypeAdapter(Any)
+
+
+def dump_json(value) -> bytes:
+    """JSON bytes of a response in one pass, by alias, exactly as FastAPI's
+    jsonable_encoder and JSONResponse would write them."""
+    return _any_json.dump_json(value, by_alias=True)
+
+
+class RawJSONResponse(Response):
+    """A response whose body is encoded once with dump_json, or sent as is
+    when it already is JSON bytes."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return content if isinstance(content, bytes) else dump_json(content)
+
+
+def json_response(value) -> Response:
+    """`value` as a RawJSONResponse, so FastAPI does not re-encode it.
+    Responses, such as streams and 204s, pass through."""
+    return value if isinstance(value, Response) else RawJSONResponse(value)
@@ -0,0 +1,31 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class TaskLocks:
+    """In-process FIFO queue per task.
+
+    Requests for the same task run one after another in arrival order, while
+    requests for different tasks never wait on each other. A task's lock is
+    dropped as soon as nobody is holding or waiting on it.
+    """
+
+    def __init__(self):
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._waiters: dict[str, int] = {}
+
+    @asynccontextmanager
+    async def hold(self, task_id: str):
+        lock = self._locks.setdefault(task_id, asyncio.Lock())
+        self._waiters[task_id] = self._waiters.get(task_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._waiters[task_id] -= 1
+            if not self._waiters[task_id]:
+                del self._waiters[task_id]
+                del self._locks[task_id]
+
+
+task_locks = TaskLocks()
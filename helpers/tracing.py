@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import queue
+import random
+import socket
+import inspect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+import httpx
+from helpers.metrics import stage_seconds
+from repositories.env import (
+    TRACE_SAMPLE_RATE,
+    TRACE_EXPORT_FILE,
+    TRACE_EXPORT_URL,
+    TRACE_EXPORT_INTERVAL_SECONDS,
+    TRACE_SERVICE_NAME,
+)
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    """(trace id, parent span id, sampled) from a W3C `traceparent` header."""
+    try:
+        version, trace_id, span_id, flags = value.strip().split("-")
+        int(trace_id, 16), int(span_id, 16), int(flags, 16)
+    except (AttributeError, ValueError):
+        return None
+    if len(trace_id) != 32 or len(span_id) != 16 or trace_id == "0" * 32:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "kind", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, sampled: bool, kind: int, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class OTLPJsonExporter:
+    """Ships finished spans as OTLP/JSON from a background thread.
+
+    `path` gets one ExportTraceServiceRequest per line, the format read by
+    the collector's `otlpjsonfile` receiver; `url` is a collector's OTLP/HTTP
+    traces endpoint, e.g. http://localhost:4318/v1/traces. Spans are dropped,
+    not queued without bound, when the exporter falls behind.
+    """
+
+    def __init__(
+        self,
+        path: str | None = TRACE_EXPORT_FILE,
+        url: str | None = TRACE_EXPORT_URL,
+        service_name=TRACE_SERVICE_NAME,
+        interval=TRACE_EXPORT_INTERVAL_SECONDS,
+        max_queue=10_000,
+        batch_size=512,
+    ):
+        self.path = path
+        self.url = url
+        self.interval = interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: queue.Queue[Span] = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._write_lock = threading.Lock()
+        self._resource = {
+            "attributes": [
+                {"key": "service.name", "value": _otlp_value(service_name)},
+                {"key": "host.name", "value": _otlp_value(socket.gethostname())},
+                {"key": "process.pid", "value": _otlp_value(os.getpid())},
+            ]
+        }
+
+    def export(self, span: Span):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _take(self, timeout: float | None) -> list[Span]:
+        spans = []
+        try:
+            spans.append(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+            while len(spans) < self.batch_size:
+                spans.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return spans
+
+    def _run(self):
+        while True:
+            spans = self._take(self.interval)
+            if spans:
+                self._write(spans)
+            # A full batch means more spans are waiting, so only a drained
+            # queue waits for the next batch to fill up.
+            if 0 < len(spans) < self.batch_size:
+                time.sleep(self.interval)
+
+    def _write(self, spans: list[Span]):
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": self._resource,
+                    "scopeSpans": [{"scope": {"name": "chess-agent"}, "spans": [span.to_otlp() for span in spans]}],
+                }
+            ]
+        }
+        if self.path:
+            try:
+                with self._write_lock, open(self.path, "a") as f:
+                    f.write(json.dumps(body, separators=(",", ":")) + "\n")
+            except OSError as e:
+                print(f"Could not write traces to {self.path}: {e}")
+        if self.url:
+            try:
+                httpx.post(self.url, json=body, timeout=5).raise_for_status()
+            except httpx.HTTPError as e:
+                print(f"Could not export traces to {self.url}: {e!r}")
+
+    def flush(self):
+        while spans := self._take(None):
+            self._write(spans)
+
+
+class Tracer:
+    """Per-request span trees, kept in a context variable.
+
+    Every request gets a trace id, so it can be handed on (webhook metadata,
+    `traceparent` headers); only sampled traces are exported. A trace whose
+    caller sent a sampled `traceparent` is always sampled.
+    """
+
+    def __init__(self, exporter: OTLPJsonExporter | None = None, sample_rate=TRACE_SAMPLE_RATE):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def span(self, name: str, attributes: dict | None = None, traceparent: str | None = None):
+        """A child of the current span, or of `traceparent` when given.
+
+        Without either, it starts a new trace.
+        """
+        parent = _current_span.get()
+        remote = parse_traceparent(traceparent) if traceparent else None
+        if remote:
+            trace_id, parent_id, sampled = remote
+            sampled = sampled and self.exporter is not None
+            kind = SPAN_KIND_SERVER
+        elif parent:
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+            kind = SPAN_KIND_INTERNAL
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = self.exporter is not None and random.random() < self.sample_rate
+            kind = SPAN_KIND_SERVER
+
+        span = Span(name, trace_id, parent_id, sampled, kind, dict(attributes or {}))
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if span.sampled:
+                self.exporter.export(span)
+
+    def flush(self):
+        if self.exporter:
+            self.exporter.flush()
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def current_traceparent() -> str | None:
+    span = _current_span.get()
+    return span.traceparent if span else None
+
+
+def traced(name: str):
+    """Runs the decorated function, sync or async, in a span called `name`."""
+
+    def decorate(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+@contextmanager
+def traced_stage(stage: str):
+    """A span for one stage of a message, also timed in `stage_seconds`."""
+    with tracer.span(stage), stage_seconds.time(stage=stage):
+        yield
+
+
+tracer = Tracer(OTLPJsonExporter() if TRACE_EXPORT_FILE or TRACE_EXPORT_URL else None)
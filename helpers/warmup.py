@@ -0,0 +1,106 @@
+import os
+import time
+import asyncio
+import inspect
+from typing import Callable
+from helpers.metrics import registry, Gauge
+from repositories.env import WARMUP_RETRY_SECONDS
+
+startup_seconds = registry.register(
+    Gauge(
+        "chess_agent_startup_seconds",
+        "Seconds from process start until the app was imported and until it was ready.",
+        labels=("phase",),
+    )
+)
+
+
+def process_started_at() -> float:
+    """When this process started, on the time.perf_counter() clock.
+
+    Read from /proc, so interpreter start-up and imports count too. Elsewhere
+    it falls back to the time this module was imported.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; starttime is the 20th field after its ")".
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter()
+    return time.perf_counter() - (uptime - started_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+class WarmUp:
+    """Runs start-up steps in the background and tracks readiness.
+
+    Steps are callables; async ones are awaited and plain ones run in a
+    thread, so the loop can serve liveness checks meanwhile. All steps start
+    at once and each failing step is retried every `retry_interval` seconds.
+    The process is ready once every step has succeeded.
+    """
+
+    def __init__(self, retry_interval=WARMUP_RETRY_SECONDS):
+        self.retry_interval = retry_interval
+        self.started = process_started_at()
+        self.steps: dict[str, Callable] = {}
+        self.results: dict[str, dict] = {}
+        self.import_seconds: float | None = None
+        self.ready_seconds: float | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    def step(self, name: str, function: Callable):
+        self.steps[name] = function
+
+    def imported(self):
+        """Marks the end of the app's imports."""
+        self.import_seconds = time.perf_counter() - self.started
+        startup_seconds.set(self.import_seconds, phase="import")
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run_step(self, name: str, function: Callable):
+        while True:
+            step_started = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(function):
+                    await function()
+                else:
+                    await asyncio.to_thread(function)
+            except Exception as e:
+                self.results[name] = {"error": f"{type(e).__name__}: {e}"}
+                print(f"Warm-up step {name} failed, retrying in {self.retry_interval}s: {e}")
+                await asyncio.sleep(self.retry_interval)
+                continue
+            self.results[name] = {"seconds": round(time.perf_counter() - step_started, 4)}
+            return
+
+    async def _run(self):
+        await asyncio.gather(*(self._run_step(name, function) for name, function in self.steps.items()))
+        self.ready_seconds = time.perf_counter() - self.started
+        startup_seconds.set(self.ready_seconds, phase="ready")
+        print(f"Ready {self.ready_seconds:.2f}s after the process started")
+
+    async def aclose(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "import_seconds": round(self.import_seconds, 4) if self.import_seconds is not None else None,
+            "ready_seconds": round(self.ready_seconds, 4) if self.ready_seconds is not None else None,
+            "steps": {name: self.results.get(name, {"pending": True}) for name in self.steps},
+        }
+
+
+warmup = WarmUp()
@@ -1,16 +1,82 @@
 import os
+import json
+import asyncio
 import schemas
-from fastapi import FastAPI, BackgroundTasks, Request, HTTPException
-from fastapi.responses import HTMLResponse
-from repositories.env import DEPLOYMENT_TYPE, DeploymentTypes, PORT
+from functools import partial
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, BackgroundTasks, Request, HTTPException, Query, Header
+from fastapi.responses import HTMLResponse, Response, PlainTextResponse, JSONResponse
+from repositories.env import (
+    DEPLOYMENT_TYPE,
+    DeploymentTypes,
+    PORT,
+    ARCHIVER_ENABLED,
+    RPC_BATCH_CONCURRENCY,
+    RPC_BATCH_MAX_SIZE,
+    str_to_bool,
+    LOOP_LAG_MONITOR_ENABLED,
+    WARMUP_ENABLED,
+    WARMUP_ENGINES,
+)
 from messaging.webhook import handle_message_send_with_webhook
-from messaging.blocking import handle_message_send, handle_get_task
+from messaging.delivery import webhook_delivery
+from messaging.blocking import handle_message_send, handle_get_task, handle_cancel_task
+from messaging.streaming import handle_message_stream, handle_resubscribe
 from agent_details.card import get_agent_card
+from repositories.idempotency import IdempotencyStore
+from repositories.archive import GameArchiver
+from repositories.redis import get_redis_client
+from repositories.minio import get_minio_client
+from repositories.agent import load_model, llm_breaker, llm_latency, hedge_delay
+from game.init import game_repo, task_cancellation
+from game.command_processor import is_replayable
+from game.utils import warm_up_renderer
+from repositories.engine import engine_pool
+from helpers.metrics import registry, rpc_requests_total, errors_total, requests_in_flight, engines_busy
+from helpers.tracing import tracer
+from helpers.profiling import profiles
+from helpers.loop_monitor import loop_monitor
+from helpers.capture import capture
+from helpers.warmup import warmup
+from helpers.serialization import json_response
 from dotenv import load_dotenv
 
 load_dotenv()
+warmup.imported()
 
-app = FastAPI()
+idempotency = IdempotencyStore(keep=is_replayable)
+archiver = GameArchiver()
+engines_busy.set_function(lambda: engine_pool.busy)
+
+if WARMUP_ENABLED:
+    warmup.step("engines", partial(engine_pool.warm_up, WARMUP_ENGINES or None))
+    warmup.step("model", load_model)
+    warmup.step("renderer", warm_up_renderer)
+    warmup.step("redis", lambda: get_redis_client().ping())
+    warmup.step("minio", get_minio_client)
+    if DEPLOYMENT_TYPE == DeploymentTypes.WEBHOOK.value:
+        warmup.step("webhook_client", lambda: webhook_delivery.client)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup.start()
+    archiver_task = asyncio.create_task(archiver.run_forever()) if ARCHIVER_ENABLED else None
+    if LOOP_LAG_MONITOR_ENABLED:
+        loop_monitor.start()
+    yield
+    await warmup.aclose()
+    await loop_monitor.aclose()
+    if archiver_task:
+        archiver_task.cancel()
+    await task_cancellation.aclose()
+    await engine_pool.close()
+    await webhook_delivery.aclose()
+    tracer.flush()
+    capture.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -18,36 +84,141 @@ def read_root():
     return '<p style="font-size:40px">Chess bot A2A</p>'
 
 
-@app.post("/")
-async def handle_rpc(request_data: dict, background_tasks: BackgroundTasks):
-    try:
-        rpc_request = schemas.A2ARequest.validate_python(request_data)
+async def dispatch_message_send(params: schemas.MessageSendParams, background_tasks: BackgroundTasks):
+    if DEPLOYMENT_TYPE == DeploymentTypes.BLOCKING.value:
+        print("handling blocking mode")
+        return await handle_message_send(params=params)
+    elif DEPLOYMENT_TYPE == DeploymentTypes.STREAMING.value:
+        print("handling streaming mode, message/send is answered in one response")
+        return await handle_message_send(params=params)
+    elif DEPLOYMENT_TYPE == DeploymentTypes.WEBHOOK.value:
+        print("handling webhooks mode")
+        return await handle_message_send_with_webhook(
+            params=params, background_tasks=background_tasks
+        )
+    else:
+        print("defaulting to blocking mode")
+        return await handle_message_send(params=params)
+
 
+async def dispatch_rpc(
+    rpc_request,
+    background_tasks: BackgroundTasks,
+    last_event_id: str | None = None,
+):
+    rpc_requests_total.inc(method=rpc_request.method)
+    with tracer.span(rpc_request.method, {"rpc.method": rpc_request.method}):
         if isinstance(rpc_request, schemas.SendMessageRequest):
             print("Recieved message/send")
-            if DEPLOYMENT_TYPE == DeploymentTypes.BLOCKING.value:
-                print("handling blocking mode")
-                return await handle_message_send(params=rpc_request.params)
-            elif DEPLOYMENT_TYPE == DeploymentTypes.STREAMING.value:
-                print("handling streaming mode")
-                pass
-            elif DEPLOYMENT_TYPE == DeploymentTypes.WEBHOOK.value:
-                print("handling webhooks mode")
-                return await handle_message_send_with_webhook(
-                    params=rpc_request.params, background_tasks=background_tasks
-                )
-            else:
-                print("defaulting to blocking mode")
-                return await handle_message_send(params=rpc_request.params)
+            message = rpc_request.params.message
+            return await idempotency.run(
+                scope=message.task_id or message.context_id,
+                message_id=message.message_id,
+                compute=lambda: dispatch_message_send(rpc_request.params, background_tasks),
+            )
+        elif isinstance(rpc_request, schemas.StreamMessageRequest):
+            print("Recieved message/stream")
+            return await handle_message_stream(rpc_request)
+        elif isinstance(rpc_request, schemas.TaskResubscriptionRequest):
+            print("tasks/resubscribe")
+            return await handle_resubscribe(rpc_request, last_event_id)
         elif isinstance(rpc_request, schemas.GetTaskRequest):
             print("tasks/get")
             return await handle_get_task(params=rpc_request.params)
+        elif isinstance(rpc_request, schemas.CancelTaskRequest):
+            print("tasks/cancel")
+            return await handle_cancel_task(rpc_request)
         else:
             raise HTTPException(status_code=400, detail="Method not supported")
 
+
+async def handle_batch_element(element, background_tasks: BackgroundTasks, slots: asyncio.Semaphore):
+    rpc_id = element.get("id") if isinstance(element, dict) else None
+    try:
+        rpc_request = schemas.A2ARequest.validate_python(element)
     except Exception as e:
-        print(f"Error processing request: {e}")
-        raise HTTPException(status_code=400, detail="Could not handle task")
+        print(f"Invalid request in batch: {e}")
+        return schemas.JSONRPCResponse(id=rpc_id, error=schemas.InvalidRequestError())
+
+    if isinstance(rpc_request, (schemas.StreamMessageRequest, schemas.TaskResubscriptionRequest)):
+        response = schemas.JSONRPCResponse(
+            id=rpc_id,
+            error=schemas.UnsupportedOperationError(message="Streaming methods cannot be batched"),
+        )
+    else:
+        async with slots:
+            try:
+                response = await dispatch_rpc(rpc_request, background_tasks)
+            except HTTPException:
+                response = schemas.JSONRPCResponse(id=rpc_id, error=schemas.MethodNotFoundError())
+            except Exception as e:
+                print(f"Error processing batch request: {e}")
+                errors_total.inc(error=type(e).__name__)
+                response = schemas.JSONRPCResponse(
+                    id=rpc_id, error=schemas.InternalError(message="Could not handle task")
+                )
+
+    if "id" not in element:
+        # A notification: the caller expects no answer, not even an error.
+        return None
+    # Answer with the caller's id, also for responses built without one.
+    if isinstance(response, dict):
+        return {**response, "id": rpc_id}
+    return response.model_copy(update={"id": rpc_id})
+
+
+async def handle_rpc_batch(batch: list, background_tasks: BackgroundTasks):
+    """JSON-RPC 2.0 batch: elements run concurrently, up to RPC_BATCH_CONCURRENCY
+    at a time, and each gets its own response or error, in request order.
+    Notifications (elements without an id) get no response."""
+    if not batch or len(batch) > RPC_BATCH_MAX_SIZE:
+        return schemas.JSONRPCResponse(id=None, error=schemas.InvalidRequestError(
+            data=f"A batch holds 1 to {RPC_BATCH_MAX_SIZE} requests"
+        ))
+
+    slots = asyncio.Semaphore(RPC_BATCH_CONCURRENCY)
+    responses = await asyncio.gather(
+        *(handle_batch_element(element, background_tasks, slots) for element in batch)
+    )
+    responses = [response for response in responses if response is not None]
+    return responses or Response(status_code=204)
+
+
+@app.post("/")
+async def handle_rpc(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    last_event_id: str | None = Header(default=None),
+    traceparent: str | None = Header(default=None),
+    x_profile: str | None = Header(default=None),
+):
+    # The body is validated straight from bytes and the answer encoded once,
+    # instead of FastAPI parsing it to a dict and re-encoding the response.
+    body = await request.body()
+    with (
+        requests_in_flight.track_inprogress(),
+        tracer.span("handle_rpc", traceparent=traceparent) as span,
+        profiles.profile(span.trace_id, requested=str_to_bool(x_profile)),
+        capture.request(body),
+    ):
+        if body.lstrip().startswith(b"["):
+            try:
+                batch = json.loads(body)
+            except ValueError as e:
+                print(f"Error processing request: {e}")
+                errors_total.inc(error=type(e).__name__)
+                raise HTTPException(status_code=400, detail="Could not handle task")
+            print(f"Recieved batch of {len(batch)} requests")
+            return json_response(await handle_rpc_batch(batch, background_tasks))
+
+        try:
+            rpc_request = schemas.A2ARequest.validate_json(body)
+            return json_response(await dispatch_rpc(rpc_request, background_tasks, last_event_id))
+
+        except Exception as e:
+            print(f"Error processing request: {e}")
+            errors_total.inc(error=type(e).__name__)
+            raise HTTPException(status_code=400, detail="Could not handle task")
 
 
 @app.get("/.well-known/agent.json")
@@ -61,6 +232,59 @@ def agent_card(request: Request):
     return get_agent_card(base_url)
 
 
+@app.get("/games")
+def list_games(
+    user_id: str | None = None,
+    channel_id: str | None = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+):
+    if not (user_id or channel_id):
+        raise HTTPException(status_code=400, detail="user_id or channel_id is required")
+
+    games, read = game_repo.list_games(user_id, channel_id, offset, limit)
+    return {
+        "games": games,
+        # Expired games read on this page were removed from the index.
+        "next_offset": offset + len(games) if read == limit else None,
+    }
+
+
+@app.get("/ready")
+def ready():
+    return JSONResponse(warmup.stats, status_code=200 if warmup.ready else 503)
+
+
+@app.get("/archive/stats")
+def archive_stats():
+    return archiver.stats
+
+
+@app.get("/webhook/stats")
+def webhook_stats():
+    return {**webhook_delivery.stats, "latency_seconds": webhook_delivery.latency_percentiles()}
+
+
+@app.get("/llm/stats")
+def llm_stats():
+    p95 = llm_latency.quantile(0.95)
+    return {
+        **llm_breaker.stats,
+        "latency_p95_seconds": round(p95, 4) if p95 is not None else None,
+        "hedge_delay_seconds": hedge_delay(),
+    }
+
+
+@app.get("/loop/stats")
+def loop_stats():
+    return loop_monitor.stats
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/telex-extensions")
 def telex_extensions():
     return {"isPaid": True}
@@ -1,18 +1,20 @@
 import schemas
 from uuid import uuid4
-from repositories.game import GameRepository
-from repositories.redis import r as redis_client
-from game.move import process_message
-
-game_repo = GameRepository(redis_client)
+from game.move import process_user_message, resolve_task_id
+from game.init import game_repo, task_cancellation, task_store
+from helpers.task_locks import task_locks
 
 async def handle_message_send(params: schemas.MessageSendParams):
-    task_id = uuid4().hex if not params.message.task_id else params.message.task_id
-    user_input = params.message.parts[0].text.strip()
+    task_id = resolve_task_id(params.message)
 
-    return await process_message(task_id, user_input)
+    return await process_user_message(task_id, params.message)
 
 async def handle_get_task(params: schemas.TaskQueryParams):
+    task = task_store.get(params.id, params.history_length)
+    if task:
+        return schemas.GetTaskResponse(result=task)
+
+    # Tasks played before responses were cached only have their game state.
     task_state = game_repo.task_state(params.id)
 
     response = schemas.GetTaskResponse(
@@ -32,3 +34,22 @@ async def handle_get_task(params: schemas.TaskQueryParams):
     )
 
     return response
+
+
+async def handle_cancel_task(rpc_request: schemas.CancelTaskRequest):
+    """Stops whatever the task is doing on any worker and ends its game."""
+    task_id = rpc_request.params.id
+    game = game_repo.load(task_id)
+    if not game:
+        return schemas.CancelTaskResponse(id=rpc_request.id, error=schemas.TaskNotFoundError())
+    if game.state in (schemas.TaskState.completed, schemas.TaskState.canceled):
+        return schemas.CancelTaskResponse(id=rpc_request.id, error=schemas.TaskNotCancelableError())
+
+    task_cancellation.cancel(task_id)
+    # Local work unwinds before the lock is ours; work elsewhere loses its
+    # next save to this one and stops on the canceled state.
+    async with task_locks.hold(task_id):
+        game_repo.cancel(task_id)
+        task_store.set_status(task_id, schemas.TaskStatus(state=schemas.TaskState.canceled))
+
+    return schemas.CancelTaskResponse(id=rpc_request.id, result=task_store.get(task_id, history_length=0))
@@ -0,0 +1,135 @@
+import time
+import random
+import asyncio
+import importlib.util
+from collections import deque
+from urllib.parse import urlsplit
+import httpx
+from helpers.metrics import stage_seconds, errors_total
+from helpers.tracing import tracer, current_traceparent
+from repositories.env import (
+    WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_BACKOFF_BASE_SECONDS,
+    WEBHOOK_BACKOFF_MAX_SECONDS,
+    WEBHOOK_PER_HOST_CONCURRENCY,
+    WEBHOOK_TIMEOUT_SECONDS,
+)
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class WebhookDeliveryError(Exception):
+    """Raised by callers that must not drop a payload deliver() gave up on."""
+
+
+class WebhookDelivery:
+    """Delivers webhook payloads over one pooled AsyncClient.
+
+    Connections are kept alive (and use HTTP/2 when `h2` is installed),
+    each host gets at most `per_host_concurrency` requests in flight, and
+    transport errors or retryable statuses are retried with exponential
+    backoff and full jitter.
+    """
+
+    def __init__(
+        self,
+        max_attempts=WEBHOOK_MAX_ATTEMPTS,
+        backoff_base=WEBHOOK_BACKOFF_BASE_SECONDS,
+        backoff_max=WEBHOOK_BACKOFF_MAX_SECONDS,
+        per_host_concurrency=WEBHOOK_PER_HOST_CONCURRENCY,
+        timeout=WEBHOOK_TIMEOUT_SECONDS,
+    ):
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.per_host_concurrency = per_host_concurrency
+        self.timeout = timeout
+        self._client: httpx.AsyncClient | None = None
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+        self._latencies = deque(maxlen=1000)
+        self.stats = {
+            "delivered": 0,
+            "failed": 0,
+            "retries": 0,
+            "in_flight": 0,
+        }
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=100, max_connections=None),
+            )
+        return self._client
+
+    def _host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_slots[host]
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def _post(self, url: str, headers: dict, payload: dict | bytes) -> httpx.Response:
+        if traceparent := current_traceparent():
+            headers = {**headers, "traceparent": traceparent}
+        async with self._host_slot(url):
+            if isinstance(payload, bytes):
+                return await self.client.post(
+                    url, headers={"Content-Type": "application/json", **headers}, content=payload
+                )
+            return await self.client.post(url, headers=headers, json=payload)
+
+    async def deliver(self, url: str, headers: dict, payload: dict | bytes) -> bool:
+        with tracer.span("webhook", {"server.address": urlsplit(url).netloc}):
+            started = time.perf_counter()
+            self.stats["in_flight"] += 1
+            try:
+                for attempt in range(self.max_attempts):
+                    if attempt:
+                        self.stats["retries"] += 1
+                        await asyncio.sleep(self._backoff(attempt))
+
+                    try:
+                        res = await self._post(url, headers, payload)
+                    except httpx.TransportError as e:
+                        print(f"Webhook delivery attempt {attempt + 1} failed: {e!r}")
+                        continue
+
+                    if res.status_code < 300:
+                        print("Succeeded in webhook response")
+                        self.stats["delivered"] += 1
+                        return True
+
+                    print(f"Failed to send webhook response: status - {res.status_code} body - {res.text}")
+                    if res.status_code not in RETRYABLE_STATUS_CODES:
+                        break
+
+                self.stats["failed"] += 1
+                errors_total.inc(error="WebhookDeliveryFailed")
+                return False
+            finally:
+                self.stats["in_flight"] -= 1
+                self._latencies.append(time.perf_counter() - started)
+                stage_seconds.observe(time.perf_counter() - started, stage="webhook")
+
+    def latency_percentiles(self) -> dict[str, float]:
+        if not self._latencies:
+            return {}
+        ordered = sorted(self._latencies)
+
+        def pick(q: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+        return {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99)}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+webhook_delivery = WebhookDelivery()
@@ -0,0 +1,239 @@
+import os
+import json
+import socket
+import asyncio
+import schemas
+from uuid import uuid4
+from typing import Any
+from redis.exceptions import RedisError
+from repositories.redis import RedisKeys, get_redis_client
+from repositories.env import (
+    WORKER_CONCURRENCY,
+    JOB_CLAIM_IDLE_SECONDS,
+    JOB_MAX_DELIVERIES,
+    JOB_AUTH_TTL_SECONDS,
+    JOB_DEAD_LETTER_MAXLEN,
+    JOB_DEAD_LETTER_TTL_SECONDS,
+)
+
+CONSUMER_GROUP = "webhook-workers"
+
+
+class WebhookJobQueue:
+    """Durable webhook jobs on a Redis Stream, consumed through a consumer group.
+
+    The API process only XADDs. Workers XREADGROUP jobs, ack and delete them
+    once the webhook went out, and periodically claim jobs that another
+    worker picked up but never acked (e.g. it was restarted mid-move). Jobs
+    delivered JOB_MAX_DELIVERIES times are moved to a dead-letter stream.
+
+    Webhook credentials stay out of the streams: each job keeps them in its
+    own expiring key, which the worker deletes once the job is done.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        stream=RedisKeys.webhook_jobs,
+        dead_letter_stream=RedisKeys.webhook_jobs_dead,
+        group=CONSUMER_GROUP,
+        auth_prefix=RedisKeys.webhook_job_auth,
+        auth_ttl=JOB_AUTH_TTL_SECONDS,
+    ):
+        self._r = redis_client
+        self.stream = stream
+        self.dead_letter_stream = dead_letter_stream
+        self.group = group
+        self.auth_prefix = auth_prefix
+        self.auth_ttl = auth_ttl
+
+    @property
+    def r(self):
+        if self._r is None:
+            self._r = get_redis_client()
+        return self._r
+
+    def enqueue(
+        self,
+        params: schemas.MessageSendParams,
+        task_id: str,
+        webhook_url: str,
+        auth_headers: dict[str, Any],
+        traceparent: str | None = None,
+    ) -> str:
+        auth_id = uuid4().hex
+        self.r.set(f"{self.auth_prefix}:{auth_id}", json.dumps(auth_headers), ex=self.auth_ttl)
+        fields = {
+            "params": params.model_dump_json(by_alias=True),
+            "task_id": task_id,
+            "webhook_url": webhook_url,
+            "auth_id": auth_id,
+        }
+        if traceparent:
+            fields["traceparent"] = traceparent
+        return self.r.xadd(self.stream, fields)
+
+
+class WebhookJobWorker:
+    def __init__(
+        self,
+        async_redis_client,
+        handler,
+        stream=RedisKeys.webhook_jobs,
+        dead_letter_stream=RedisKeys.webhook_jobs_dead,
+        group=CONSUMER_GROUP,
+        auth_prefix=RedisKeys.webhook_job_auth,
+        consumer: str | None = None,
+        concurrency=WORKER_CONCURRENCY,
+        claim_idle_seconds=JOB_CLAIM_IDLE_SECONDS,
+        max_deliveries=JOB_MAX_DELIVERIES,
+        dead_letter_maxlen=JOB_DEAD_LETTER_MAXLEN,
+        dead_letter_ttl=JOB_DEAD_LETTER_TTL_SECONDS,
+        max_backoff_seconds=30.0,
+    ):
+        self.r = async_redis_client
+        self.handler = handler
+        self.stream = stream
+        self.dead_letter_stream = dead_letter_stream
+        self.group = group
+        self.auth_prefix = auth_prefix
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = concurrency
+        self.claim_idle_ms = int(claim_idle_seconds * 1000)
+        self.max_deliveries = max_deliveries
+        self.dead_letter_maxlen = dead_letter_maxlen
+        self.dead_letter_ttl = dead_letter_ttl
+        self.max_backoff_seconds = max_backoff_seconds
+        self._slots = asyncio.Semaphore(concurrency)
+        self._running: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    async def _ensure_group(self):
+        try:
+            await self.r.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _auth_key(self, fields: dict) -> str | None:
+        return f"{self.auth_prefix}:{fields['auth_id']}" if "auth_id" in fields else None
+
+    async def _auth_headers(self, fields: dict) -> dict[str, Any]:
+        if "auth_headers" in fields:
+            # Queued before credentials moved out of the stream.
+            return json.loads(fields["auth_headers"])
+        stored = await self.r.get(self._auth_key(fields))
+        if stored is None:
+            raise LookupError(f"Webhook credentials of job for task {fields['task_id']} expired")
+        return json.loads(stored)
+
+    async def _process(self, job_id: str, fields: dict):
+        try:
+            params = schemas.MessageSendParams.model_validate_json(fields["params"])
+            await self.handler(
+                params,
+                fields["task_id"],
+                fields["webhook_url"],
+                await self._auth_headers(fields),
+                fields.get("traceparent"),
+            )
+            await self.r.xack(self.stream, self.group, job_id)
+            await self.r.xdel(self.stream, job_id)
+            if auth_key := self._auth_key(fields):
+                await self.r.delete(auth_key)
+        except Exception as e:
+            # Left unacked, so it is reclaimed and retried after claim_idle_ms.
+            print(f"Job {job_id} failed: {e!r}")
+        finally:
+            self._slots.release()
+
+    async def _start(self, job_id: str, fields: dict):
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(job_id, fields))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _dead_letter(self, job_id: str):
+        entries = await self.r.xrange(self.stream, job_id, job_id)
+        if entries:
+            _, fields = entries[0]
+            fields = {name: value for name, value in fields.items() if name != "auth_headers"}
+            await self.r.xadd(
+                self.dead_letter_stream,
+                {**fields, "job_id": job_id},
+                maxlen=self.dead_letter_maxlen,
+                approximate=True,
+            )
+            await self.r.expire(self.dead_letter_stream, self.dead_letter_ttl)
+            if auth_key := self._auth_key(fields):
+                await self.r.delete(auth_key)
+        await self.r.xack(self.stream, self.group, job_id)
+        await self.r.xdel(self.stream, job_id)
+        print(f"Job {job_id} moved to {self.dead_letter_stream}")
+
+    async def reclaim_stale(self):
+        pending = await self.r.xpending_range(
+            self.stream, self.group, min="-", max="+", count=100, idle=self.claim_idle_ms
+        )
+        for entry in pending:
+            job_id = entry["message_id"]
+            if entry["times_delivered"] >= self.max_deliveries:
+                await self._dead_letter(job_id)
+                continue
+
+            claimed = await self.r.xclaim(
+                self.stream, self.group, self.consumer, self.claim_idle_ms, [job_id]
+            )
+            for claimed_id, fields in claimed:
+                if fields:
+                    print(f"Reclaimed stale job {claimed_id} from {entry['consumer']}")
+                    await self._start(claimed_id, fields)
+
+    async def _reclaim_loop(self):
+        while not self._stopping.is_set():
+            try:
+                await self.reclaim_stale()
+            except Exception as e:
+                print(f"Reclaiming stale jobs failed: {e!r}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.claim_idle_ms / 1000 / 2)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        await self._ensure_group()
+        print(f"Worker {self.consumer} consuming {self.stream} ({self.concurrency} at a time)")
+        reclaimer = asyncio.create_task(self._reclaim_loop())
+
+        backoff = 0.0
+        while not self._stopping.is_set():
+            free = max(1, self.concurrency - len(self._running))
+            try:
+                batches = await self.r.xreadgroup(
+                    self.group, self.consumer, {self.stream: ">"}, count=free, block=1000
+                )
+            except RedisError as e:
+                # A Redis restart or failover; the group may have to be recreated.
+                backoff = min(self.max_backoff_seconds, max(0.5, backoff * 2))
+                print(f"Reading jobs failed, retrying in {backoff:.1f}s: {e!r}")
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=backoff)
+                except asyncio.TimeoutError:
+                    pass
+                if "NOGROUP" in str(e):
+                    try:
+                        await self._ensure_group()
+                    except RedisError as e:
+                        print(f"Recreating the consumer group failed: {e!r}")
+                continue
+            backoff = 0.0
+            for _, entries in batches or []:
+                for job_id, fields in entries:
+                    await self._start(job_id, fields)
+
+        reclaimer.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def stop(self):
+        self._stopping.set()
@@ -0,0 +1,89 @@
+import asyncio
+import schemas
+from fastapi.responses import StreamingResponse
+from helpers.metrics import errors_total, requests_in_flight
+from helpers.tracing import tracer, current_traceparent
+from game.init import event_log
+from game.move import process_user_message, resolve_task_id
+
+
+def sse(rpc_id, result=None, error=None) -> str:
+    response = schemas.SendStreamingMessageResponse(id=rpc_id, result=result, error=error)
+    cursor = (result.metadata or {}).get("cursor") if result is not None else None
+    event_id = f"id: {cursor}\n" if cursor else ""
+    return f"{event_id}data: {response.model_dump_json(by_alias=True)}\n\n"
+
+
+# Turns whose client disconnected keep running here until they finish.
+detached_turns: set[asyncio.Task] = set()
+
+
+def finish_detached(work: asyncio.Task):
+    detached_turns.discard(work)
+    if not work.cancelled() and (e := work.exception()) is not None:
+        print(f"Error in a turn whose stream was closed: {e}")
+
+
+async def stream_message(rpc_id, params: schemas.MessageSendParams, traceparent: str | None = None):
+    task_id = resolve_task_id(params.message)
+    events: asyncio.Queue = asyncio.Queue()
+
+    # The body is sent after the request's span has ended, so the work gets
+    # its own span under the same trace.
+    async def traced_work():
+        with tracer.span("stream_message", {"task.id": task_id}, traceparent=traceparent):
+            return await process_user_message(task_id, params.message, on_event=events.put)
+
+    # handle_rpc stops counting once it returns the response, so the body
+    # counts itself for as long as it streams.
+    with requests_in_flight.track_inprogress():
+        work = asyncio.create_task(traced_work())
+        work.add_done_callback(lambda _: events.put_nowait(None))
+
+        try:
+            while (event := await events.get()) is not None:
+                yield sse(rpc_id, result=event)
+
+            try:
+                work.result()
+            except Exception as e:
+                print(f"Error streaming message: {e}")
+                errors_total.inc(error=type(e).__name__)
+                yield sse(rpc_id, error=schemas.InternalError(message="Could not handle task"))
+        finally:
+            # A closed stream does not end the turn: it is still saved and
+            # its events recorded for tasks/resubscribe. tasks/cancel stops it.
+            if not work.done():
+                detached_turns.add(work)
+                work.add_done_callback(finish_detached)
+
+
+async def handle_message_stream(rpc_request: schemas.StreamMessageRequest):
+    return StreamingResponse(
+        stream_message(rpc_request.id, rpc_request.params, current_traceparent()),
+        media_type="text/event-stream",
+    )
+
+
+async def replay_task_events(rpc_id, task_id: str, cursor: str | None):
+    with requests_in_flight.track_inprogress():
+        async for _, event in event_log.follow(task_id, cursor):
+            yield sse(rpc_id, result=event)
+
+
+async def handle_resubscribe(rpc_request: schemas.TaskResubscriptionRequest, last_event_id: str | None = None):
+    """Replays a task's recorded events from a cursor, then follows live ones.
+
+    The cursor comes from `params.metadata.cursor` or the SSE Last-Event-ID
+    header; without one the latest turn is replayed from its start.
+    """
+    task_id = rpc_request.params.id
+    cursor = (rpc_request.params.metadata or {}).get("cursor") or last_event_id
+
+    if not await event_log.exists(task_id):
+        return schemas.JSONRPCResponse(id=rpc_request.id, error=schemas.TaskNotFoundError())
+
+    return StreamingResponse(
+        replay_task_events(rpc_request.id, task_id, cursor),
+        media_type="text/event-stream",
+    )
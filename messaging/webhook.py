@@ -1,24 +1,145 @@
+import time
+import asyncio
 import schemas
 from typing import Any
 from fastapi import BackgroundTasks
 from uuid import uuid4
-import httpx
-from repositories.game import GameRepository
-from repositories.redis import r as redis_client
-from game.move import process_message
+from repositories.redis import RedisKeys
+from repositories.env import (
+    WEBHOOK_QUEUE_ENABLED,
+    WEBHOOK_PARTIAL_UPDATES,
+    WEBHOOK_PARTIAL_INTERVAL_SECONDS,
+)
+from repositories.idempotency import IdempotencyStore
+from game.move import process_user_message, resolve_task_id
+from game.command_processor import is_replayable
 from helpers.utils import safe_get
+from helpers.tracing import tracer, current_span, current_traceparent
+from helpers.serialization import dump_json
+from messaging.delivery import webhook_delivery, WebhookDeliveryError
+from messaging.queue import WebhookJobQueue
 
-game_repo = GameRepository(redis_client)
+job_queue = WebhookJobQueue()
+job_results = IdempotencyStore(redis_key_prefix=RedisKeys.job_results, keep=is_replayable)
 
-async def actual_messaging(params: schemas.MessageSendParams, task_id:str, webhook_url: str, auth_headers: dict[str, Any]):
-    user_input = params.message.parts[0].text.strip()
-    response = await process_message(task_id, user_input)
+def with_trace_metadata(payload):
+    """Adds the current trace id to the metadata of the payload's result.
 
-    res = httpx.post(webhook_url, headers=auth_headers, json=response.model_dump(by_alias=True))
-    if res.status_code < 300:
-        print("Succeeded in webhook response")
-    else:
-        print(f"Failed to send webhook response: status - {res.status_code} body - {res.text}")
+    Takes a response model, or a dict for responses replayed from storage.
+    """
+    span = current_span()
+    if not span:
+        return payload
+    if isinstance(payload, dict):
+        result = payload.get("result")
+        if isinstance(result, dict):
+            result["metadata"] = {**(result.get("metadata") or {}), "trace_id": span.trace_id}
+        return payload
+
+    result = getattr(payload, "result", None)
+    if result is None or not hasattr(result, "metadata"):
+        return payload
+    metadata = {**(result.metadata or {}), "trace_id": span.trace_id}
+    return payload.model_copy(update={"result": result.model_copy(update={"metadata": metadata})})
+
+
+class PartialChatRelay:
+    """Sends streamed chat text to the webhook in batches rather than per token.
+
+    Chunks are buffered for `interval` seconds and delivered in order as
+    `chat` artifact updates; `drain` waits for them before the final
+    response goes out.
+    """
+
+    def __init__(self, task_id: str, webhook_url: str, auth_headers: dict[str, Any], interval=WEBHOOK_PARTIAL_INTERVAL_SECONDS):
+        self.task_id = task_id
+        self.webhook_url = webhook_url
+        self.auth_headers = auth_headers
+        self.interval = interval
+        self._buffer: list[str] = []
+        self._appending = False
+        self._last_flush = time.monotonic()
+        self._sending: asyncio.Task | None = None
+
+    async def __call__(self, event):
+        if not isinstance(event, schemas.TaskArtifactUpdateEvent) or event.artifact.name != "chat":
+            return
+
+        self._buffer.append(event.artifact.parts[0].text)
+        last = bool(event.artifact.last_chunk)
+        if last or time.monotonic() - self._last_flush >= self.interval:
+            self._flush(last)
+
+    def _flush(self, last: bool):
+        artifact = schemas.Artifact(
+            name="chat",
+            index=0,
+            parts=[schemas.TextPart(text="".join(self._buffer))],
+            append=self._appending,
+            lastChunk=last,
+        )
+        payload = dump_json(
+            with_trace_metadata(
+                schemas.SendStreamingMessageResponse(
+                    result=schemas.TaskArtifactUpdateEvent(id=self.task_id, artifact=artifact)
+                )
+            )
+        )
+
+        self._buffer = []
+        self._appending = True
+        self._last_flush = time.monotonic()
+        self._sending = asyncio.create_task(self._send_after(self._sending, payload))
+
+    async def _send_after(self, previous: asyncio.Task | None, payload: bytes):
+        if previous:
+            await previous
+        await webhook_delivery.deliver(self.webhook_url, self.auth_headers, payload)
+
+    async def drain(self):
+        if self._sending:
+            await self._sending
+
+
+async def actual_messaging(
+    params: schemas.MessageSendParams,
+    task_id: str,
+    webhook_url: str,
+    auth_headers: dict[str, Any],
+    traceparent: str | None = None,
+):
+    with tracer.span("webhook_message", {"task.id": task_id}, traceparent=traceparent):
+        relay = PartialChatRelay(task_id, webhook_url, auth_headers) if WEBHOOK_PARTIAL_UPDATES else None
+        response = await process_user_message(task_id, params.message, on_event=relay)
+        if relay:
+            await relay.drain()
+
+        await webhook_delivery.deliver(webhook_url, auth_headers, dump_json(with_trace_metadata(response)))
+
+
+async def run_webhook_job(
+    params: schemas.MessageSendParams,
+    task_id: str,
+    webhook_url: str,
+    auth_headers: dict[str, Any],
+    traceparent: str | None = None,
+):
+    """Worker side of a queued message: a reclaimed job re-sends the stored
+    response instead of playing the move a second time."""
+    with tracer.span("webhook_job", {"task.id": task_id}, traceparent=traceparent):
+        relay = PartialChatRelay(task_id, webhook_url, auth_headers) if WEBHOOK_PARTIAL_UPDATES else None
+        response = await job_results.run(
+            scope=task_id,
+            message_id=params.message.message_id,
+            compute=lambda: process_user_message(task_id, params.message, on_event=relay),
+        )
+        if relay:
+            await relay.drain()
+
+        # Failing the job leaves it pending, so it is reclaimed and the
+        # stored response is delivered again, or dead-lettered in the end.
+        if not await webhook_delivery.deliver(webhook_url, auth_headers, dump_json(with_trace_metadata(response))):
+            raise WebhookDeliveryError(webhook_url)
 
 
 async def handle_message_send_with_webhook(params: schemas.MessageSendParams, background_tasks: BackgroundTasks):
@@ -39,10 +160,14 @@ async def handle_message_send_with_webhook(params: schemas.MessageSendParams, ba
             ),
         )
     
-    existing_task_id = params.message.task_id
-    task_id = existing_task_id if existing_task_id else uuid4().hex
+    task_id = resolve_task_id(params.message)
 
-    background_tasks.add_task(actual_messaging, params, task_id, webhook_url, auth_headers)
+    if WEBHOOK_QUEUE_ENABLED:
+        job_queue.enqueue(params, task_id, webhook_url, auth_headers, current_traceparent())
+    else:
+        background_tasks.add_task(
+            actual_messaging, params, task_id, webhook_url, auth_headers, current_traceparent()
+        )
 
 
     return schemas.SendMessageResponse(
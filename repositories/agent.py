@@ -1,13 +1,26 @@
 import os
+import time
+import asyncio
+import chess
+from contextlib import AsyncExitStack
 from typing import Optional, Literal
 from pydantic import ConfigDict, BaseModel, Field
 from pydantic_ai import Agent, RunContext
-from pydantic_ai.models.gemini import GeminiModel
-from pydantic_ai.providers.google_gla import GoogleGLAProvider
-
-model = GeminiModel(
-    os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
-    provider=GoogleGLAProvider(api_key=os.getenv("GEMINI_API_KEY")),
+from helpers.metrics import registry, Counter
+from helpers.resilience import CircuitBreaker, LatencyWindow, hedged
+from repositories.env import (
+    CHAT_STREAM_DEBOUNCE_SECONDS,
+    LLM_TIMEOUT_SECONDS,
+    LLM_BREAKER_WINDOW_SECONDS,
+    LLM_BREAKER_MIN_CALLS,
+    LLM_BREAKER_FAILURE_RATE,
+    LLM_BREAKER_SLOW_CALL_SECONDS,
+    LLM_BREAKER_SLOW_RATE,
+    LLM_BREAKER_OPEN_SECONDS,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_QUANTILE,
+    LLM_HEDGE_MIN_DELAY_SECONDS,
+    LLM_HEDGE_MIN_SAMPLES,
 )
 
 class AgentDependencies(BaseModel):
@@ -22,7 +35,7 @@ class AgentDependencies(BaseModel):
 class ChessCommandResponse(BaseModel):
     """Response from the chess agent parsing user input."""
 
-    command_type: Literal["resign", "board", "move", "chat", "unknown"] = Field(
+    command_type: Literal["resign", "board", "move", "chat", "hint", "analysis", "unknown"] = Field(
         description="Type of command parsed from user input"
     )
 
@@ -42,14 +55,28 @@ class ChessCommandResponse(BaseModel):
     )
 
 
+# The model is set by load_model(), on the first command or during warm-up.
 chess_agent = Agent(
-    model,
+    None,
     deps_type=AgentDependencies,
     retries=2,
     output_type=ChessCommandResponse
 )
 
 
+def load_model():
+    """Builds the Gemini model and its HTTP client, unless a model is already set."""
+    if chess_agent.model is None:
+        from pydantic_ai.models.gemini import GeminiModel
+        from pydantic_ai.providers.google_gla import GoogleGLAProvider
+
+        chess_agent.model = GeminiModel(
+            os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+            provider=GoogleGLAProvider(api_key=os.getenv("GEMINI_API_KEY")),
+        )
+    return chess_agent.model
+
+
 def game_context(moves: list[str]):
     game_phase = ""
     context_hint = ""
@@ -99,7 +126,9 @@ def get_system_prompt(ctx: RunContext[AgentDependencies]) -> str:
     2. 'board' — user wants to see current position
     3. 'move' — convert input to valid chess move in algebraic notation
     4. 'chat' — answer chess questions or discuss the game
-    5. 'unknown' — input doesn't fit any category
+    5. 'hint' — user asks what to play or for a hint
+    6. 'analysis' — user wants an evaluation or the best lines of the current position
+    7. 'unknown' — input doesn't fit any category
 
     For natural language moves like 'castle kingside', 'take the pawn', or 'develop knight', 
     convert to proper algebraic notation (O-O, Nxe5, Nf3, etc.).
@@ -110,3 +139,138 @@ def get_system_prompt(ctx: RunContext[AgentDependencies]) -> str:
 
     For unclear input, use 'unknown' with a brief message asking what they meant.
     """
+
+
+llm_calls_total = registry.register(
+    Counter(
+        "chess_agent_llm_calls_total",
+        "Command parses by outcome: ok, error, timeout, or rejected while the breaker was open.",
+        labels=("outcome",),
+    )
+)
+llm_breaker = CircuitBreaker(
+    "llm",
+    window=LLM_BREAKER_WINDOW_SECONDS,
+    min_calls=LLM_BREAKER_MIN_CALLS,
+    failure_rate=LLM_BREAKER_FAILURE_RATE,
+    slow_call_seconds=LLM_BREAKER_SLOW_CALL_SECONDS,
+    slow_rate=LLM_BREAKER_SLOW_RATE,
+    open_seconds=LLM_BREAKER_OPEN_SECONDS,
+)
+llm_latency = LatencyWindow()
+
+LOCAL_COMMANDS = {"resign", "board", "hint", "analysis"}
+
+
+def local_command(message: str, board: chess.Board) -> ChessCommandResponse:
+    """Parses a command without the model: one-word commands and legal moves
+    in SAN or UCI. Used while the model is failing or too slow."""
+    text = message.strip()
+    word = text.lower().rstrip(".!")
+    if word in LOCAL_COMMANDS:
+        return ChessCommandResponse(command_type=word)
+
+    for parse in (board.parse_san, board.parse_uci):
+        try:
+            move = parse(text)
+        except ValueError:
+            continue
+        return ChessCommandResponse(command_type="move", move=board.san(move))
+
+    return ChessCommandResponse(
+        command_type="unknown",
+        message="The assistant is unavailable right now. Send a legal move, like Nf3 or g1f3, or 'board', 'hint' or 'resign'.",
+    )
+
+
+def hedge_delay() -> float | None:
+    """How long to wait for the model before sending a second request: the
+    configured quantile of recent latencies. None disables the hedge."""
+    if not LLM_HEDGE_ENABLED or llm_breaker.state != "closed" or len(llm_latency) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(LLM_HEDGE_MIN_DELAY_SECONDS, llm_latency.quantile(LLM_HEDGE_QUANTILE))
+
+
+def record_failure(call: int, started: float, error: BaseException):
+    seconds = time.perf_counter() - started
+    outcome = "timeout" if isinstance(error, TimeoutError) else "error"
+    llm_breaker.record(call, seconds, False)
+    llm_calls_total.inc(outcome=outcome)
+    print(f"Model call failed after {seconds:.2f}s, parsing locally: {error!r}")
+
+
+def record_success(call: int, started: float):
+    seconds = time.perf_counter() - started
+    llm_breaker.record(call, seconds, True)
+    llm_latency.observe(seconds)
+    llm_calls_total.inc(outcome="ok")
+
+
+async def run_command(message: str, deps: AgentDependencies, board: chess.Board) -> ChessCommandResponse:
+    """Parses a command with the model, within LLM_TIMEOUT_SECONDS and behind
+    the circuit breaker, falling back to local_command."""
+    call = llm_breaker.allow()
+    if call is None:
+        llm_calls_total.inc(outcome="rejected")
+        return local_command(message, board)
+
+    load_model()
+    started = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(
+            hedged("llm", lambda: chess_agent.run(message, deps=deps), hedge_delay()),
+            timeout=LLM_TIMEOUT_SECONDS,
+        )
+    except asyncio.CancelledError:
+        llm_breaker.release(call)
+        raise
+    except Exception as e:
+        record_failure(call, started, e)
+        return local_command(message, board)
+    record_success(call, started)
+    return result.output
+
+
+async def stream_command(message: str, deps: AgentDependencies, board: chess.Board):
+    """Like run_command, but yields partial responses as the model writes
+    them; the last one is complete. The deadline covers the whole stream.
+    Streams are not hedged, since a second stream would repeat the text."""
+    call = llm_breaker.allow()
+    if call is None:
+        llm_calls_total.inc(outcome="rejected")
+        yield local_command(message, board)
+        return
+
+    load_model()
+    started = time.perf_counter()
+    deadline = started + LLM_TIMEOUT_SECONDS
+
+    async def within_deadline(awaitable):
+        # Each step gets the time left, so the deadline never fires while
+        # the caller handles a partial response.
+        left = deadline - time.perf_counter()
+        if left <= 0:
+            awaitable.close()
+            raise TimeoutError()
+        return await asyncio.wait_for(awaitable, timeout=left)
+
+    try:
+        async with AsyncExitStack() as stack:
+            # The request is sent when the stream is entered.
+            result = await within_deadline(stack.enter_async_context(chess_agent.run_stream(message, deps=deps)))
+            partials = aiter(result.stream(debounce_by=CHAT_STREAM_DEBOUNCE_SECONDS))
+            while True:
+                try:
+                    partial = await within_deadline(anext(partials))
+                except StopAsyncIteration:
+                    break
+                yield partial
+    except (asyncio.CancelledError, GeneratorExit):
+        llm_breaker.release(call)
+        raise
+    except Exception as e:
+        record_failure(call, started, e)
+        yield local_command(message, board)
+        return
+    record_success(call, started)
+
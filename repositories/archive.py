@@ -0,0 +1,188 @@
+import io
+import gzip
+import json
+import time
+import asyncio
+import chess
+import chess.pgn
+from uuid import uuid4
+from functools import cached_property
+from datetime import datetime, timezone
+import schemas
+from repositories.redis import RedisKeys, mget, get_redis_client
+from repositories.minio import get_minio_client
+from repositories.env import (
+    MINIO_BUCKET_NAME,
+    ARCHIVE_BATCH_SIZE,
+    ARCHIVE_INTERVAL_SECONDS,
+)
+
+FINISHED_STATES = (schemas.TaskState.completed.value, schemas.TaskState.canceled.value)
+
+# Only delete a game if it still holds exactly what was archived.
+DELETE_IF_UNCHANGED = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def game_to_pgn(task_id: str, data: dict) -> str:
+    pgn = chess.pgn.Game()
+    pgn.headers["Event"] = "Chess Agent"
+    pgn.headers["Site"] = task_id
+    pgn.headers["Date"] = datetime.now(timezone.utc).strftime("%Y.%m.%d")
+    pgn.headers["White"] = "User"
+    pgn.headers["Black"] = "Chess Agent"
+
+    board = chess.Board()
+    try:
+        node = pgn
+        for uci in data.get("move_history", []):
+            move = chess.Move.from_uci(uci)
+            if move not in board.legal_moves:
+                raise ValueError(uci)
+            node = node.add_variation(move)
+            board.push(move)
+    except ValueError:
+        # History cannot be replayed, keep the final position instead.
+        pgn = chess.pgn.Game.from_board(chess.Board(data["fen"]))
+        pgn.headers["Event"] = "Chess Agent"
+        pgn.headers["Site"] = task_id
+        board = chess.Board(data["fen"])
+
+    pgn.headers["Result"] = board.result() if board.is_game_over() else "*"
+    return str(pgn)
+
+
+class GameArchiver:
+    """Moves completed games out of Redis into gzipped PGN chunks on MinIO.
+
+    Each run SCANs the games keyspace in batches, writes one PGN chunk per
+    batch of completed games and deletes them from Redis once the upload
+    succeeded. Only one worker archives per interval.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        minio_client=None,
+        bucket=MINIO_BUCKET_NAME,
+        redis_key_prefix=RedisKeys.games,
+        batch_size=ARCHIVE_BATCH_SIZE,
+        interval=ARCHIVE_INTERVAL_SECONDS,
+    ):
+        self._r = redis_client
+        self._minio = minio_client
+        self.bucket = bucket
+        self.prefix = redis_key_prefix
+        self.batch_size = batch_size
+        self.interval = interval
+        self.stats = {
+            "runs": 0,
+            "archived_total": 0,
+            "last_run_archived": 0,
+            "last_run_seconds": 0.0,
+            "last_run_games_per_second": 0.0,
+            "backlog": 0,
+            "active_games": 0,
+        }
+
+    @property
+    def r(self):
+        if self._r is None:
+            self._r = get_redis_client()
+        return self._r
+
+    @cached_property
+    def _delete_if_unchanged(self):
+        return self.r.register_script(DELETE_IF_UNCHANGED)
+
+    @property
+    def minio(self):
+        if self._minio is None:
+            self._minio = get_minio_client()
+        return self._minio
+
+    def _upload_chunk(self, pgns: list[str]) -> str:
+        body = gzip.compress("\n\n".join(pgns).encode())
+        now = datetime.now(timezone.utc)
+        object_name = f"archive/chessagent/{now:%Y/%m/%d}/{now:%H%M%S}-{uuid4().hex}.pgn.gz"
+        self.minio.put_object(
+            self.bucket,
+            object_name,
+            io.BytesIO(body),
+            len(body),
+            content_type="application/gzip",
+        )
+        return object_name
+
+    def _archive_batch(self, keys: list[str]) -> tuple[int, int, int]:
+        """Returns (archived, left over completed games, active games)."""
+        finished = []
+        active = 0
+        for key, raw in zip(keys, mget(self.r, keys)):
+            if raw is None:
+                continue
+            data = json.loads(raw)
+            if data.get("state") in FINISHED_STATES:
+                finished.append((key, raw, data))
+            else:
+                active += 1
+
+        if not finished:
+            return 0, 0, active
+
+        pgns = [game_to_pgn(key.split(":", 1)[1].strip("{}"), data) for key, _, data in finished]
+        object_name = self._upload_chunk(pgns)
+
+        archived = 0
+        for key, raw, _ in finished:
+            archived += self._delete_if_unchanged(keys=[key], args=[raw])
+
+        print(f"Archived {archived} games to {object_name}")
+        return archived, len(finished) - archived, active
+
+    def run_once(self):
+        started = time.perf_counter()
+        archived = backlog = active = 0
+        batch = []
+
+        for key in self.r.scan_iter(match=f"{self.prefix}:*", count=self.batch_size):
+            batch.append(key)
+            if len(batch) >= self.batch_size:
+                done, left, live = self._archive_batch(batch)
+                archived, backlog, active = archived + done, backlog + left, active + live
+                batch = []
+        if batch:
+            done, left, live = self._archive_batch(batch)
+            archived, backlog, active = archived + done, backlog + left, active + live
+
+        elapsed = time.perf_counter() - started
+        self.stats["runs"] += 1
+        self.stats["archived_total"] += archived
+        self.stats["last_run_archived"] = archived
+        self.stats["last_run_seconds"] = round(elapsed, 3)
+        self.stats["last_run_games_per_second"] = round(archived / elapsed, 1) if elapsed else 0.0
+        self.stats["backlog"] = backlog
+        self.stats["active_games"] = active
+        print(
+            f"Archiver run: {archived} games in {elapsed:.2f}s "
+            f"({self.stats['last_run_games_per_second']} games/s), "
+            f"backlog {backlog}, active games {active}"
+        )
+        return self.stats
+
+    async def run_forever(self):
+        while True:
+            try:
+                if self.r.set(RedisKeys.archiver_lock, uuid4().hex, nx=True, ex=self.interval):
+                    await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                print(f"Archiver run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+if __name__ == "__main__":
+    GameArchiver().run_once()
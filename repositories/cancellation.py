@@ -0,0 +1,131 @@
+import time
+import asyncio
+from repositories.redis import RedisKeys, hash_tag, create_async_redis_client, get_redis_client
+from repositories.env import TASK_CANCEL_TTL_SECONDS
+
+
+class TaskCanceledError(Exception):
+    """Raised from work on a task that was canceled through tasks/cancel."""
+
+
+class TaskCancellation:
+    """In-flight work per task, so tasks/cancel can abort it on any worker.
+
+    Work runs as its own asyncio task and is registered while it runs.
+    `cancel` aborts local work, sets a short-lived flag and publishes the
+    task id; every process listens on that channel and re-checks the flags
+    of its own work, which also covers a missed message or a cluster
+    without pub/sub. Flags and messages carry the time of the cancel, so
+    they only abort work that had started by then, not later messages.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        redis_key_prefix=RedisKeys.task_cancel,
+        ttl=TASK_CANCEL_TTL_SECONDS,
+        poll_interval=1.0,
+    ):
+        self._r = redis_client
+        self.prefix = redis_key_prefix
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._running: dict[str, dict[asyncio.Task, float]] = {}
+        self._listener: asyncio.Task | None = None
+        self._async_r = None
+
+    @property
+    def r(self):
+        if self._r is None:
+            self._r = get_redis_client()
+        return self._r
+
+    @property
+    def async_r(self):
+        if self._async_r is None:
+            self._async_r = create_async_redis_client()
+        return self._async_r
+
+    def _flag_key(self, task_id: str) -> str:
+        return f"{self.prefix}:{hash_tag(task_id)}"
+
+    def is_running(self, task_id: str) -> bool:
+        return bool(self._running.get(task_id))
+
+    async def run(self, task_id: str, coro):
+        """Awaits `coro` as cancelable work of the task.
+
+        Raises TaskCanceledError if the task was canceled meanwhile; if the
+        caller itself is cancelled, the work is cancelled with it.
+        """
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+        work = asyncio.ensure_future(coro)
+        running = self._running.setdefault(task_id, {})
+        running[work] = time.time()
+        try:
+            return await work
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if work.cancelled() and not current.cancelling():
+                raise TaskCanceledError(task_id) from None
+            raise
+        finally:
+            running.pop(work, None)
+            if not running:
+                self._running.pop(task_id, None)
+
+    def _cancel_local(self, task_id: str, canceled_at: float) -> bool:
+        running = [work for work, started in self._running.get(task_id, {}).items() if started <= canceled_at]
+        for work in running:
+            work.cancel()
+        return bool(running)
+
+    def cancel(self, task_id: str) -> bool:
+        """Cancels the task's work everywhere; True if some ran in this process."""
+        canceled_at = time.time()
+        canceled = self._cancel_local(task_id, canceled_at)
+        self.r.set(self._flag_key(task_id), canceled_at, ex=self.ttl)
+        self.r.publish(self.prefix, f"{canceled_at} {task_id}")
+        return canceled
+
+    async def _check_flags(self):
+        for task_id in list(self._running):
+            if canceled_at := await self.async_r.get(self._flag_key(task_id)):
+                self._cancel_local(task_id, float(canceled_at))
+
+    async def _listen(self):
+        pubsub = None
+        try:
+            while True:
+                try:
+                    if pubsub is None and hasattr(self.async_r, "pubsub"):
+                        pubsub = self.async_r.pubsub()
+                        await pubsub.subscribe(self.prefix)
+
+                    if pubsub:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=self.poll_interval
+                        )
+                        if message:
+                            canceled_at, task_id = message["data"].split(" ", 1)
+                            self._cancel_local(task_id, float(canceled_at))
+                    else:
+                        await asyncio.sleep(self.poll_interval)
+
+                    if self._running:
+                        await self._check_flags()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Task cancel listener failed: {e}")
+                    pubsub = None
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            if pubsub:
+                await pubsub.aclose()
+
+    async def aclose(self):
+        if self._listener:
+            self._listener.cancel()
@@ -0,0 +1,106 @@
+import asyncio
+import chess
+import chess.engine
+from contextlib import asynccontextmanager
+from repositories.env import CHESS_ENGINE_PATH, ENGINE_POOL_SIZE
+
+
+def score_dict(score: chess.engine.PovScore) -> dict:
+    """A score from White's point of view, as {"cp": ...} or {"mate": ...}."""
+    white = score.white()
+    return {"mate": white.mate()} if white.is_mate() else {"cp": white.score()}
+
+
+class EnginePool:
+    """UCI engine processes shared by every game of this process.
+
+    Engines are started on first use, up to `size`, and lent out for one
+    search at a time. Searches go through the async engine API, so
+    cancelling the caller sends `stop` to the engine instead of leaving it
+    thinking; the engine is reused once it has answered.
+    """
+
+    def __init__(self, path=CHESS_ENGINE_PATH, size=ENGINE_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._slots = asyncio.Semaphore(size)
+        self._idle: list[chess.engine.UciProtocol] = []
+        self._started = 0
+
+    @property
+    def busy(self) -> int:
+        return self._started - len(self._idle)
+
+    async def _start(self) -> chess.engine.UciProtocol:
+        _, engine = await chess.engine.popen_uci(self.path)
+        self._started += 1
+        return engine
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self._slots:
+            engine = None
+            while self._idle and engine is None:
+                engine = self._idle.pop()
+                if engine.returncode.done():
+                    # The process died while idle.
+                    self._started -= 1
+                    engine = None
+            if engine is None:
+                engine = await self._start()
+
+            try:
+                yield engine
+            except chess.engine.EngineError:
+                self._started -= 1
+                await self._quit(engine)
+                raise
+            except BaseException:
+                self._idle.append(engine)
+                raise
+            else:
+                self._idle.append(engine)
+
+    async def warm_up(self, count: int | None = None):
+        """Starts engines before the first search needs them, up to `count`
+        (the pool size by default), in parallel."""
+        wanted = min(self.size, count or self.size)
+        starting = 0
+
+        async def start_one():
+            nonlocal starting
+            async with self._slots:
+                if self._started + starting >= wanted:
+                    return
+                starting += 1
+                try:
+                    self._idle.append(await self._start())
+                finally:
+                    starting -= 1
+
+        await asyncio.gather(*(start_one() for _ in range(wanted)))
+
+    async def play(
+        self, board: chess.Board, limit: chess.engine.Limit, info=chess.engine.INFO_NONE
+    ) -> chess.engine.PlayResult:
+        async with self.acquire() as engine:
+            return await engine.play(board, limit, info=info)
+
+    async def analyse(self, board: chess.Board, limit: chess.engine.Limit, multipv: int | None = None):
+        async with self.acquire() as engine:
+            return await engine.analyse(board, limit, multipv=multipv)
+
+    @staticmethod
+    async def _quit(engine: chess.engine.UciProtocol):
+        try:
+            await asyncio.wait_for(engine.quit(), timeout=2)
+        except Exception:
+            pass
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        self._started -= len(idle)
+        await asyncio.gather(*(self._quit(engine) for engine in idle))
+
+
+engine_pool = EnginePool()
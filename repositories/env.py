@@ -17,8 +17,94 @@ MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT")
 MINIO_BUCKET_NAME = os.getenv("MINIO_BUCKET_NAME")
 MINIO_BUCKET_ACCESS_KEY = os.getenv("MINIO_BUCKET_ACCESS_KEY")
 MINIO_BUKCET_SECRET_KEY = os.getenv("MINIO_BUKCET_SECRET_KEY")
+MINIO_SECURE = str_to_bool(os.getenv("MINIO_SECURE", "true"))
 DEPLOYMENT_TYPE=os.getenv("DEPLOYMENT_TYPE", DeploymentTypes.BLOCKING.value)
 WITH_TELEX_EXTENSIONS=str_to_bool(os.getenv("WITH_TELEX_EXTENSIONS"))
 
 PORT = int(os.getenv("PORT", 7000))
+RPC_BATCH_CONCURRENCY = int(os.getenv("RPC_BATCH_CONCURRENCY", 8))
+RPC_BATCH_MAX_SIZE = int(os.getenv("RPC_BATCH_MAX_SIZE", 100))
 
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_CLUSTER = str_to_bool(os.getenv("REDIS_CLUSTER"))
+
+GAME_SAVE_MAX_RETRIES = int(os.getenv("GAME_SAVE_MAX_RETRIES", 3))
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 60 * 60))
+IDEMPOTENCY_PENDING_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_PENDING_TTL_SECONDS", 120))
+
+COMPLETED_GAME_TTL_SECONDS = int(os.getenv("COMPLETED_GAME_TTL_SECONDS", 7 * 24 * 60 * 60))
+ABANDONED_GAME_TTL_SECONDS = int(os.getenv("ABANDONED_GAME_TTL_SECONDS", 30 * 24 * 60 * 60))
+ARCHIVER_ENABLED = str_to_bool(os.getenv("ARCHIVER_ENABLED", "true"))
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", 600))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 5))
+WEBHOOK_BACKOFF_BASE_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_BASE_SECONDS", 0.5))
+WEBHOOK_BACKOFF_MAX_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_MAX_SECONDS", 30))
+WEBHOOK_PER_HOST_CONCURRENCY = int(os.getenv("WEBHOOK_PER_HOST_CONCURRENCY", 10))
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", 10))
+
+WEBHOOK_PARTIAL_UPDATES = str_to_bool(os.getenv("WEBHOOK_PARTIAL_UPDATES"))
+WEBHOOK_PARTIAL_INTERVAL_SECONDS = float(os.getenv("WEBHOOK_PARTIAL_INTERVAL_SECONDS", 0.5))
+CHAT_STREAM_DEBOUNCE_SECONDS = float(os.getenv("CHAT_STREAM_DEBOUNCE_SECONDS", 0.05))
+
+TASK_EVENT_LOG_MAXLEN = int(os.getenv("TASK_EVENT_LOG_MAXLEN", 200))
+TASK_EVENT_LOG_TTL_SECONDS = int(os.getenv("TASK_EVENT_LOG_TTL_SECONDS", 24 * 60 * 60))
+TASK_EVENT_FOLLOW_TIMEOUT_SECONDS = float(os.getenv("TASK_EVENT_FOLLOW_TIMEOUT_SECONDS", 300))
+TASK_HISTORY_MAXLEN = int(os.getenv("TASK_HISTORY_MAXLEN", 50))
+TASK_CACHE_TTL_SECONDS = int(os.getenv("TASK_CACHE_TTL_SECONDS", 30 * 24 * 60 * 60))
+
+WEBHOOK_QUEUE_ENABLED = str_to_bool(os.getenv("WEBHOOK_QUEUE_ENABLED"))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", 8))
+JOB_CLAIM_IDLE_SECONDS = float(os.getenv("JOB_CLAIM_IDLE_SECONDS", 60))
+JOB_MAX_DELIVERIES = int(os.getenv("JOB_MAX_DELIVERIES", 5))
+JOB_AUTH_TTL_SECONDS = int(os.getenv("JOB_AUTH_TTL_SECONDS", 24 * 60 * 60))
+JOB_DEAD_LETTER_MAXLEN = int(os.getenv("JOB_DEAD_LETTER_MAXLEN", 10000))
+JOB_DEAD_LETTER_TTL_SECONDS = int(os.getenv("JOB_DEAD_LETTER_TTL_SECONDS", 7 * 24 * 60 * 60))
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", 0))
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")
+TRACE_EXPORT_URL = os.getenv("TRACE_EXPORT_URL")
+TRACE_EXPORT_INTERVAL_SECONDS = float(os.getenv("TRACE_EXPORT_INTERVAL_SECONDS", 2.0))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "chess-agent")
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 10))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", 0.005))
+LOOP_LAG_MONITOR_ENABLED = str_to_bool(os.getenv("LOOP_LAG_MONITOR_ENABLED", "true"))
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", 0.1))
+LOOP_LAG_THRESHOLD_SECONDS = float(os.getenv("LOOP_LAG_THRESHOLD_SECONDS", 0.5))
+LOOP_LAG_STALLS_KEPT = int(os.getenv("LOOP_LAG_STALLS_KEPT", 20))
+CAPTURE_DIR = os.getenv("CAPTURE_DIR")
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", 1.0))
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", 50 * 1024 * 1024))
+CAPTURE_BACKUP_COUNT = int(os.getenv("CAPTURE_BACKUP_COUNT", 5))
+CAPTURE_SALT = os.getenv("CAPTURE_SALT")
+CAPTURE_REDACT_TEXT = str_to_bool(os.getenv("CAPTURE_REDACT_TEXT"))
+WARMUP_ENABLED = str_to_bool(os.getenv("WARMUP_ENABLED", "true"))
+WARMUP_ENGINES = int(os.getenv("WARMUP_ENGINES", 0))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", 5.0))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 10.0))
+LLM_BREAKER_WINDOW_SECONDS = float(os.getenv("LLM_BREAKER_WINDOW_SECONDS", 60.0))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", 10))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", 0.5))
+LLM_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", 5.0))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", 0.5))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", 30.0))
+LLM_HEDGE_ENABLED = str_to_bool(os.getenv("LLM_HEDGE_ENABLED"))
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", 0.95))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", 0.5))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+
+
+ENGINE_POOL_SIZE = int(os.getenv("ENGINE_POOL_SIZE", 4))
+ANALYSIS_MAX_POSITIONS = int(os.getenv("ANALYSIS_MAX_POSITIONS", 1000))
+ANALYSIS_TIME_PER_POSITION = float(os.getenv("ANALYSIS_TIME_PER_POSITION", 0.1))
+ANALYSIS_MAX_TIME_PER_POSITION = float(os.getenv("ANALYSIS_MAX_TIME_PER_POSITION", 2.0))
+ANALYSIS_MAX_DEPTH = int(os.getenv("ANALYSIS_MAX_DEPTH", 30))
+ANALYSIS_CHUNK_SIZE = int(os.getenv("ANALYSIS_CHUNK_SIZE", 10))
+TASK_CANCEL_TTL_SECONDS = int(os.getenv("TASK_CANCEL_TTL_SECONDS", 300))
+HINT_DEPTH = int(os.getenv("HINT_DEPTH", 12))
+ANALYSIS_DEPTH = int(os.getenv("ANALYSIS_DEPTH", 18))
+ANALYSIS_MULTIPV = int(os.getenv("ANALYSIS_MULTIPV", 3))
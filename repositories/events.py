@@ -0,0 +1,145 @@
+import asyncio
+import schemas
+from repositories.redis import RedisKeys, hash_tag, create_async_redis_client, get_redis_client
+from repositories.env import (
+    TASK_EVENT_LOG_MAXLEN,
+    TASK_EVENT_LOG_TTL_SECONDS,
+    TASK_EVENT_FOLLOW_TIMEOUT_SECONDS,
+)
+
+TaskEvent = schemas.TaskStatusUpdateEvent | schemas.TaskArtifactUpdateEvent
+
+
+def is_turn_start(event: TaskEvent) -> bool:
+    return (
+        isinstance(event, schemas.TaskStatusUpdateEvent)
+        and event.status.state == schemas.TaskState.working
+    )
+
+
+def is_final(event: TaskEvent) -> bool:
+    return isinstance(event, schemas.TaskStatusUpdateEvent) and event.final
+
+
+class TaskEventLog:
+    """Capped per-task Redis Stream of status/artifact events.
+
+    Every event is appended to the task's stream (trimmed to `maxlen` and
+    expiring after `ttl`) and announced on a pub/sub channel, so followers
+    replay from a cursor and then wake up for new entries instead of polling.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        redis_key_prefix=RedisKeys.task_events,
+        maxlen=TASK_EVENT_LOG_MAXLEN,
+        ttl=TASK_EVENT_LOG_TTL_SECONDS,
+        follow_timeout=TASK_EVENT_FOLLOW_TIMEOUT_SECONDS,
+        poll_interval=1.0,
+    ):
+        self._r = redis_client
+        self.prefix = redis_key_prefix
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.follow_timeout = follow_timeout
+        self.poll_interval = poll_interval
+        self._async_r = None
+
+    @property
+    def r(self):
+        if self._r is None:
+            self._r = get_redis_client()
+        return self._r
+
+    @property
+    def async_r(self):
+        if self._async_r is None:
+            self._async_r = create_async_redis_client()
+        return self._async_r
+
+    def _key(self, task_id: str) -> str:
+        return f"{self.prefix}:{hash_tag(task_id)}"
+
+    def _channel(self, task_id: str) -> str:
+        return f"{self._key(task_id)}:live"
+
+    @staticmethod
+    def _decode(fields: dict) -> TaskEvent:
+        if fields["kind"] == "artifact":
+            return schemas.TaskArtifactUpdateEvent.model_validate_json(fields["event"])
+        return schemas.TaskStatusUpdateEvent.model_validate_json(fields["event"])
+
+    def append(self, task_id: str, event: TaskEvent) -> str:
+        key = self._key(task_id)
+        kind = "artifact" if isinstance(event, schemas.TaskArtifactUpdateEvent) else "status"
+
+        pipe = self.r.pipeline(transaction=False)
+        pipe.xadd(
+            key,
+            {"kind": kind, "event": event.model_dump_json(by_alias=True)},
+            maxlen=self.maxlen,
+            approximate=True,
+        )
+        pipe.expire(key, self.ttl)
+        entry_id = pipe.execute()[0]
+        self.r.publish(self._channel(task_id), entry_id)
+        return entry_id
+
+    async def _latest_turn_cursor(self, task_id: str) -> str | None:
+        """Stream position of the most recent turn's working status."""
+        entries = await self.async_r.xrevrange(self._key(task_id), count=self.maxlen)
+        if not entries:
+            return None
+        for entry_id, fields in entries:
+            if is_turn_start(self._decode(fields)):
+                return entry_id
+        return "-"
+
+    async def follow(self, task_id: str, cursor: str | None = None):
+        """Yields (entry_id, event) after `cursor` until the turn's final event.
+
+        Without a cursor the latest turn is replayed from its start. Yields
+        nothing if the task has no event log.
+        """
+        key = self._key(task_id)
+        start = f"({cursor}" if cursor else await self._latest_turn_cursor(task_id)
+        if start is None:
+            return
+
+        pubsub = None
+        if hasattr(self.async_r, "pubsub"):
+            pubsub = self.async_r.pubsub()
+            await pubsub.subscribe(self._channel(task_id))
+
+        try:
+            idle = 0.0
+            while idle < self.follow_timeout:
+                entries = await self.async_r.xrange(key, min=start, max="+", count=100)
+                for entry_id, fields in entries:
+                    start = f"({entry_id}"
+                    event = self._decode(fields)
+                    event.metadata = {**(event.metadata or {}), "cursor": entry_id}
+                    yield entry_id, event
+                    if is_final(event):
+                        return
+
+                if entries:
+                    idle = 0.0
+                    continue
+                if not await self.async_r.exists(key):
+                    return
+
+                # Woken by the live channel, or re-check the stream after a pause.
+                if pubsub:
+                    await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.poll_interval)
+                else:
+                    await asyncio.sleep(self.poll_interval)
+                idle += self.poll_interval
+        finally:
+            if pubsub:
+                await pubsub.unsubscribe()
+                await pubsub.aclose()
+
+    async def exists(self, task_id: str) -> bool:
+        return bool(await self.async_r.exists(self._key(task_id)))
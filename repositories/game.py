@@ -1,33 +1,117 @@
 import json
+import time
+from functools import cached_property
 import chess
 import chess.engine
 import schemas
 from typing import Optional
-from repositories.redis import RedisKeys
-from repositories.env import CHESS_ENGINE_PATH
-from repositories.agent import ChessCommandResponse, AgentDependencies, chess_agent
+from repositories.redis import RedisKeys, hash_tag, mget, get_redis_client
+from helpers.tracing import traced_stage
+from repositories.engine import engine_pool, score_dict
+from repositories.env import (
+    REDIS_CLUSTER,
+    GAME_SAVE_MAX_RETRIES,
+    COMPLETED_GAME_TTL_SECONDS,
+    ABANDONED_GAME_TTL_SECONDS,
+    ANALYSIS_MAX_TIME_PER_POSITION,
+)
+from repositories.agent import ChessCommandResponse, AgentDependencies, run_command, stream_command
+
+
+# Games in these states are over: they leave the indexes and wait for the archiver.
+FINISHED_STATES = (schemas.TaskState.completed, schemas.TaskState.canceled)
+
+
+class GameConflictError(Exception):
+    """Raised when a game was saved by someone else since it was loaded."""
+
+
+# KEYS[1] game, KEYS[2..] indexes on the same slot.
+# ARGV: expected version, payload, ttl, task id, now, remove from indexes, trim before
+SAVE_GAME = """
+local stored = redis.call('GET', KEYS[1])
+local version = 0
+if stored then
+    version = cjson.decode(stored)['version'] or 0
+end
+if version ~= tonumber(ARGV[1]) then
+    return 0
+end
+if tonumber(ARGV[3]) > 0 then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+else
+    redis.call('SET', KEYS[1], ARGV[2])
+end
+for i = 2, #KEYS do
+    if ARGV[6] == '1' then
+        redis.call('ZREM', KEYS[i], ARGV[4])
+    else
+        redis.call('ZADD', KEYS[i], ARGV[5], ARGV[4])
+        if tonumber(ARGV[3]) > 0 then
+            redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', ARGV[7])
+            redis.call('EXPIRE', KEYS[i], ARGV[3])
+        end
+    end
+end
+return 1
+"""
+
+# KEYS: indexes on one slot. ARGV: task id, now, remove, trim before, ttl
+UPDATE_INDEXES = """
+for i = 1, #KEYS do
+    if ARGV[3] == '1' then
+        redis.call('ZREM', KEYS[i], ARGV[1])
+    else
+        redis.call('ZADD', KEYS[i], ARGV[2], ARGV[1])
+        if tonumber(ARGV[5]) > 0 then
+            redis.call('ZREMRANGEBYSCORE', KEYS[i], '-inf', ARGV[4])
+            redis.call('EXPIRE', KEYS[i], ARGV[5])
+        end
+    end
+end
+return 1
+"""
 
 
 class Game:
     def __init__(
         self,
         board: chess.Board,
-        engine: chess.engine.SimpleEngine,
         engine_time_limit=0.5,
         state=schemas.TaskState.unknown,
-        move_history: list[str] = [],
+        move_history: list[str] | None = None,
+        version: int = 0,
+        user_id: str | None = None,
+        channel_id: str | None = None,
+        analysis: dict | None = None,
     ):
         self.board = board
-        self.engine = engine
         self.engine_time_limit = engine_time_limit
         self.state = state
-        self.move_history = move_history
+        self.move_history = move_history if move_history is not None else []
+        self.version = version
+        self.user_id = user_id
+        self.channel_id = channel_id
+        # Engine lines for the position `analysis["fen"]`, reused by hints
+        # and analysis until a move changes the position.
+        self.analysis = analysis
 
-    def aimove(self):
-        ai = self.engine.play(
-            self.board, chess.engine.Limit(time=self.engine_time_limit)
+    async def aimove(self):
+        ai = await engine_pool.play(
+            self.board,
+            chess.engine.Limit(time=self.engine_time_limit),
+            info=chess.engine.INFO_BASIC | chess.engine.INFO_SCORE | chess.engine.INFO_PV,
         )
         self.board.push(ai.move)
+        # The rest of the engine's PV is its expected line for the user.
+        pv = ai.info.get("pv") or []
+        if len(pv) > 1 and "score" in ai.info:
+            self.analysis = {
+                "fen": self.board.fen(),
+                "depth": max(ai.info.get("depth", 1) - 1, 0),
+                "multipv": 1,
+                "lines": [{"score": score_dict(ai.info["score"]), "pv": [move.uci() for move in pv[1:]]}],
+            }
         self.move_history.append(ai.move.uci())
         self.state = schemas.TaskState.input_required
         return ai.move, self.board
@@ -41,19 +125,60 @@ class Game:
             raise ValueError(f"Invalid move: {move}")
         return self.board
 
+    async def analyse(self, depth: int, multipv: int = 1, min_depth: int | None = None) -> dict:
+        """Engine lines of the current position, searched only when needed.
+
+        The stored lines are returned if they are for this position, at
+        least `min_depth` (default `depth`) deep and searched with at least
+        `multipv` lines; otherwise the position is searched to `depth` and
+        stored. A search stopped by ANALYSIS_MAX_TIME_PER_POSITION before
+        `depth` counts as deep enough for that `depth`, since searching
+        again would stop at the same point.
+        """
+        cached = self.analysis
+        wanted = depth if min_depth is None else min_depth
+        if (
+            cached
+            and cached["fen"] == self.board.fen()
+            and max(cached["depth"], cached.get("requested_depth", 0)) >= wanted
+            and cached.get("multipv", 1) >= multipv
+        ):
+            return cached
+
+        infos = await engine_pool.analyse(
+            self.board,
+            chess.engine.Limit(depth=depth, time=ANALYSIS_MAX_TIME_PER_POSITION),
+            multipv=multipv,
+        )
+        self.analysis = {
+            "fen": self.board.fen(),
+            "depth": min((info.get("depth", 0) for info in infos), default=0),
+            "requested_depth": depth,
+            "multipv": multipv,
+            "lines": [
+                {"score": score_dict(info["score"]), "pv": [move.uci() for move in info.get("pv", [])]}
+                for info in infos
+                if "score" in info
+            ],
+        }
+        return self.analysis
+
     def to_dict(self):
         return {
             "fen": self.board.fen(),
             "engine_time_limit": self.engine_time_limit,
             "state": self.state.value,
             "move_history": self.move_history,
+            "version": self.version,
+            "user_id": self.user_id,
+            "channel_id": self.channel_id,
+            "analysis": self.analysis,
         }
 
     @classmethod
     def from_dict(cls, data):
         board = chess.Board(data["fen"])
         engine_time_limit = data.get("engine_time_limit", 0.5)
-        engine = chess.engine.SimpleEngine.popen_uci(CHESS_ENGINE_PATH)
         state_str = data.get("state", "unknown")
 
         try:
@@ -62,17 +187,67 @@ class Game:
             state = schemas.TaskState.unknown
 
         move_history = data.get("move_history", [])
+        version = data.get("version", 0)
 
-        return cls(board, engine, engine_time_limit, state, move_history)
+        return cls(
+            board,
+            engine_time_limit,
+            state,
+            move_history,
+            version,
+            data.get("user_id"),
+            data.get("channel_id"),
+            data.get("analysis"),
+        )
 
 
 class GameRepository:
-    def __init__(self, redis_client, redis_key_prefix=RedisKeys.games):
-        self.r = redis_client
+    def __init__(
+        self,
+        redis_client=None,
+        redis_key_prefix=RedisKeys.games,
+        index_prefix=RedisKeys.game_index,
+        cluster=REDIS_CLUSTER,
+    ):
+        self._r = redis_client
         self.prefix = redis_key_prefix
+        self.index_prefix = index_prefix
+        self.cluster = cluster
+
+    @property
+    def r(self):
+        if self._r is None:
+            self._r = get_redis_client()
+        return self._r
+
+    @cached_property
+    def _save_game(self):
+        return self.r.register_script(SAVE_GAME)
+
+    @cached_property
+    def _update_indexes(self):
+        return self.r.register_script(UPDATE_INDEXES)
 
     def _game_key(self, task_id: str) -> str:
-        return f"{self.prefix}:{task_id}"
+        return f"{self.prefix}:{hash_tag(task_id)}"
+
+    def _index_keys(self, user_id: str | None, channel_id: str | None) -> list[str]:
+        """Index keys of a user/channel, grouped so each group shares a slot."""
+        keys = []
+        if user_id:
+            keys.append(f"{self.index_prefix}:user:{hash_tag(user_id)}")
+        if channel_id:
+            keys.append(f"{self.index_prefix}:channel:{hash_tag(channel_id)}")
+        if user_id and channel_id:
+            keys.append(f"{self.index_prefix}:user_channel:{hash_tag(user_id)}:{channel_id}")
+        return keys
+
+    def _game_ttl(self, game: Game) -> int | None:
+        # Completed games wait here for the archiver; anything else expires
+        # once nobody has played it for a while.
+        if game.state in FINISHED_STATES:
+            return COMPLETED_GAME_TTL_SECONDS or None
+        return ABANDONED_GAME_TTL_SECONDS or None
 
     def task_state(self, task_id: str) -> schemas.TaskState:
         key = self._game_key(task_id)
@@ -88,32 +263,136 @@ class GameRepository:
         return schemas.TaskState.unknown
 
     def save(self, task_id: str, game: Game):
+        """Compare-and-set the game against the version it was loaded at.
+
+        Raises GameConflictError when another worker saved the game in the
+        meantime, so the caller can reload and re-apply its change.
+        """
         key = self._game_key(task_id)
-        self.r.set(key, json.dumps(game.to_dict()))
+        data = game.to_dict()
+        data["version"] = game.version + 1
+
+        # Active games are scored by last activity; completed games leave the
+        # indexes, and entries older than the abandoned-game TTL are trimmed.
+        now = time.time()
+        ttl = self._game_ttl(game) or 0
+        remove = "1" if game.state in FINISHED_STATES else "0"
+        trim_before = now - ABANDONED_GAME_TTL_SECONDS
+        index_keys = self._index_keys(game.user_id, game.channel_id)
+
+        # Indexes span many games, so on a cluster they cannot share the
+        # game's slot; they are updated right after the game write instead.
+        atomic_index_keys = [] if self.cluster else index_keys
+        with traced_stage("redis_save"):
+            saved = self._save_game(
+                keys=[key, *atomic_index_keys],
+                args=[game.version, json.dumps(data), ttl, task_id, now, remove, trim_before],
+            )
+        if not saved:
+            raise GameConflictError(task_id)
+
+        if self.cluster:
+            index_ttl = ABANDONED_GAME_TTL_SECONDS or 0
+            for index_key in index_keys:
+                self._update_indexes(
+                    keys=[index_key], args=[task_id, now, remove, trim_before, index_ttl]
+                )
+
+        game.version += 1
 
     def load(self, task_id: str) -> Optional[Game]:
         key = self._game_key(task_id)
-        data = self.r.get(key)
+        with traced_stage("redis_load"):
+            data = self.r.get(key)
         if data:
             return Game.from_dict(json.loads(data))
         return None
 
     def game_over(self, task_id: str):
-        game = self.load(task_id)
-        if game:
-            game.state = schemas.TaskState.completed
-            self.save(task_id, game)
+        self._set_state(task_id, schemas.TaskState.completed)
+
+    def cancel(self, task_id: str):
+        self._set_state(task_id, schemas.TaskState.canceled)
+
+    def _set_state(self, task_id: str, state: schemas.TaskState):
+        for _ in range(GAME_SAVE_MAX_RETRIES):
+            game = self.load(task_id)
+            if not game:
+                return
+            game.state = state
+            try:
+                self.save(task_id, game)
+                return
+            except GameConflictError:
+                continue
+        raise GameConflictError(task_id)
+
+    def find_active_game(self, user_id: str | None, channel_id: str | None) -> Optional[str]:
+        """Most recently played active game of a user in a channel."""
+        if not (user_id and channel_id):
+            return None
+        index_key = self._index_keys(user_id, channel_id)[-1]
+        for task_id in self.r.zrevrange(index_key, 0, 4):
+            if self.r.exists(self._game_key(task_id)):
+                return task_id
+            self.r.zrem(index_key, task_id)
+        return None
+
+    def list_games(
+        self,
+        user_id: str | None = None,
+        channel_id: str | None = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> tuple[list[dict], int]:
+        """Page through active games by last activity, newest first.
+
+        Returns the games and the number of index entries read. Entries of
+        expired games are dropped from the index, so the next page starts
+        `len(games)` after `offset`, and there is one when `limit` entries
+        were read.
+        """
+        index_keys = self._index_keys(user_id, channel_id)
+        if not index_keys:
+            return [], 0
+        index_key = index_keys[-1]
+        entries = self.r.zrevrange(index_key, offset, offset + limit - 1, withscores=True)
+        if not entries:
+            return [], 0
+
+        stored = mget(self.r, [self._game_key(task_id) for task_id, _ in entries])
+        games = []
+        for (task_id, last_activity), data in zip(entries, stored):
+            if data is None:
+                self.r.zrem(index_key, task_id)
+                continue
+            data = json.loads(data)
+            games.append(
+                {
+                    "task_id": task_id,
+                    "last_activity": last_activity,
+                    "state": data.get("state"),
+                    "fen": data.get("fen"),
+                    "moves": len(data.get("move_history", [])),
+                }
+            )
+        return games, len(entries)
 
     def delete(self, task_id: str):
         key = self._game_key(task_id)
         self.r.delete(key)
 
-    def start_game(self, engine_path: str) -> Game:
-        engine = chess.engine.SimpleEngine.popen_uci(engine_path)
+    def start_game(self) -> Game:
         board = chess.Board()
 
-        return Game(board, engine)
+        return Game(board)
 
     async def parse_command(self, message: str, game: Game) -> ChessCommandResponse:
-        result = await chess_agent.run(message.strip(), deps=AgentDependencies(move_history=game.move_history, fen=game.board.fen()))
-        return result.output
+        deps = AgentDependencies(move_history=game.move_history, fen=game.board.fen())
+        return await run_command(message.strip(), deps, game.board)
+
+    async def parse_command_stream(self, message: str, game: Game):
+        """Yields partial command responses as the model writes them; the last one is complete."""
+        deps = AgentDependencies(move_history=game.move_history, fen=game.board.fen())
+        async for partial in stream_command(message.strip(), deps, game.board):
+            yield partial
@@ -0,0 +1,97 @@
+import json
+import asyncio
+from typing import Any, Awaitable, Callable
+from repositories.redis import RedisKeys, hash_tag, get_redis_client
+from repositories.env import IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_PENDING_TTL_SECONDS
+
+PENDING = "__pending__"
+
+
+class IdempotencyStore:
+    """Runs each (scope, messageId) once and replays the stored response to retries.
+
+    Duplicates on the same worker await the original computation directly.
+    Duplicates on other workers see a pending marker in Redis and poll until
+    the response lands, or until the marker expires and they take over.
+    Responses that `keep` rejects are not stored, so a retry computes again.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        redis_key_prefix=RedisKeys.idempotency,
+        ttl=IDEMPOTENCY_TTL_SECONDS,
+        pending_ttl=IDEMPOTENCY_PENDING_TTL_SECONDS,
+        poll_interval=0.1,
+        keep: Callable[[Any], bool] = lambda response: True,
+    ):
+        self._r = redis_client
+        self.prefix = redis_key_prefix
+        self.ttl = ttl
+        self.pending_ttl = pending_ttl
+        self.poll_interval = poll_interval
+        self.keep = keep
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    @property
+    def r(self):
+        if self._r is None:
+            self._r = get_redis_client()
+        return self._r
+
+    def _key(self, scope: str | None, message_id: str) -> str:
+        return f"{self.prefix}:{hash_tag(scope or '-')}:{message_id}"
+
+    async def _wait_for_other_worker(self, key: str):
+        for _ in range(int(self.pending_ttl / self.poll_interval)):
+            await asyncio.sleep(self.poll_interval)
+            stored = self.r.get(key)
+            if stored is None:
+                return None
+            if stored != PENDING:
+                return json.loads(stored)
+        return None
+
+    async def run(self, scope: str | None, message_id: str, compute: Callable[[], Awaitable[Any]]):
+        key = self._key(scope, message_id)
+
+        stored = self.r.get(key)
+        if stored and stored != PENDING:
+            print(f"Replaying stored response for message {message_id}")
+            return json.loads(stored)
+
+        # Only the worker whose SET NX succeeds computes; the others wait, and
+        # race for the marker again once it has expired or been removed.
+        while True:
+            if key in self._inflight:
+                print(f"Duplicate message {message_id} is in flight, waiting for it")
+                return await asyncio.shield(self._inflight[key])
+            if self.r.set(key, PENDING, nx=True, ex=self.pending_ttl):
+                break
+            print(f"Message {message_id} is being handled by another worker, waiting for it")
+            response = await self._wait_for_other_worker(key)
+            if response is not None:
+                return response
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await compute()
+        except asyncio.CancelledError:
+            self.r.delete(key)
+            future.cancel()
+            raise
+        except Exception as e:
+            self.r.delete(key)
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        if response is None or not self.keep(response):
+            self.r.delete(key)
+        else:
+            self.r.set(key, response.model_dump_json(by_alias=True), ex=self.ttl)
+        future.set_result(response)
+        return response
@@ -1,8 +1,19 @@
-from minio import Minio
-from repositories.env import MINIO_ENDPOINT, MINIO_BUCKET_ACCESS_KEY, MINIO_BUKCET_SECRET_KEY
-
-minio_client = Minio(
-    MINIO_ENDPOINT,
-    access_key=MINIO_BUCKET_ACCESS_KEY,
-    secret_key=MINIO_BUKCET_SECRET_KEY,
-)
+from repositories.env import MINIO_ENDPOINT, MINIO_BUCKET_ACCESS_KEY, MINIO_BUKCET_SECRET_KEY, MINIO_SECURE
+
+_minio_client = None
+
+
+def get_minio_client():
+    """The shared Minio client. The minio package is slow to import, so it is
+    loaded and the client built on first use (or during warm-up)."""
+    global _minio_client
+    if _minio_client is None:
+        from minio import Minio
+
+        _minio_client = Minio(
+            MINIO_ENDPOINT,
+            access_key=MINIO_BUCKET_ACCESS_KEY,
+            secret_key=MINIO_BUKCET_SECRET_KEY,
+            secure=MINIO_SECURE,
+        )
+    return _minio_client
@@ -1,8 +1,61 @@
 import redis
+import redis.asyncio
+from redis.cluster import RedisCluster
+from redis.asyncio.cluster import RedisCluster as AsyncRedisCluster
 from dataclasses import dataclass
+from repositories.env import REDIS_URL, REDIS_CLUSTER
 
 @dataclass
 class RedisKeys:
     games = "games"
+    game_index = "game_index"
+    idempotency = "idempotency"
+    job_results = "job_results"
+    task_events = "task_events"
+    task_cancel = "tasks:cancel"
+    task_cache = "task_cache"
+    archiver_lock = "archiver:lock"
+    webhook_jobs = "jobs:webhook"
+    webhook_jobs_dead = "jobs:webhook:dead"
+    webhook_job_auth = "jobs:webhook:auth"
 
-r = redis.Redis(host="localhost", port=6379, decode_responses=True)
+
+def hash_tag(value: str) -> str:
+    """Pins a key to the cluster slot of `value`.
+
+    Redis Cluster only hashes the part of a key inside `{}`, so every key
+    built with the same tag lands on the same shard and can be used together
+    in one script or transaction. Single-node deployments keep plain keys.
+    """
+    return f"{{{value}}}" if REDIS_CLUSTER else value
+
+
+def create_redis_client(url: str = REDIS_URL, cluster: bool = REDIS_CLUSTER):
+    if cluster:
+        return RedisCluster.from_url(url, decode_responses=True)
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def create_async_redis_client(url: str = REDIS_URL, cluster: bool = REDIS_CLUSTER):
+    if cluster:
+        return AsyncRedisCluster.from_url(url, decode_responses=True)
+    return redis.asyncio.Redis.from_url(url, decode_responses=True)
+
+
+def mget(client, keys: list[str]) -> list[str | None]:
+    """MGET that also works when the keys live on different shards."""
+    if isinstance(client, RedisCluster):
+        return client.mget_nonatomic(keys)
+    return client.mget(keys)
+
+
+_redis_client = None
+
+
+def get_redis_client():
+    """The shared Redis client. RedisCluster connects when it is built, so the
+    client is created on first use (or during warm-up), not at import."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = create_redis_client()
+    return _redis_client
@@ -0,0 +1,113 @@
+import schemas
+from uuid import uuid4
+from repositories.redis import RedisKeys, hash_tag, get_redis_client
+from repositories.env import TASK_HISTORY_MAXLEN, TASK_CACHE_TTL_SECONDS
+
+
+def agent_message(task_id: str, response) -> schemas.Message:
+    """What the agent said in a response, as one history message."""
+    if response.error:
+        error = response.error
+        text = f"{error.message}: {error.data}" if error.data else error.message
+        parts = [schemas.TextPart(text=text)]
+    elif isinstance(response.result, schemas.Message):
+        return response.result.model_copy(update={"task_id": task_id})
+    elif response.result.status.message:
+        return response.result.status.message.model_copy(update={"task_id": task_id})
+    else:
+        parts = [part for artifact in response.result.artifacts or [] for part in artifact.parts]
+
+    return schemas.Message(messageId=uuid4().hex, role="agent", taskId=task_id, parts=parts)
+
+
+class TaskStore:
+    """Latest Task of every task plus its recent message history.
+
+    Written once per turn, so tasks/get is a single pipelined read of the
+    cached Task and the tail of its history list (capped at
+    `history_maxlen`), without loading the game.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        redis_key_prefix=RedisKeys.task_cache,
+        history_maxlen=TASK_HISTORY_MAXLEN,
+        ttl=TASK_CACHE_TTL_SECONDS,
+    ):
+        self._r = redis_client
+        self.prefix = redis_key_prefix
+        self.history_maxlen = history_maxlen
+        self.ttl = ttl
+
+    @property
+    def r(self):
+        if self._r is None:
+            self._r = get_redis_client()
+        return self._r
+
+    def _key(self, task_id: str) -> str:
+        return f"{self.prefix}:{hash_tag(task_id)}"
+
+    def _history_key(self, task_id: str) -> str:
+        return f"{self._key(task_id)}:history"
+
+    def _write(self, task: schemas.Task, messages: list[schemas.Message]):
+        key = self._key(task.id)
+        history_key = self._history_key(task.id)
+
+        pipe = self.r.pipeline(transaction=False)
+        pipe.set(key, task.model_dump_json(by_alias=True, exclude={"history"}), ex=self.ttl)
+        if messages:
+            pipe.rpush(history_key, *(message.model_dump_json(by_alias=True) for message in messages))
+            pipe.ltrim(history_key, -self.history_maxlen, -1)
+        pipe.expire(history_key, self.ttl)
+        pipe.execute()
+
+    def _load(self, task_id: str) -> schemas.Task | None:
+        data = self.r.get(self._key(task_id))
+        return schemas.Task.model_validate_json(data) if data else None
+
+    def record(self, task_id: str, user_message: schemas.Message | None, response):
+        """Stores the task as of `response`, the answer to `user_message`.
+
+        A Task result replaces the task; a message or error becomes the
+        status message. Either keeps the last artifacts if it has none.
+        """
+        reply = agent_message(task_id, response)
+        result = None if response.error else response.result
+        if isinstance(result, schemas.Task):
+            task = result.model_copy(update={"history": None})
+        else:
+            task = schemas.Task(
+                id=task_id,
+                status=schemas.TaskStatus(state=schemas.TaskState.input_required, message=reply),
+            )
+        if not task.artifacts:
+            previous = self._load(task_id)
+            task.artifacts = previous.artifacts if previous else None
+        if task.context_id is None and user_message:
+            task.context_id = user_message.context_id
+
+        messages = [user_message, reply] if user_message else [reply]
+        self._write(task, messages)
+
+    def set_status(self, task_id: str, status: schemas.TaskStatus):
+        task = self._load(task_id) or schemas.Task(id=task_id, status=status)
+        task.status = status
+        self._write(task, [])
+
+    def get(self, task_id: str, history_length: int | None = None) -> schemas.Task | None:
+        pipe = self.r.pipeline(transaction=False)
+        pipe.get(self._key(task_id))
+        if history_length is None:
+            pipe.lrange(self._history_key(task_id), 0, -1)
+        elif history_length > 0:
+            pipe.lrange(self._history_key(task_id), -min(history_length, self.history_maxlen), -1)
+        data, *history = pipe.execute()
+        if not data:
+            return None
+
+        task = schemas.Task.model_validate_json(data)
+        task.history = [schemas.Message.model_validate_json(message) for message in history[0]] if history else []
+        return task
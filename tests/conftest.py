@@ -0,0 +1,23 @@
+import fakeredis
+import pytest
+import repositories.redis
+
+# Every client the app creates, sync or async, talks to one in-memory server,
+# the way benchmarks/e2e.py runs the app without Redis.
+server = fakeredis.FakeServer()
+repositories.redis.create_redis_client = lambda *a, **k: fakeredis.FakeRedis(server=server, decode_responses=True)
+repositories.redis.create_async_redis_client = lambda *a, **k: fakeredis.FakeAsyncRedis(
+    server=server, decode_responses=True
+)
+
+
+@pytest.fixture(autouse=True)
+def redis_client():
+    client = repositories.redis.get_redis_client()
+    client.flushall()
+    return client
+
+
+@pytest.fixture
+def async_redis_client():
+    return repositories.redis.create_async_redis_client()
@@ -0,0 +1,114 @@
+import asyncio
+import chess
+import pytest
+import schemas
+from repositories.game import Game, GameRepository, GameConflictError, ChessCommandResponse
+from game.command_processor import RetryableError
+from game.progress import TaskProgress
+import game.move
+
+
+def test_save_increments_version():
+    repo = GameRepository()
+    game = Game(chess.Board())
+    repo.save("t1", game)
+    repo.save("t1", game)
+
+    assert game.version == 2
+    assert repo.load("t1").version == 2
+
+
+def test_stale_save_is_rejected():
+    repo = GameRepository()
+    repo.save("t1", Game(chess.Board()))
+    first, second = repo.load("t1"), repo.load("t1")
+
+    first.usermove("e4")
+    repo.save("t1", first)
+    second.usermove("d4")
+    with pytest.raises(GameConflictError):
+        repo.save("t1", second)
+
+    assert repo.load("t1").move_history == ["e2e4"]
+
+
+def test_set_state_retries_after_conflict(monkeypatch):
+    repo = GameRepository()
+    repo.save("t1", Game(chess.Board()))
+    load = repo.load
+    raced = []
+
+    def load_and_race(task_id):
+        game = load(task_id)
+        if not raced:
+            # Another worker saves between this load and the save.
+            raced.append(True)
+            repo.save(task_id, load(task_id))
+        return game
+
+    monkeypatch.setattr(repo, "load", load_and_race)
+    repo.game_over("t1")
+
+    assert load("t1").state == schemas.TaskState.completed
+    assert load("t1").version == 3
+
+
+def respond_after_conflicts(monkeypatch, conflicts: int, race=None):
+    """Makes respond_to_command raise GameConflictError `conflicts` times,
+    running `race` before each, then answer with the game's move history."""
+    calls = []
+
+    async def respond_to_command(task_id, game, command_response, progress):
+        calls.append(list(game.move_history))
+        if len(calls) <= conflicts:
+            if race:
+                race()
+            raise GameConflictError(task_id)
+        return game.move_history
+
+    monkeypatch.setattr(game.move, "respond_to_command", respond_to_command)
+    return calls
+
+
+def play(command: ChessCommandResponse, loaded: Game):
+    return asyncio.run(game.move.respond_with_retries("t1", loaded, command, None, TaskProgress("t1")))
+
+
+def test_retry_reloads_the_game(monkeypatch):
+    repo = game.move.game_repo
+    repo.save("t1", Game(chess.Board()))
+    loaded = repo.load("t1")
+    calls = respond_after_conflicts(monkeypatch, conflicts=1)
+
+    assert play(ChessCommandResponse(command_type="board"), loaded) == []
+    assert len(calls) == 2
+
+
+def test_move_is_not_replayed_on_an_updated_game(monkeypatch):
+    repo = game.move.game_repo
+    repo.save("t1", Game(chess.Board()))
+    loaded = repo.load("t1")
+
+    def other_move():
+        other = repo.load("t1")
+        other.usermove("d4")
+        repo.save("t1", other)
+
+    respond_after_conflicts(monkeypatch, conflicts=1, race=other_move)
+    response = play(ChessCommandResponse(command_type="move", move="e4"), loaded)
+
+    assert response.error.message == "Game was updated"
+    assert isinstance(response.error, RetryableError)
+
+
+def test_busy_after_too_many_conflicts(monkeypatch):
+    repo = game.move.game_repo
+    repo.save("t1", Game(chess.Board()))
+    monkeypatch.setattr(game.move, "GAME_SAVE_MAX_RETRIES", 2)
+    calls = respond_after_conflicts(monkeypatch, conflicts=5)
+
+    response = play(ChessCommandResponse(command_type="board"), repo.load("t1"))
+
+    assert response.error.message == "Game is busy"
+    assert isinstance(response.error, RetryableError)
+    assert len(calls) == 2
@@ -0,0 +1,132 @@
+import json
+import asyncio
+import pytest
+import schemas
+from repositories.idempotency import IdempotencyStore, PENDING
+from game.command_processor import build_error_response, is_replayable
+
+
+def answer(text: str):
+    return schemas.SendMessageResponse(
+        result=schemas.Message(messageId="reply", role="agent", parts=[schemas.TextPart(text=text)])
+    )
+
+
+def counting(response, delay=0.0):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return response
+
+    return compute, calls
+
+
+def test_retry_gets_the_stored_response():
+    store = IdempotencyStore()
+    compute, calls = counting(answer("e5"))
+
+    async def run():
+        first = await store.run("t1", "m1", compute)
+        second = await store.run("t1", "m1", compute)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert second == json.loads(first.model_dump_json(by_alias=True))
+
+
+def test_messages_are_scoped_by_task():
+    store = IdempotencyStore()
+    compute, calls = counting(answer("e5"))
+
+    async def run():
+        await store.run("t1", "m1", compute)
+        await store.run("t2", "m1", compute)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_concurrent_duplicates_compute_once():
+    store = IdempotencyStore()
+    compute, calls = counting(answer("e5"), delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(store.run("t1", "m1", compute) for _ in range(5)))
+
+    responses = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(response.result.parts[0].text == "e5" for response in responses)
+
+
+def test_waits_for_another_worker(redis_client):
+    store = IdempotencyStore(poll_interval=0.01)
+    key = store._key("t1", "m1")
+    redis_client.set(key, PENDING)
+    compute, calls = counting(answer("mine"))
+
+    async def run():
+        async def other_worker_finishes():
+            await asyncio.sleep(0.05)
+            redis_client.set(key, answer("theirs").model_dump_json(by_alias=True))
+
+        _, response = await asyncio.gather(other_worker_finishes(), store.run("t1", "m1", compute))
+        return response
+
+    response = asyncio.run(run())
+
+    assert calls == []
+    assert response["result"]["parts"][0]["text"] == "theirs"
+
+
+def test_takes_over_when_the_other_worker_gives_up(redis_client):
+    store = IdempotencyStore(poll_interval=0.01)
+    key = store._key("t1", "m1")
+    redis_client.set(key, PENDING)
+    compute, calls = counting(answer("mine"))
+
+    async def run():
+        async def other_worker_fails():
+            await asyncio.sleep(0.05)
+            redis_client.delete(key)
+
+        _, response = await asyncio.gather(other_worker_fails(), store.run("t1", "m1", compute))
+        return response
+
+    response = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert response.result.parts[0].text == "mine"
+
+
+def test_failure_removes_the_pending_marker(redis_client):
+    store = IdempotencyStore()
+
+    async def fail():
+        raise RuntimeError("engine crashed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(store.run("t1", "m1", fail))
+
+    assert redis_client.get(store._key("t1", "m1")) is None
+
+
+def test_retryable_errors_are_not_stored(redis_client):
+    store = IdempotencyStore(keep=is_replayable)
+    busy, busy_calls = counting(build_error_response("Game is busy", "please try again", retryable=True))
+    invalid, invalid_calls = counting(build_error_response("Invalid move", "e9 is not a square"))
+
+    async def run():
+        for _ in range(2):
+            await store.run("t1", "busy", busy)
+            await store.run("t1", "invalid", invalid)
+
+    asyncio.run(run())
+
+    assert len(busy_calls) == 2
+    assert len(invalid_calls) == 1
+    assert redis_client.get(store._key("t1", "busy")) is None
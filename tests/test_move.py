@@ -0,0 +1,45 @@
+import asyncio
+import chess
+import pytest
+import schemas
+from repositories.game import Game, ChessCommandResponse
+from game.progress import TaskProgress
+import game.move
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Replaces rendering and uploading the board, recording the boards sent."""
+    boards = []
+
+    async def publish_board(task_id, board, progress):
+        boards.append(board.fen())
+        return "board.png", "https://example.com/board.png"
+
+    monkeypatch.setattr(game.move, "publish_board", publish_board)
+    return boards
+
+
+def test_user_move_that_ends_the_game_skips_the_engine(monkeypatch, published):
+    async def aimove(self):
+        raise AssertionError("the engine was asked to move on a finished board")
+
+    monkeypatch.setattr(Game, "aimove", aimove)
+    board = chess.Board()
+    for move in ("e4", "e5", "Bc4", "Nc6", "Qh5", "Nf6"):
+        board.push_san(move)
+    current = Game(board, state=schemas.TaskState.input_required)
+    game.move.game_repo.save("t1", current)
+
+    response = asyncio.run(
+        game.move.respond_to_command(
+            "t1", current, ChessCommandResponse(command_type="move", move="Qxf7#"), TaskProgress("t1")
+        )
+    )
+
+    assert response.result.status.state == schemas.TaskState.completed
+    assert [artifact.name for artifact in response.result.artifacts] == ["board", "game_over"]
+    assert published == [current.board.fen()]
+    saved = game.move.game_repo.load("t1")
+    assert saved.board.is_checkmate()
+    assert saved.state == schemas.TaskState.completed
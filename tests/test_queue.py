@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+import schemas
+from redis.exceptions import ConnectionError
+from messaging.queue import WebhookJobQueue, WebhookJobWorker
+
+AUTH = {"X-TELEX-API-KEY": "secret-key"}
+
+
+@pytest.fixture
+def params():
+    message = schemas.Message(messageId="m1", role="user", parts=[schemas.TextPart(text="e4")])
+    return schemas.MessageSendParams(message=message)
+
+
+@pytest.fixture
+def queue(params):
+    queue = WebhookJobQueue()
+    queue.enqueue(params, "t1", "https://example.com/webhook", AUTH)
+    return queue
+
+
+class Handler:
+    """Records the jobs it is given and fails the first `failures` of them."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    async def __call__(self, params, task_id, webhook_url, auth_headers, traceparent):
+        self.calls.append((task_id, auth_headers))
+        if len(self.calls) <= self.failures:
+            raise RuntimeError("webhook is down")
+
+
+async def consume_once(worker: WebhookJobWorker):
+    """Reads new jobs once, like one turn of WebhookJobWorker.run, and waits for them."""
+    await worker._ensure_group()
+    batches = await worker.r.xreadgroup(worker.group, worker.consumer, {worker.stream: ">"}, count=10)
+    for _, entries in batches or []:
+        for job_id, fields in entries:
+            await worker._start(job_id, fields)
+    await asyncio.gather(*worker._running)
+
+
+def worker(async_redis_client, handler, consumer="w1", **kwargs):
+    return WebhookJobWorker(async_redis_client, handler, consumer=consumer, claim_idle_seconds=0.01, **kwargs)
+
+
+def test_credentials_stay_out_of_the_stream(queue, redis_client):
+    (_, fields), = redis_client.xrange(queue.stream)
+
+    assert "secret-key" not in str(fields)
+    assert redis_client.get(f"{queue.auth_prefix}:{fields['auth_id']}") is not None
+
+
+def test_delivered_job_is_acked_and_removed(queue, redis_client, async_redis_client):
+    handler = Handler()
+    asyncio.run(consume_once(worker(async_redis_client, handler)))
+
+    assert handler.calls == [("t1", AUTH)]
+    assert redis_client.xlen(queue.stream) == 0
+    assert redis_client.keys(f"{queue.auth_prefix}:*") == []
+
+
+def test_failed_job_is_redelivered_to_another_worker(queue, redis_client, async_redis_client):
+    handler = Handler(failures=1)
+
+    async def run():
+        await consume_once(worker(async_redis_client, handler, consumer="w1"))
+        await asyncio.sleep(0.02)
+        other = worker(async_redis_client, handler, consumer="w2")
+        await other.reclaim_stale()
+        await asyncio.gather(*other._running)
+
+    asyncio.run(run())
+
+    assert handler.calls == [("t1", AUTH), ("t1", AUTH)]
+    assert redis_client.xlen(queue.stream) == 0
+    assert redis_client.xpending(queue.stream, "webhook-workers")["pending"] == 0
+
+
+def test_job_is_dead_lettered_after_max_deliveries(queue, redis_client, async_redis_client):
+    handler = Handler(failures=10)
+    first = worker(async_redis_client, handler, max_deliveries=2, dead_letter_ttl=60)
+
+    async def run():
+        await consume_once(first)
+        for _ in range(2):
+            await asyncio.sleep(0.02)
+            await first.reclaim_stale()
+            await asyncio.gather(*first._running)
+
+    asyncio.run(run())
+
+    assert len(handler.calls) == 2
+    assert redis_client.xlen(queue.stream) == 0
+    (_, dead), = redis_client.xrange(queue.dead_letter_stream)
+    assert dead["task_id"] == "t1"
+    assert "secret-key" not in str(dead)
+    assert 0 < redis_client.ttl(queue.dead_letter_stream) <= 60
+    assert redis_client.keys(f"{queue.auth_prefix}:*") == []
+
+
+def test_jobs_queued_with_inline_credentials_are_delivered(params, redis_client, async_redis_client):
+    redis_client.xadd(
+        "jobs:webhook",
+        {
+            "params": params.model_dump_json(by_alias=True),
+            "task_id": "t1",
+            "webhook_url": "https://example.com/webhook",
+            "auth_headers": '{"X-TELEX-API-KEY": "secret-key"}',
+        },
+    )
+    handler = Handler()
+    asyncio.run(consume_once(worker(async_redis_client, handler)))
+
+    assert handler.calls == [("t1", AUTH)]
+
+
+def test_worker_survives_redis_errors(queue, async_redis_client):
+    handler = Handler()
+    consumer = worker(async_redis_client, handler)
+    read = async_redis_client.xreadgroup
+    reads = []
+
+    async def flaky_read(*args, **kwargs):
+        reads.append(1)
+        if len(reads) == 1:
+            raise ConnectionError("failover")
+        if handler.calls:
+            consumer.stop()
+        return await read(*args, **kwargs)
+
+    async_redis_client.xreadgroup = flaky_read
+    asyncio.run(asyncio.wait_for(consumer.run(), timeout=5))
+
+    assert handler.calls == [("t1", AUTH)]
@@ -0,0 +1,155 @@
+import time
+import asyncio
+import pytest
+from helpers.resilience import CircuitBreaker, hedged
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker(
+        "test",
+        window=60,
+        min_calls=4,
+        failure_rate=0.5,
+        slow_call_seconds=1.0,
+        slow_rate=0.75,
+        open_seconds=0.05,
+    )
+
+
+def finish(breaker: CircuitBreaker, ok=True, seconds=0.1):
+    breaker.record(breaker.allow(), seconds, ok)
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(breaker.min_calls):
+        finish(breaker, ok=False)
+    assert breaker.state == "open"
+
+
+def test_stays_closed_below_min_calls(breaker):
+    for _ in range(breaker.min_calls - 1):
+        finish(breaker, ok=False)
+
+    assert breaker.state == "closed"
+
+
+def test_opens_on_failure_rate(breaker):
+    finish(breaker)
+    finish(breaker)
+    finish(breaker, ok=False)
+    assert breaker.state == "closed"
+
+    finish(breaker, ok=False)
+    assert breaker.state == "open"
+    assert breaker.allow() is None
+
+
+def test_opens_on_slow_calls(breaker):
+    finish(breaker)
+    for _ in range(3):
+        finish(breaker, seconds=2.0)
+
+    assert breaker.state == "open"
+
+
+def test_lets_one_trial_through_after_open_seconds(breaker):
+    trip(breaker)
+    time.sleep(0.06)
+
+    trial = breaker.allow()
+    assert breaker.state == "half_open"
+    assert trial is not None
+    assert breaker.allow() is None
+
+
+def test_successful_trial_closes(breaker):
+    trip(breaker)
+    time.sleep(0.06)
+    breaker.record(breaker.allow(), 0.1, True)
+
+    assert breaker.state == "closed"
+    assert breaker.stats["calls_in_window"] == 0
+
+
+@pytest.mark.parametrize("ok, seconds", [(False, 0.1), (True, 2.0)])
+def test_failed_or_slow_trial_reopens(breaker, ok, seconds):
+    trip(breaker)
+    time.sleep(0.06)
+    breaker.record(breaker.allow(), seconds, ok)
+
+    assert breaker.state == "open"
+    assert breaker.allow() is None
+
+
+def test_calls_started_before_the_trial_do_not_count(breaker):
+    started_while_closed = breaker.allow()
+    trip(breaker)
+    time.sleep(0.06)
+    trial = breaker.allow()
+
+    breaker.record(started_while_closed, 0.1, True)
+    breaker.release(started_while_closed)
+    assert breaker.state == "half_open"
+    assert breaker.allow() is None
+
+    breaker.record(trial, 0.1, False)
+    assert breaker.state == "open"
+
+
+def test_released_trial_lets_another_through(breaker):
+    trip(breaker)
+    time.sleep(0.06)
+    breaker.release(breaker.allow())
+
+    assert breaker.state == "half_open"
+    assert breaker.allow() is not None
+
+
+def answers(*delays, failing=()):
+    """A call whose n-th invocation answers n after delays[n], or raises if n is in `failing`."""
+    calls = []
+
+    async def call():
+        n = len(calls)
+        calls.append(n)
+        await asyncio.sleep(delays[n])
+        if n in failing:
+            raise RuntimeError(f"call {n} failed")
+        return n
+
+    return call, calls
+
+
+def test_no_hedge_without_delay():
+    call, calls = answers(0.05)
+
+    assert asyncio.run(hedged("test", call, None)) == 0
+    assert calls == [0]
+
+
+def test_no_hedge_when_the_first_call_is_fast():
+    call, calls = answers(0.01, 0.01)
+
+    assert asyncio.run(hedged("test", call, 0.1)) == 0
+    assert calls == [0]
+
+
+def test_hedge_wins_over_a_slow_call():
+    call, calls = answers(1.0, 0.01)
+
+    assert asyncio.run(hedged("test", call, 0.02)) == 1
+    assert calls == [0, 1]
+
+
+def test_slow_call_still_wins_when_the_hedge_fails():
+    call, _ = answers(0.1, 0.01, failing={1})
+
+    assert asyncio.run(hedged("test", call, 0.02)) == 0
+
+
+def test_first_error_is_raised_when_both_fail():
+    call, _ = answers(0.05, 0.01, failing={0, 1})
+
+    with pytest.raises(RuntimeError, match="call 0 failed"):
+        asyncio.run(hedged("test", call, 0.02))
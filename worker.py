@@ -0,0 +1,51 @@
+import signal
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from repositories.redis import create_async_redis_client
+from messaging.queue import WebhookJobWorker
+from messaging.webhook import run_webhook_job
+from messaging.delivery import webhook_delivery
+from repositories.engine import engine_pool
+from repositories.agent import load_model
+from game.init import task_cancellation
+from helpers.metrics import serve_metrics, engines_busy
+from helpers.tracing import tracer
+from helpers.loop_monitor import loop_monitor
+from repositories.env import WORKER_METRICS_PORT, LOOP_LAG_MONITOR_ENABLED, WARMUP_ENABLED, WARMUP_ENGINES
+
+
+async def main():
+    redis_client = create_async_redis_client()
+    worker = WebhookJobWorker(redis_client, run_webhook_job)
+    engines_busy.set_function(lambda: engine_pool.busy)
+    metrics_server = await serve_metrics(WORKER_METRICS_PORT) if WORKER_METRICS_PORT else None
+    if LOOP_LAG_MONITOR_ENABLED:
+        loop_monitor.start()
+
+    if WARMUP_ENABLED:
+        # Jobs are only taken once the engines and the model client exist.
+        load_model()
+        await engine_pool.warm_up(WARMUP_ENGINES or None)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        if metrics_server:
+            metrics_server.close()
+        await loop_monitor.aclose()
+        await task_cancellation.aclose()
+        await engine_pool.close()
+        await webhook_delivery.aclose()
+        await redis_client.aclose()
+        tracer.flush()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())